@@ -50,6 +50,8 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Only used when INSTRUMENTATION_ENABLED is True
+    "games.instrumentation.InstrumentationMiddleware",
 ]
 
 ROOT_URLCONF = "ActualExclusives.urls"
@@ -84,6 +86,27 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    # Search results, entries never expire because the key changes after every import, once MAX_ENTRIES is reached the
+    # least recently used 1/CULL_FREQUENCY of the entries are removed
+    "search": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "search",
+        "TIMEOUT": None,
+        "OPTIONS": {
+            "MAX_ENTRIES": 500,
+            "CULL_FREQUENCY": 50,
+        },
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -121,6 +144,35 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "static"
 
+# Search
+# Answer searches using the in-memory bitset index in games/exclusivity_index.py instead of nested ORM queries
+
+EXCLUSIVITY_INDEX_ENABLED = False
+
+# Number of games that are shown on each page of results
+SEARCH_PAGE_SIZE = 100
+
+# Record the time and SQL of every request in Server-Timing headers, the log, and the status page
+INSTRUMENTATION_ENABLED = False
+
+# File the scrape writes its metrics to in the Prometheus text format when it is done, see games/metrics.py
+METRICS_FILE = None
+
+# Port the scrape serves its metrics on at 127.0.0.1/metrics while it runs
+METRICS_PORT = None
+
+# Bearer token a collector has to send to read the metrics of the web server at /metrics, it is off without a token
+METRICS_TOKEN = None
+
+# Downloads
+# Where the downloaded game and release files are kept, "files" saves one JSON file for each of them in
+# downloaded_files and "packed" saves them compressed in a single SQLite database, see scrape/raw_store.py
+
+RAW_STORE = "files"
+
+# Most bytes of downloaded content that are kept parsed in memory for the scrape, see scrape/document_cache.py
+DOCUMENT_CACHE_BYTES = 64 * 1024 * 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
@@ -1,7 +1,20 @@
 """Admin page for the games app."""
 from django.contrib import admin
 
-from games.models import Country, Game, GameGenre, GamePlatform, GamePlatformCountry, Genre, LastScrape, Platform
+from games.models import (
+    Country,
+    DataGeneration,
+    Game,
+    GameGenre,
+    GamePlatform,
+    GamePlatformCountry,
+    GamePlatformSignature,
+    GameSignature,
+    Genre,
+    LastScrape,
+    Platform,
+    RecentImportPage,
+)
 
 admin.site.register(Game)
 admin.site.register(GamePlatform)
@@ -11,3 +24,7 @@ admin.site.register(Genre)
 admin.site.register(Platform)
 admin.site.register(Country)
 admin.site.register(LastScrape)
+admin.site.register(RecentImportPage)
+admin.site.register(DataGeneration)
+admin.site.register(GameSignature)
+admin.site.register(GamePlatformSignature)
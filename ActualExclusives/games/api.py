@@ -0,0 +1,121 @@
+"""Build the JSON search results and their validators.
+
+The API returns the same results as the games view but only as ids, so it does not need the templates or any model
+instances. Every response has a strong ETag that only changes when the search or the imported data changes, so clients
+that poll the API can send If-None-Match and get an empty 304 response back.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import re
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+
+from games.generation import current_generation
+from games.models import GamePlatform, GamePlatformCountry, LastScrape
+from games.pagination import encode_cursor, games_after
+from games.search_cache import canonical_search
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+    from django.forms import BaseFormSet
+
+    from games.models import Game
+
+# Same check that django.middleware.gzip.GZipMiddleware uses
+ACCEPTS_GZIP = re.compile(r"\bgzip\b")
+
+# Added to the ETag of compressed responses, a strong ETag has to be different for every encoding
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+def search_etag(formset: BaseFormSet, search_type: str, cursor: str | None, *, gzipped: bool) -> str:
+    """Create a strong ETag for a page of search results.
+
+    Args:
+    ----
+        formset: The formset that was submitted.
+        search_type: The type of search to perform.
+        cursor: The cursor for the page, or None for the first page.
+        gzipped: If the response is compressed.
+
+    Returns:
+    -------
+        The quoted ETag, it only changes when the search, the encoding, or the imported data changes.
+    """
+    last_scrape = LastScrape.objects.order_by("-datetime").values_list("datetime", flat=True).first()
+    validator = json.dumps(
+        [canonical_search(formset, search_type), cursor, current_generation(), str(last_scrape)],
+    )
+    suffix = GZIP_ETAG_SUFFIX if gzipped else ""
+    return f'"{hashlib.sha256(validator.encode()).hexdigest()}{suffix}"'
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Check if the client accepts gzip from the Accept-Encoding header of the request."""
+    return bool(ACCEPTS_GZIP.search(accept_encoding))
+
+
+def search_payload(games: QuerySet[Game], cursor: str | None) -> dict[str, Any]:
+    """Get a page of search results as ids.
+
+    Args:
+    ----
+        games: The queryset of games that were found.
+        cursor: The cursor for the page, or None for the first page.
+
+    Returns:
+    -------
+        The games as [game_id, [[platform_id, [country_id, ...]], ...]] and the cursor for the next page.
+    """
+    page_size = settings.SEARCH_PAGE_SIZE
+    page = list(games_after(games, cursor).values_list("name", "id")[: page_size + 1])
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(*page[-1])
+
+    game_ids = [game_id for _, game_id in page]
+    platforms: defaultdict[int, dict[int, list[int]]] = defaultdict(dict)
+    for game_id, platform_id in (
+        GamePlatform.objects.filter(game_id__in=game_ids).order_by("platform_id").values_list("game_id", "platform_id")
+    ):
+        platforms[game_id][platform_id] = []
+
+    for game_id, platform_id, country_id in (
+        GamePlatformCountry.objects.filter(game_platform__game_id__in=game_ids)
+        .order_by("country_id")
+        .values_list("game_platform__game_id", "game_platform__platform_id", "country_id")
+    ):
+        platforms[game_id][platform_id].append(country_id)
+
+    return {
+        "games": [[game_id, [list(platform) for platform in platforms[game_id].items()]] for game_id in game_ids],
+        "next": next_cursor,
+    }
+
+
+def encode_payload(payload: dict[str, Any], *, gzipped: bool) -> bytes:
+    """Serialize a payload as compact JSON.
+
+    Args:
+    ----
+        payload: The payload from search_payload.
+        gzipped: If the JSON should be compressed.
+
+    Returns:
+    -------
+        The response body.
+    """
+    body = json.dumps(payload, separators=(",", ":")).encode()
+
+    if not gzipped:
+        return body
+
+    # mtime is fixed so the same payload always gives the same bytes for the same ETag
+    return gzip.compress(body, mtime=0)
@@ -0,0 +1,184 @@
+"""Time every kind of search through form_parser and the games view.
+
+Every combination of platform search type, platform include, country search type, country include, and And Search or
+Or Search is run several times. The results are written as JSON so runs from different commits can be compared.
+"""
+from __future__ import annotations
+
+import itertools
+import statistics
+import subprocess
+import time
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from games.forms import SelectForm, SelectFormSet
+from games.functions import form_parser
+from games.instrumentation import nearest_rank
+from games.models import Country, Game, GamePlatform, GamePlatformCountry, Platform
+from games.pagination import get_page
+from games.search_cache import SEARCH_CACHE_ALIAS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+SEARCH_TYPES = ["And Search", "Or Search"]
+YES_NO = [choice for choice, _ in SelectForm.YES_NO_CHOICES]
+AND_OR = [choice for choice, _ in SelectForm.AND_OR_CHOICES]
+
+# The number of the most popular platforms and countries that are selected in every search
+SELECTED_COUNT = 2
+
+
+def search_combinations(platform_ids: list[int], country_ids: list[int]) -> list[tuple[str, dict[str, Any], str]]:
+    """Create every combination of search parameters.
+
+    Args:
+    ----
+        platform_ids: The platforms to select in every search.
+        country_ids: The countries to select in every search.
+
+    Returns:
+    -------
+        The name of each search, the GET parameters of its form, and its search type.
+    """
+    combinations = []
+    for platform_search_type, platform_include, country_search_type, country_include, search_type in itertools.product(
+        AND_OR,
+        YES_NO,
+        AND_OR,
+        YES_NO,
+        SEARCH_TYPES,
+    ):
+        name = (
+            f"platforms {platform_search_type} {platform_include}, "
+            f"countries {country_search_type} {country_include}, {search_type}"
+        )
+        data = {
+            "form-TOTAL_FORMS": "1",
+            "form-INITIAL_FORMS": "0",
+            "form-0-platforms": [str(platform_id) for platform_id in platform_ids],
+            "form-0-platform_include": platform_include,
+            "form-0-platform_search_type": platform_search_type,
+            "form-0-countries": [str(country_id) for country_id in country_ids],
+            "form-0-country_include": country_include,
+            "form-0-country_search_type": country_search_type,
+        }
+        combinations.append((name, data, search_type))
+
+    return combinations
+
+
+def measure(function: Callable[[], object]) -> tuple[float, int]:
+    """Run a function and get how many seconds it took and how many statements it ran."""
+    statements = 0
+
+    def count(execute: Callable[..., Any], *args: Any) -> Any:  # noqa: ANN401 - Wraps any statement
+        nonlocal statements
+        statements += 1
+        return execute(*args)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+
+    return elapsed, statements
+
+
+def summarize(name: str, target: str, samples: list[tuple[float, int]]) -> dict[str, Any]:
+    """Summarize the samples of a single search."""
+    milliseconds = sorted(elapsed * 1000 for elapsed, _ in samples)
+    return {
+        "name": name,
+        "target": target,
+        "runs": len(samples),
+        "p50_ms": round(nearest_rank(milliseconds, 50), 3),
+        "p95_ms": round(nearest_rank(milliseconds, 95), 3),
+        "mean_ms": round(statistics.fmean(milliseconds), 3),
+        "queries": max(statements for _, statements in samples),
+    }
+
+
+def most_popular(model: type[Platform | Country], related: str) -> list[int]:
+    """Get the ids of the platforms or countries with the most releases."""
+    return list(
+        model.objects.annotate(releases=Count(related))
+        .order_by("-releases", "id")
+        .values_list("id", flat=True)[:SELECTED_COUNT],
+    )
+
+
+def git_commit() -> str | None:
+    """Get the commit that is checked out, or None if it can not be found."""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "HEAD"],  # noqa: S603, S607 - Constant command, git is on the PATH
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmark(repeat: int = 5) -> dict[str, Any]:
+    """Time every search through form_parser and the games view.
+
+    The search cache is cleared before every request so the view always runs the search.
+
+    Args:
+    ----
+        repeat: The number of times to run each search.
+
+    Returns:
+    -------
+        The dataset size and the p50 and p95 latency and the number of statements for every search.
+    """
+    platform_ids = most_popular(Platform, "gameplatform")
+    country_ids = most_popular(Country, "gameplatformcountry")
+    client = Client()
+    results = []
+
+    # The test client is not one of the ALLOWED_HOSTS
+    with override_settings(ALLOWED_HOSTS=["testserver"]):
+        for name, data, search_type in search_combinations(platform_ids, country_ids):
+            formset = SelectFormSet(data)
+            if not formset.is_valid():
+                msg = f"Invalid benchmark search {name}"
+                raise ValueError(msg)
+
+            def run_search(formset: SelectFormSet = formset, search_type: str = search_type) -> None:
+                get_page(form_parser(formset, search_type), None)
+
+            parser_samples = [measure(run_search) for _ in range(repeat)]
+            results.append(summarize(name, "form_parser", parser_samples))
+
+            url = f"{reverse('games')}?{urlencode({**data, 'search_type': search_type}, doseq=True)}"
+            view_samples = []
+            for _ in range(repeat):
+                caches[SEARCH_CACHE_ALIAS].clear()
+                view_samples.append(measure(lambda url=url: client.get(url)))
+            results.append(summarize(name, "view", view_samples))
+
+    return {
+        "commit": git_commit(),
+        "dataset": {
+            "games": Game.objects.count(),
+            "platforms": Platform.objects.count(),
+            "countries": Country.objects.count(),
+            "game_platforms": GamePlatform.objects.count(),
+            "game_platform_countries": GamePlatformCountry.objects.count(),
+        },
+        "selected": {"platforms": platform_ids, "countries": country_ids},
+        "repeat": repeat,
+        "results": results,
+    }
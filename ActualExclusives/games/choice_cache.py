@@ -0,0 +1,179 @@
+"""Cache the platform and country choices of SelectForm.
+
+Every form in a SelectFormSet, including empty_form, used to query every platform and country, render an option for
+each of them, and then query them again with id__in when the form was validated. Platforms and countries only change
+when the scrapers import something, so the choices and their rendered options are kept for the whole process and only
+rebuilt after the data generation changes.
+"""
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Any
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+from django.utils.safestring import SafeString, mark_safe
+
+from games.generation import current_generation
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from django.db.models import Model
+
+
+class ModelChoices:
+    """Every instance of a model ordered by name with their rendered options."""
+
+    def __init__(self, model: type[Model]) -> None:
+        """Load the instances of the model and render their options.
+
+        Args:
+        ----
+            model: The model to load, it must have a name field.
+        """
+        self.instances = {instance.pk: instance for instance in model.objects.order_by("name")}
+
+        # The same markup that django.forms.SelectMultiple creates
+        self.options = [format_html('<option value="{}">{}</option>', pk, instance) for pk, instance in self]
+        self.selected_options = [
+            format_html('<option value="{}" selected>{}</option>', pk, instance) for pk, instance in self
+        ]
+        self.unselected_html = mark_safe("\n  ".join(self.options))  # noqa: S308 - Escaped by format_html
+
+    def __iter__(self) -> Iterator[tuple[Any, Model]]:
+        """Iterate over (pk, instance) in name order."""
+        return iter(self.instances.items())
+
+    def render_options(self, selected: set[str]) -> SafeString:
+        """Render the options with the given primary keys selected.
+
+        Args:
+        ----
+            selected: The primary keys of the selected options as strings.
+
+        Returns:
+        -------
+            The options as HTML.
+        """
+        if not selected:
+            return self.unselected_html
+
+        options = (
+            selected_option if str(pk) in selected else option
+            for (pk, _), option, selected_option in zip(self, self.options, self.selected_options, strict=True)
+        )
+        return mark_safe("\n  ".join(options))  # noqa: S308 - Escaped by format_html
+
+    def get_instances(self, pks: Iterable[int]) -> list[Model]:
+        """Get the instances for the primary keys in name order."""
+        pks = set(pks)
+        return [instance for pk, instance in self if pk in pks]
+
+
+class ChoiceCache:
+    """Holds the choices for the current process and drops them after the data changes."""
+
+    def __init__(self) -> None:
+        """Initialize the cache, the choices are only loaded the first time they are used."""
+        self.generation: int | None = None
+        self.choices: dict[type[Model], ModelChoices] = {}
+        self.lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Drop the choices if the data was changed by an import, this is the only query for cached choices."""
+        generation = current_generation()
+        with self.lock:
+            if self.generation != generation:
+                self.choices = {}
+                self.generation = generation
+
+    def clear(self) -> None:
+        """Drop the choices even if the data did not change."""
+        with self.lock:
+            self.choices = {}
+            self.generation = None
+
+    def get(self, model: type[Model]) -> ModelChoices:
+        """Get the choices for a model, loading them if they are not cached."""
+        with self.lock:
+            if model not in self.choices:
+                self.choices[model] = ModelChoices(model)
+            return self.choices[model]
+
+
+CHOICE_CACHE = ChoiceCache()
+
+
+class CachedSelectMultiple(forms.SelectMultiple):
+    """SelectMultiple that renders its options from the choice cache."""
+
+    model: type[Model]
+
+    def render(
+        self,
+        name: str,
+        value: Any,  # noqa: ANN401 - Same as the base class
+        attrs: dict[str, Any] | None = None,
+        renderer: Any = None,  # noqa: ANN401, ARG002 - Same as the base class
+    ) -> SafeString:
+        """Render the select element without going through the template engine for every option."""
+        final_attrs = self.build_attrs(self.attrs, {**(attrs or {}), "multiple": True})
+        selected = {str(getattr(item, "pk", item)) for item in value or []}
+        options = CHOICE_CACHE.get(self.model).render_options(selected)
+        return format_html('<select name="{}"{}>\n  {}\n</select>', name, flatatt(final_attrs), options)
+
+
+class CachedModelMultipleChoiceField(forms.Field):
+    """ModelMultipleChoiceField that validates against the choice cache instead of the database."""
+
+    widget = CachedSelectMultiple
+    default_error_messages = {  # noqa: RUF012 - Same as the Django fields
+        "invalid_list": "Enter a list of values.",
+        "invalid_choice": "Select a valid choice. %(value)s is not one of the available choices.",
+    }
+
+    def __init__(self, model: type[Model], **kwargs: Any) -> None:  # noqa: ANN401 - Same as the base class
+        """Initialize the field.
+
+        Args:
+        ----
+            model: The model to choose instances of, it must have a name field.
+            kwargs: Passed to forms.Field.
+        """
+        super().__init__(**kwargs)
+        self.model = model
+        self.widget.model = model
+
+    def to_python(self, value: Any) -> list[str]:  # noqa: ANN401 - Same as the base class
+        """Get the selected primary keys as strings."""
+        if not value:
+            return []
+        if not isinstance(value, list | tuple):
+            raise ValidationError(self.error_messages["invalid_list"], code="invalid_list")
+        return [str(item) for item in value]
+
+    def clean(self, value: Any) -> list[Model]:  # noqa: ANN401 - Same as the base class
+        """Validate the selected primary keys and get their instances in name order."""
+        value = self.to_python(value)
+        self.validate(value)
+        self.run_validators(value)
+
+        choices = CHOICE_CACHE.get(self.model)
+        pks = []
+        for item in value:
+            try:
+                pk = int(item)
+            except ValueError:
+                pk = None
+            if pk not in choices.instances:
+                raise ValidationError(
+                    self.error_messages["invalid_choice"],
+                    code="invalid_choice",
+                    params={"value": item},
+                )
+            pks.append(pk)
+
+        return choices.get_instances(pks)
@@ -0,0 +1,340 @@
+"""In-memory bitset index for answering searches without the nested ORM queries in games.functions.
+
+Every game that is on at least one platform gets a dense index, and the GamePlatform and GamePlatformCountry tables are
+loaded into Python ints that are used as bitsets of those indexes. A set of GamePlatform rows is stored as a bitset of
+games for every platform, which makes every filter in games.functions a handful of bitwise AND/OR/ANDNOT operations.
+
+The results are the same as the ORM functions in games.functions, including the places where they behave in unexpected
+ways (country_form_and only uses the first country, country_form_exclusive checks platform_include), so the two can be
+swapped at any time.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from games.generation import current_generation
+from games.models import GamePlatform, GamePlatformCountry
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from django.forms import BaseFormSet
+
+    from games.forms import SelectForm
+
+logger = logging.getLogger(__name__)
+
+# A set of GamePlatform rows, stored as a bitset of games for every platform
+Rows = dict[int, int]
+
+# A bitset without its leading empty bytes, stored as (offset, bits)
+PackedBits = tuple[int, int]
+
+# Positions of the set bits in every possible byte, used when converting bitsets back into game ids
+BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def pack_bits(indexes: Iterable[int]) -> PackedBits:
+    """Build a bitset from a list of indexes and strip the leading empty bytes.
+
+    There are a lot of platform/country combinations and most of them only contain a small range of games, so storing
+    them without the leading empty bytes saves a lot of memory.
+
+    Args:
+    ----
+        indexes: The indexes of the bits that should be set.
+
+    Returns:
+    -------
+        The offset of the first stored bit and the bitset starting at that offset.
+    """
+    indexes = list(indexes)
+    if not indexes:
+        return 0, 0
+
+    offset = min(indexes) & ~7
+    buffer = bytearray(((max(indexes) - offset) >> 3) + 1)
+    for index in indexes:
+        buffer[(index - offset) >> 3] |= 1 << ((index - offset) & 7)
+
+    return offset, int.from_bytes(buffer, "little")
+
+
+def unpack_bits(packed: PackedBits) -> int:
+    """Convert a packed bitset back into a normal bitset."""
+    offset, bits = packed
+    return bits << offset
+
+
+def make_bits(indexes: Iterable[int]) -> int:
+    """Build a bitset from a list of indexes."""
+    return unpack_bits(pack_bits(indexes))
+
+
+def bit_indexes(bits: int) -> Iterator[int]:
+    """Get the index of every set bit in a bitset."""
+    for byte_index, byte in enumerate(bits.to_bytes((bits.bit_length() + 7) // 8, "little")):
+        if byte:
+            for bit in BYTE_BITS[byte]:
+                yield (byte_index << 3) + bit
+
+
+def union(bitsets: Iterable[int]) -> int:
+    """Get the union of multiple bitsets."""
+    result = 0
+    for bits in bitsets:
+        result |= bits
+    return result
+
+
+def games_in_rows(rows: Rows) -> int:
+    """Get a bitset of every game that has at least one row in the rows."""
+    return union(rows.values())
+
+
+def filter_rows(rows: Rows, games: int) -> Rows:
+    """Keep only the rows for the games in the bitset, the same as gp.filter(game__in=games)."""
+    return {platform_id: bits & games for platform_id, bits in rows.items() if bits & games}
+
+
+def exclude_rows(rows: Rows, games: int) -> Rows:
+    """Remove the rows for the games in the bitset, the same as gp.exclude(game__in=games)."""
+    return {platform_id: bits & ~games for platform_id, bits in rows.items() if bits & ~games}
+
+
+def restrict_rows(rows: Rows, platform_ids: Iterable[int]) -> Rows:
+    """Keep only the rows for the given platforms, the same as gp.filter(platform__in=platform_ids)."""
+    return {platform_id: rows[platform_id] for platform_id in set(platform_ids) if platform_id in rows}
+
+
+class ExclusivityIndex:
+    """Bitsets for every platform and every platform/country combination."""
+
+    def __init__(  # noqa: PLR0913 - Every bitset needs to be passed in
+        self,
+        generation: int,
+        game_ids: list[int],
+        platform_games: dict[int, int],
+        platform_count_games: dict[int, int],
+        platform_country_games: dict[int, dict[int, PackedBits]],
+    ) -> None:
+        """Initialize the index, use ExclusivityIndex.build to create an index from the database."""
+        self.generation = generation
+        self.game_ids = game_ids
+        self.platform_games = platform_games
+        self.platform_count_games = platform_count_games
+        self.platform_country_games = platform_country_games
+
+    @classmethod
+    def build(cls) -> ExclusivityIndex:
+        """Build the index from the database."""
+        # Get the generation before loading anything so an import that happens while building causes another rebuild
+        generation = current_generation()
+
+        platforms_by_game: defaultdict[int, list[int]] = defaultdict(list)
+        for game_id, platform_id in GamePlatform.objects.values_list("game_id", "platform_id").iterator():
+            platforms_by_game[game_id].append(platform_id)
+
+        # Games on the same platforms get neighbouring indexes which keeps the packed bitsets short
+        game_ids = sorted(platforms_by_game, key=lambda game_id: (sorted(set(platforms_by_game[game_id])), game_id))
+        game_indexes = {game_id: index for index, game_id in enumerate(game_ids)}
+
+        platform_indexes: defaultdict[int, list[int]] = defaultdict(list)
+        platform_count_indexes: defaultdict[int, list[int]] = defaultdict(list)
+        for game_id, platform_ids in platforms_by_game.items():
+            platform_count_indexes[len(set(platform_ids))].append(game_indexes[game_id])
+            for platform_id in set(platform_ids):
+                platform_indexes[platform_id].append(game_indexes[game_id])
+
+        platform_country_indexes: defaultdict[int, defaultdict[int, list[int]]] = defaultdict(lambda: defaultdict(list))
+        game_platform_countries = GamePlatformCountry.objects.values_list(
+            "game_platform__game_id",
+            "game_platform__platform_id",
+            "country_id",
+        )
+        for game_id, platform_id, country_id in game_platform_countries.iterator():
+            platform_country_indexes[platform_id][country_id].append(game_indexes[game_id])
+
+        logger.info("Built exclusivity index for %s games (generation %s)", len(game_ids), generation)
+
+        return cls(
+            generation=generation,
+            game_ids=game_ids,
+            platform_games={key: make_bits(value) for key, value in platform_indexes.items()},
+            platform_count_games={key: make_bits(value) for key, value in platform_count_indexes.items()},
+            platform_country_games={
+                platform_id: {country_id: pack_bits(indexes) for country_id, indexes in countries.items()}
+                for platform_id, countries in platform_country_indexes.items()
+            },
+        )
+
+    def rows_with_any_country(self, rows: Rows, country_ids: Iterable[int]) -> Rows:
+        """Get the rows that have at least one of the countries."""
+        country_ids = set(country_ids)
+        matching_rows = {}
+        for platform_id, bits in rows.items():
+            countries = self.platform_country_games.get(platform_id, {})
+            with_country = union(unpack_bits(countries[country_id]) for country_id in country_ids & countries.keys())
+            if bits & with_country:
+                matching_rows[platform_id] = bits & with_country
+        return matching_rows
+
+    def rows_without_any_country(self, rows: Rows, country_ids: Iterable[int]) -> Rows:
+        """Get the rows that have none of the countries, including rows without any countries."""
+        with_country = self.rows_with_any_country(rows, country_ids)
+        matching_rows = {}
+        for platform_id, bits in rows.items():
+            if bits & ~with_country.get(platform_id, 0):
+                matching_rows[platform_id] = bits & ~with_country.get(platform_id, 0)
+        return matching_rows
+
+    def rows_only_in_countries(self, rows: Rows, country_ids: Iterable[int]) -> Rows:
+        """Get the rows that are not in any country other than the given countries."""
+        country_ids = set(country_ids)
+        other_country_ids = {
+            country_id
+            for platform_id in rows
+            for country_id in self.platform_country_games.get(platform_id, {})
+            if country_id not in country_ids
+        }
+        return self.rows_without_any_country(rows, other_country_ids)
+
+    def platform_form(self, form: SelectForm, rows: Rows) -> Rows:
+        """Filter the rows using the platform parameters, the same as games.functions.platform_form."""
+        platform_ids = [platform.pk for platform in form.cleaned_data["platforms"]]
+        include = form.cleaned_data["platform_include"] == "Yes"
+
+        if form.cleaned_data["platform_search_type"] == "And":
+            games = self.platform_games.get(platform_ids[0], 0)
+            for platform_id in platform_ids[1:]:
+                games &= self.platform_games.get(platform_id, 0)
+
+            if include:
+                return restrict_rows(filter_rows(rows, games), platform_ids)
+            return exclude_rows(rows, games)
+
+        if form.cleaned_data["platform_search_type"] == "Or":
+            if include:
+                return restrict_rows(rows, platform_ids)
+            return exclude_rows(rows, union(self.platform_games.get(platform_id, 0) for platform_id in platform_ids))
+
+        if form.cleaned_data["platform_search_type"] == "Exclusive":
+            other_platforms = union(
+                bits for platform_id, bits in self.platform_games.items() if platform_id not in platform_ids
+            )
+            games = self.platform_count_games.get(len(platform_ids), 0) & ~other_platforms
+
+            if include:
+                return filter_rows(rows, games)
+            return exclude_rows(rows, games)
+
+        msg = f"Unknown platform_search_type {form.cleaned_data['platform_search_type']}"
+        raise ValueError(msg)
+
+    def country_form(self, form: SelectForm, rows: Rows) -> Rows:
+        """Filter the rows using the country parameters, the same as games.functions.country_form."""
+        country_ids = [country.pk for country in form.cleaned_data["countries"]]
+        include = form.cleaned_data["country_include"] == "Yes"
+
+        if form.cleaned_data["country_search_type"] == "And":
+            # Only the first country is checked, the same as country_form_and
+            matching_rows = self.rows_with_any_country(rows, country_ids[:1])
+            if include:
+                return filter_rows(rows, games_in_rows(matching_rows))
+            return matching_rows
+
+        if form.cleaned_data["country_search_type"] == "Or":
+            if include:
+                return filter_rows(rows, games_in_rows(self.rows_with_any_country(rows, country_ids)))
+            return filter_rows(rows, games_in_rows(self.rows_without_any_country(rows, country_ids)))
+
+        if form.cleaned_data["country_search_type"] == "Exclusive":
+            games = games_in_rows(self.rows_only_in_countries(rows, country_ids))
+
+            # country_form_exclusive checks platform_include instead of country_include
+            if form.cleaned_data["platform_include"] == "Yes":
+                return filter_rows(rows, games)
+            return exclude_rows(rows, games)
+
+        msg = f"Unknown country_search_type {form.cleaned_data['country_search_type']}"
+        raise ValueError(msg)
+
+    def form_games(self, form: SelectForm) -> int:
+        """Get a bitset of the games that match a single form."""
+        rows = dict(self.platform_games)
+
+        if form.cleaned_data.get("platforms"):
+            rows = self.platform_form(form, rows)
+        if form.cleaned_data.get("countries"):
+            rows = self.country_form(form, rows)
+
+        return games_in_rows(rows)
+
+    def and_form_parser(self, formset: BaseFormSet) -> int:
+        """Get a bitset of the games that match every form, the same as games.functions.and_form_parser."""
+        intersection = 0
+        first_form = True
+        for form in formset:
+            if form.is_valid():
+                games = self.form_games(form)
+                intersection = games if first_form else intersection & games
+                first_form = False
+        return intersection
+
+    def or_form_parser(self, formset: BaseFormSet) -> int:
+        """Get a bitset of the games that match any form, the same as games.functions.or_form_parser."""
+        games = 0
+        for form in formset:
+            if form.is_valid():
+                games |= self.form_games(form)
+        return games
+
+    def search(self, formset: BaseFormSet, search_type: str) -> set[int]:
+        """Get the ids of the games that match a search.
+
+        Args:
+        ----
+            formset: The formset that was submitted.
+            search_type: The type of search to perform.
+
+        Returns:
+        -------
+            The ids of every game that matches the search.
+        """
+        if search_type == "And Search":
+            games = self.and_form_parser(formset)
+        elif search_type == "Or Search":
+            games = self.or_form_parser(formset)
+        else:
+            return set()
+
+        return {self.game_ids[index] for index in bit_indexes(games)}
+
+
+class ExclusivityIndexHolder:
+    """Holds the index for the current process and rebuilds it after the data changes."""
+
+    def __init__(self) -> None:
+        """Initialize the holder, the index is only built the first time it is used."""
+        self.index: ExclusivityIndex | None = None
+        self.lock = threading.Lock()
+
+    def get(self) -> ExclusivityIndex:
+        """Get the index, rebuilding it first if the data was changed by an import."""
+        generation = current_generation()
+        with self.lock:
+            if self.index is None or self.index.generation != generation:
+                self.index = ExclusivityIndex.build()
+            return self.index
+
+    def rebuild(self) -> ExclusivityIndex:
+        """Rebuild the index even if the data did not change."""
+        with self.lock:
+            self.index = ExclusivityIndex.build()
+            return self.index
+
+
+EXCLUSIVITY_INDEX = ExclusivityIndexHolder()
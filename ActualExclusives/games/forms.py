@@ -1,7 +1,10 @@
 """Form for the games app."""
+from typing import Any
+
 from django import forms
-from django.forms import formset_factory
+from django.forms import BaseFormSet, formset_factory
 
+from games.choice_cache import CHOICE_CACHE, CachedModelMultipleChoiceField
 from games.models import Country, Platform
 
 
@@ -18,14 +21,23 @@ class SelectForm(forms.Form):
         ("And", "And"),
     )
 
-    platforms = forms.ModelMultipleChoiceField(queryset=Platform.objects.all().order_by("name"), required=False)
+    platforms = CachedModelMultipleChoiceField(Platform, required=False)
     platform_include = forms.ChoiceField(choices=YES_NO_CHOICES, required=False)
     platform_search_type = forms.ChoiceField(choices=AND_OR_CHOICES, required=False)
 
-    countries = forms.ModelMultipleChoiceField(queryset=Country.objects.all().order_by("name"), required=False)
+    countries = CachedModelMultipleChoiceField(Country, required=False)
     country_include = forms.ChoiceField(choices=YES_NO_CHOICES, required=False)
     country_search_type = forms.ChoiceField(choices=AND_OR_CHOICES, required=False)
 
 
+class BaseSelectFormSet(BaseFormSet):
+    """Formset that checks if the cached choices are still current once instead of in every form."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:  # noqa: ANN401 - Same as the base class
+        """Initialize the formset."""
+        CHOICE_CACHE.refresh()
+        super().__init__(*args, **kwargs)
+
+
 # Need to make this into a formset to make it possible to have multiple forms that are combined together
-SelectFormSet = formset_factory(SelectForm, extra=1)
+SelectFormSet = formset_factory(SelectForm, formset=BaseSelectFormSet, extra=1)
@@ -3,9 +3,14 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING
 
-from django.db.models import Count, Q, QuerySet
+from django.conf import settings
+from django.db.models import Q, QuerySet
+from django.db.models.expressions import RawSQL
 
-from games.models import Country, Game, GamePlatform, Platform
+from games.exclusivity_index import EXCLUSIVITY_INDEX
+from games.models import Country, Game, GamePlatform
+from games.query_compiler import compile_formset
+from games.signatures import MAX_SUBSET_COUNTRIES, make_signature, subset_signatures
 
 if TYPE_CHECKING:
     from django.forms import BaseFormSet
@@ -25,16 +30,9 @@ def platform_form_exclusive(form: SelectForm, gp: QuerySet[GamePlatform]) -> Que
     -------
         A queryset that is filtered for games that are platform exclusive.
     """
-    platforms = Platform.objects.exclude(id__in=form.cleaned_data["platforms"])
-
-    # Get all games that are on this platform
-    exclusive_games = Game.objects.exclude(gameplatform__platform__in=platforms)
-
-    # Count the number of platforms each game is on
-    exclusive_games = exclusive_games.annotate(counter=Count("gameplatform"))
-
-    # Filter out games that do not have the right number of platforms
-    exclusive_games = exclusive_games.filter(counter=len(form.cleaned_data["platforms"]))
+    # Get all games that are on exactly these platforms
+    signature = make_signature(platform.pk for platform in form.cleaned_data["platforms"])
+    exclusive_games = Game.objects.filter(gamesignature__platform_signature=signature)
 
     if form.cleaned_data["platform_include"] == "Yes":
         return gp.filter(game__in=exclusive_games)
@@ -124,12 +122,21 @@ def country_form_exclusive(form: SelectForm, gp: QuerySet[GamePlatform]) -> Quer
     -------
         A queryset that is filtered for games that are country exclusive.
     """
-    other_countries = Country.objects.exclude(id__in=form.cleaned_data["countries"])
+    country_ids = [country.pk for country in form.cleaned_data["countries"]]
 
-    # Filter based on the video games
-    exclusive_games = Game.objects.filter(
-        Q(gameplatform__in=gp) & ~Q(gameplatform__gameplatformcountry__country__in=other_countries),
-    )
+    if len(country_ids) <= MAX_SUBSET_COUNTRIES:
+        # A release is exclusive when its countries are any subset of the selected countries
+        exclusive_game_platforms = gp.filter(
+            gameplatformsignature__country_signature__in=subset_signatures(country_ids),
+        )
+        exclusive_games = Game.objects.filter(gameplatform__in=exclusive_game_platforms)
+    else:
+        other_countries = Country.objects.exclude(id__in=country_ids)
+
+        # Filter based on the video games
+        exclusive_games = Game.objects.filter(
+            Q(gameplatform__in=gp) & ~Q(gameplatform__gameplatformcountry__country__in=other_countries),
+        )
 
     if form.cleaned_data["platform_include"] == "Yes":
         return gp.filter(game__in=exclusive_games)
@@ -235,25 +242,26 @@ def form_parser(formset: BaseFormSet, search_type: str) -> QuerySet[Game]:
     -------
         The fully filtered queryset of games.
     """
-    the_set: set[int] = set()
     games = Game.objects.none()
 
-    if search_type == "And Search" and (the_set := and_form_parser(formset, the_set)):
-        games = Game.objects.filter(id__in=the_set)
+    if settings.EXCLUSIVITY_INDEX_ENABLED:
+        if the_set := EXCLUSIVITY_INDEX.get().search(formset, search_type):
+            games = Game.objects.filter(id__in=the_set)
 
-    if search_type == "Or Search" and (the_set := or_form_parser(formset, the_set)):
-        games = Game.objects.filter(id__in=the_set)
+    # Run the whole search as a single statement instead of using and_form_parser and or_form_parser
+    elif compiled_search := compile_formset(formset, search_type):
+        games = Game.objects.filter(id__in=RawSQL(*compiled_search))
 
-    return (
-        games.prefetch_related("gameplatform_set__platform", "gameplatform_set__gameplatformcountry_set__country")
-        .distinct()
-        .order_by("name")
-    )
+    # The related objects are prefetched by games.pagination for only the page that is shown
+    return games.distinct().order_by("name", "id")
 
 
 def and_form_parser(formset: BaseFormSet, intersection_set: set[int]) -> set[int]:
     """Parse the forms in and style and return a queryset of games.
 
+    form_parser uses games.query_compiler to do the same thing in a single statement, this is kept as the reference
+    implementation that the compiled statements are tested against.
+
     Args:
     ----
         formset: The formset that was submitted.
@@ -263,6 +271,8 @@ def and_form_parser(formset: BaseFormSet, intersection_set: set[int]) -> set[int
     -------
         The fully filtered set of games.
     """
+    # An empty set means that nothing has been intersected yet
+    first_form = not intersection_set
     for form in formset:
         # Check if form is valid
         if form.is_valid():
@@ -275,13 +285,17 @@ def and_form_parser(formset: BaseFormSet, intersection_set: set[int]) -> set[int
 
                 # Get all game.id values in gp
             game_ids = gp.values_list("game__id", flat=True)
-            intersection_set = intersection_set.intersection(set(game_ids)) if intersection_set else set(game_ids)
+            intersection_set = set(game_ids) if first_form else intersection_set.intersection(set(game_ids))
+            first_form = False
     return intersection_set
 
 
 def or_form_parser(formset: BaseFormSet, union_set: set[int]) -> set[int]:
     """Parse the forms in or style and return a queryset of games.
 
+    form_parser uses games.query_compiler to do the same thing in a single statement, this is kept as the reference
+    implementation that the compiled statements are tested against.
+
     Args:
     ----
         formset: The formset that was submitted.
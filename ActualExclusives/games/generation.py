@@ -0,0 +1,36 @@
+"""Track when the imported data changes.
+
+The scrapers and the website run in different processes, so anything the website builds from the data (indexes, caches)
+needs a way to find out that an import happened. The scrapers call bump_generation after importing and the website
+compares current_generation with the generation it built its data from.
+"""
+from __future__ import annotations
+
+import datetime
+
+from django.db.models import F
+
+from games.models import DataGeneration
+
+# There is only ever one row in the DataGeneration table
+GENERATION_ID = 1
+
+
+def current_generation() -> int:
+    """Get the current data generation.
+
+    Returns
+    -------
+        The current data generation, 0 if nothing has been imported since the counter was added.
+    """
+    generation = DataGeneration.objects.filter(id=GENERATION_ID).values_list("generation", flat=True).first()
+    return generation or 0
+
+
+def bump_generation() -> None:
+    """Mark the imported data as changed."""
+    now = datetime.datetime.now().astimezone()
+    updated = DataGeneration.objects.filter(id=GENERATION_ID).update(generation=F("generation") + 1, modified=now)
+
+    if not updated:
+        DataGeneration.objects.get_or_create(id=GENERATION_ID, defaults={"generation": 1, "modified": now})
@@ -0,0 +1,270 @@
+"""Measure where the time goes in each request.
+
+InstrumentationMiddleware starts a RequestProfile for every request, and the views wrap each part of their work in
+profile_stage so the wall time, the number of SQL statements, the time spent in SQL, and the number of rows that were
+loaded are recorded separately for every stage. The results are sent back in a Server-Timing header, written to the
+log as JSON, and added to a rolling latency histogram for the endpoint that can be read from the status page. Streamed
+responses are measured until their last chunk is sent, after their headers, so they only have the log and histogram.
+
+Everything is off unless settings.INSTRUMENTATION_ENABLED is True, profile_stage does nothing outside of a profile.
+"""
+from __future__ import annotations
+
+import bisect
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets in milliseconds, the last bucket has every slower request
+HISTOGRAM_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, math.inf)
+
+# Number of recent requests for each endpoint that the histogram is built from
+HISTOGRAM_WINDOW = 1000
+
+
+class Stage:
+    """Measurements for one part of a request."""
+
+    def __init__(self, name: str) -> None:
+        """Initialize the stage."""
+        self.name = name
+        self.duration = 0.0
+        self.queries = 0
+        self.sql_duration = 0.0
+        self.rows = 0
+
+    def add_rows(self, rows: int) -> None:
+        """Record that rows were loaded from the database."""
+        self.rows += rows
+
+    def record_sql(  # noqa: PLR0913 - Signature is set by Django
+        self,
+        execute: Callable[..., Any],
+        sql: str,
+        params: Any,  # noqa: ANN401 - Any parameters
+        many: bool,  # noqa: FBT001 - Signature is set by Django
+        context: dict[str, Any],
+    ) -> Any:  # noqa: ANN401 - Wraps any statement
+        """Database execute wrapper that counts the statements and their time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_duration += time.perf_counter() - start
+
+    def as_dict(self) -> dict[str, Any]:
+        """Get the measurements in milliseconds."""
+        return {
+            "name": self.name,
+            "duration_ms": round(self.duration * 1000, 3),
+            "queries": self.queries,
+            "sql_ms": round(self.sql_duration * 1000, 3),
+            "rows": self.rows,
+        }
+
+
+class RequestProfile:
+    """The stages of a single request."""
+
+    def __init__(self) -> None:
+        """Initialize the profile."""
+        self.stages: list[Stage] = []
+
+    def server_timing(self, total: Stage) -> str:
+        """Format the stages as a Server-Timing header."""
+        metrics = [
+            f'{stage.name};dur={stage.duration * 1000:.3f};desc="{stage.queries} queries {stage.rows} rows"'
+            for stage in [*self.stages, total]
+        ]
+        metrics.append(f"sql;dur={total.sql_duration * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+CURRENT_PROFILE: contextvars.ContextVar[RequestProfile | None] = contextvars.ContextVar(
+    "CURRENT_PROFILE",
+    default=None,
+)
+
+
+@contextlib.contextmanager
+def measure_stage(stage: Stage) -> Iterator[Stage]:
+    """Measure the wall time and SQL of the code inside the block."""
+    start = time.perf_counter()
+    try:
+        with connection.execute_wrapper(stage.record_sql):
+            yield stage
+    finally:
+        stage.duration += time.perf_counter() - start
+
+
+@contextlib.contextmanager
+def profile_stage(name: str) -> Iterator[Stage]:
+    """Record a stage of the current request.
+
+    Args:
+    ----
+        name: The name of the stage, it is used as the metric name in the Server-Timing header.
+
+    Yields:
+    ------
+        The stage, call add_rows on it to record how many rows were loaded. Outside of a profiled request the stage is
+        not recorded anywhere.
+    """
+    profile = CURRENT_PROFILE.get()
+    if profile is None:
+        yield Stage(name)
+        return
+
+    stage = Stage(name)
+    profile.stages.append(stage)
+    with measure_stage(stage):
+        yield stage
+
+
+class LatencyHistogram:
+    """Latency of the most recent requests to every endpoint."""
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW) -> None:
+        """Initialize the histogram."""
+        self.window = window
+        self.samples: dict[str, collections.deque[float]] = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, duration_ms: float) -> None:
+        """Record the latency of a request."""
+        with self.lock:
+            if endpoint not in self.samples:
+                self.samples[endpoint] = collections.deque(maxlen=self.window)
+            self.samples[endpoint].append(duration_ms)
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """Get the bucket counts and percentiles for every endpoint."""
+        with self.lock:
+            samples = {endpoint: sorted(durations) for endpoint, durations in self.samples.items()}
+
+        snapshot = {}
+        for endpoint, durations in sorted(samples.items()):
+            buckets = [0] * len(HISTOGRAM_BUCKETS_MS)
+            for duration in durations:
+                buckets[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, duration)] += 1
+
+            snapshot[endpoint] = {
+                "count": len(durations),
+                "buckets": [
+                    {"le": str(bound), "count": count}
+                    for bound, count in zip(HISTOGRAM_BUCKETS_MS, buckets, strict=True)
+                ],
+                "p50_ms": round(nearest_rank(durations, 50), 3),
+                "p95_ms": round(nearest_rank(durations, 95), 3),
+                "p99_ms": round(nearest_rank(durations, 99), 3),
+            }
+
+        return snapshot
+
+    def clear(self) -> None:
+        """Drop every sample."""
+        with self.lock:
+            self.samples = {}
+
+
+def nearest_rank(ordered: list[float], percent: float) -> float:
+    """Get a percentile of sorted values using the nearest rank method."""
+    return ordered[max(math.ceil(percent / 100 * len(ordered)) - 1, 0)]
+
+
+LATENCY_HISTOGRAM = LatencyHistogram()
+
+
+class InstrumentationMiddleware:
+    """Profile every request when settings.INSTRUMENTATION_ENABLED is True."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        """Initialize the middleware, Django skips it when instrumentation is disabled."""
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Profile the request, a streamed response is profiled until its last chunk is sent."""
+        profile = RequestProfile()
+        token = CURRENT_PROFILE.set(profile)
+        total = Stage("total")
+        try:
+            with measure_stage(total):
+                response = self.get_response(request)
+        finally:
+            CURRENT_PROFILE.reset(token)
+
+        if response.streaming:
+            # The headers are sent before the results are searched for, so the times only go to the log and histogram
+            response.streaming_content = self.profile_stream(
+                response.streaming_content,
+                request,
+                response,
+                profile,
+                total,
+            )
+        else:
+            self.record(request, response, profile, total)
+            response["Server-Timing"] = profile.server_timing(total)
+        return response
+
+    def profile_stream(  # noqa: PLR0913 - Everything that is recorded after the last chunk
+        self,
+        content: Iterable[bytes],
+        request: HttpRequest,
+        response: HttpResponse,
+        profile: RequestProfile,
+        total: Stage,
+    ) -> Iterator[bytes]:
+        """Send the chunks of a streamed response, profiling the work for each one, and record it once all are sent."""
+        chunks = iter(content)
+        while True:
+            token = CURRENT_PROFILE.set(profile)
+            try:
+                with measure_stage(total):
+                    chunk = next(chunks, None)
+            finally:
+                CURRENT_PROFILE.reset(token)
+            if chunk is None:
+                break
+            yield chunk
+
+        self.record(request, response, profile, total)
+
+    def record(self, request: HttpRequest, response: HttpResponse, profile: RequestProfile, total: Stage) -> None:
+        """Add the request to the latency histogram and log its stages as JSON."""
+        total.rows = sum(stage.rows for stage in profile.stages)
+        endpoint = request.resolver_match.view_name if request.resolver_match else request.path
+        LATENCY_HISTOGRAM.record(endpoint, total.duration * 1000)
+
+        logger.info(
+            json.dumps(
+                {
+                    "endpoint": endpoint,
+                    "method": request.method,
+                    "status": response.status_code,
+                    "streaming": response.streaming,
+                    **{key: value for key, value in total.as_dict().items() if key != "name"},
+                    "stages": [stage.as_dict() for stage in profile.stages],
+                },
+            ),
+        )
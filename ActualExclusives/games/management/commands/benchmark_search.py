@@ -0,0 +1,34 @@
+"""Time every kind of search and write the results as JSON."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from django.core.management.base import BaseCommand
+
+from games.benchmark import run_benchmark
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class Command(BaseCommand):
+    """Benchmark the searches."""
+
+    help = "Time every search combination through form_parser and the games view."  # noqa: A003 - Name is set by Django
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add the arguments."""
+        parser.add_argument("--repeat", type=int, default=5, help="Number of times to run each search.")
+        parser.add_argument("--output", type=Path, help="Write the results to this file instead of stdout.")
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002 - Signature is set by Django
+        """Run the benchmark."""
+        results = json.dumps(run_benchmark(options["repeat"]), indent=2)
+
+        if options["output"]:
+            options["output"].write_text(results)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        else:
+            self.stdout.write(results)
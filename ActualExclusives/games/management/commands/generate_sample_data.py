@@ -0,0 +1,44 @@
+"""Fill the database with synthetic games for benchmarks."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from games.sample_data import DatabaseNotEmptyError, generate_sample_data
+
+if TYPE_CHECKING:
+    from argparse import ArgumentParser
+
+
+class Command(BaseCommand):
+    """Generate a reproducible synthetic catalogue."""
+
+    help = "Fill the database with synthetic games, platforms, and countries."  # noqa: A003 - Name is set by Django
+
+    def add_arguments(self, parser: ArgumentParser) -> None:
+        """Add the arguments."""
+        parser.add_argument("--games", type=int, default=500_000, help="Number of games to generate.")
+        parser.add_argument("--platforms", type=int, default=300, help="Number of platforms to generate.")
+        parser.add_argument("--countries", type=int, default=50, help="Number of countries to generate.")
+        parser.add_argument("--seed", type=int, default=0, help="The same seed always generates the same data.")
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete every game, platform, and country that is already in the database first.",
+        )
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002 - Signature is set by Django
+        """Generate the data."""
+        try:
+            generate_sample_data(
+                options["games"],
+                options["platforms"],
+                options["countries"],
+                options["seed"],
+                clear=options["clear"],
+            )
+        except DatabaseNotEmptyError as e:
+            raise CommandError(e) from e
+
+        self.stdout.write(self.style.SUCCESS(f"Generated {options['games']} games"))
@@ -0,0 +1,24 @@
+"""Rebuild the GameSignature and GamePlatformSignature tables."""
+from __future__ import annotations
+
+from typing import Any
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from games.generation import bump_generation
+from games.signatures import rebuild_signatures
+
+
+class Command(BaseCommand):
+    """Rebuild the signatures for every game."""
+
+    help = "Recalculate the platform and country signatures for every game."  # noqa: A003 - Name is set by Django
+
+    def handle(self, *args: Any, **options: Any) -> None:  # noqa: ANN401, ARG002 - Signature is set by Django
+        """Rebuild the signatures."""
+        with transaction.atomic():
+            rebuild_signatures()
+            bump_generation()
+
+        self.stdout.write(self.style.SUCCESS("Rebuilt signatures"))
@@ -0,0 +1,369 @@
+"""Counters and histograms for the scrape and the searches, exported in the Prometheus text format.
+
+The scrape records every request it sends to the API, the bytes and status of the responses, how long the rate limit
+made it wait, what each import did, and how long the imports spent writing to the database. The views record how long
+every search takes. Everything is kept in METRICS for the life of the process.
+
+The web server serves the metrics of its process at /metrics to requests that send settings.METRICS_TOKEN as their
+bearer token, it runs behind a proxy so the address of the client can't be trusted. Scrapes that are run by cron
+finish before anything could read them, so they write their metrics to settings.METRICS_FILE when they are done, where
+the textfile collector of the node exporter can pick them up, and they can also serve them on settings.METRICS_PORT
+while they run.
+"""
+from __future__ import annotations
+
+import abc
+import bisect
+import contextlib
+import logging
+import math
+import pathlib
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds of the histogram buckets in seconds, a bucket for every slower value is added to each histogram
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Import outcome for games that were not outdated, the other outcomes are the values of ImportOutcome
+UP_TO_DATE = "up_to_date"
+
+
+class HistogramSample(NamedTuple):
+    """The observations of a histogram with one set of labels."""
+
+    # The number of observations in each bucket, not including the ones in the buckets before it
+    buckets: list[int]
+    total: float
+    count: int
+
+
+def format_value(value: float) -> str:
+    """Format a sample value, whole numbers are written without a fraction."""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+def escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    """Format the labels of a sample, extra is a label that is already formatted."""
+    labels = [f'{name}="{escape(value)}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Metric(abc.ABC):
+    """A metric with a value for every set of labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> None:
+        """Initialize the metric.
+
+        Args:
+        ----
+            name: The name of the metric.
+            description: The help text of the metric.
+            label_names: The names of the labels every value has.
+        """
+        self.name = name
+        self.description = description
+        self.label_names = label_names
+        self.lock = threading.Lock()
+
+    def label_values(self, labels: dict[str, Any]) -> tuple[str, ...]:
+        """Get the values of the labels in the order of the label names.
+
+        Raises
+        ------
+            ValueError: The labels are not the label names of the metric.
+        """
+        if set(labels) != set(self.label_names):
+            msg = f"{self.name} has the labels {self.label_names}, not {tuple(labels)}"
+            raise ValueError(msg)
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render(self) -> list[str]:
+        """Get the lines of the metric in the text format."""
+        return [f"# HELP {self.name} {escape(self.description)}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+    @abc.abstractmethod
+    def samples(self) -> list[str]:
+        """Get the lines with the values of the metric."""
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        """Drop every value."""
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> None:
+        """Initialize the counter."""
+        super().__init__(name, description, label_names)
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:  # noqa: ANN401 - Label values are formatted as strings
+        """Add to the value for the labels."""
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:  # noqa: ANN401 - Label values are formatted as strings
+        """Get the value for the labels."""
+        key = self.label_values(labels)
+        with self.lock:
+            return self.values.get(key, 0)
+
+    def samples(self) -> list[str]:
+        """Get the lines with the values of the counter, a counter without labels is 0 until it is increased."""
+        with self.lock:
+            values = dict(self.values)
+        if not self.label_names:
+            values.setdefault((), 0)
+        return [
+            f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+    def clear(self) -> None:
+        """Drop every value."""
+        with self.lock:
+            self.values = {}
+
+
+class Histogram(Metric):
+    """The distribution of values like durations."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        """Initialize the histogram.
+
+        Args:
+        ----
+            name: The name of the histogram.
+            description: The help text of the histogram.
+            label_names: The names of the labels every observation has.
+            buckets: The upper bounds of the buckets.
+        """
+        super().__init__(name, description, label_names)
+        self.buckets = (*sorted(buckets), math.inf)
+        self.values: dict[tuple[str, ...], HistogramSample] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:  # noqa: ANN401 - Label values are formatted as strings
+        """Record a value for the labels."""
+        key = self.label_values(labels)
+        with self.lock:
+            sample = self.values.get(key) or HistogramSample([0] * len(self.buckets), 0, 0)
+            sample.buckets[bisect.bisect_left(self.buckets, value)] += 1
+            self.values[key] = sample._replace(total=sample.total + value, count=sample.count + 1)
+
+    @contextlib.contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:  # noqa: ANN401 - Label values are formatted as strings
+        """Record how many seconds the code inside the block takes, it can also decorate a function."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def sample(self, **labels: Any) -> HistogramSample:  # noqa: ANN401 - Label values are formatted as strings
+        """Get the observations for the labels."""
+        key = self.label_values(labels)
+        with self.lock:
+            sample = self.values.get(key) or HistogramSample([0] * len(self.buckets), 0, 0)
+            return sample._replace(buckets=list(sample.buckets))
+
+    def samples(self) -> list[str]:
+        """Get the lines with the cumulative buckets, sum, and count for every set of labels."""
+        with self.lock:
+            values = {key: sample._replace(buckets=list(sample.buckets)) for key, sample in self.values.items()}
+        if not self.label_names:
+            values.setdefault((), HistogramSample([0] * len(self.buckets), 0, 0))
+
+        lines = []
+        for key, sample in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, sample.buckets, strict=True):
+                cumulative += count
+                le = f'le="{format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(sample.total)}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, key)} {sample.count}")
+        return lines
+
+    def clear(self) -> None:
+        """Drop every observation."""
+        with self.lock:
+            self.values = {}
+
+
+class MetricsRegistry:
+    """Every metric of the process."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.metrics: dict[str, Metric] = {}
+        self.lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Any:  # noqa: ANN401 - The metric that was registered
+        """Add a metric, the names of the metrics have to be unique.
+
+        Raises
+        ------
+            ValueError: There is already a metric with the name.
+        """
+        with self.lock:
+            if metric.name in self.metrics:
+                msg = f"There is already a metric named {metric.name}"
+                raise ValueError(msg)
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, label_names: tuple[str, ...] = ()) -> Counter:
+        """Create and add a counter."""
+        return self.register(Counter(name, description, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        description: str,
+        label_names: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Create and add a histogram."""
+        return self.register(Histogram(name, description, label_names, buckets))
+
+    def render(self) -> str:
+        """Get every metric in the Prometheus text format."""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        return "".join(f"{line}\n" for metric in metrics for line in metric.render())
+
+    def write(self, path: pathlib.Path) -> None:
+        """Write every metric to a file, it is replaced in one step so a collector never reads half a file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary_path = path.with_name(f"{path.name}.tmp")
+        temporary_path.write_text(self.render(), encoding="utf-8")
+        temporary_path.replace(path)
+
+    def clear(self) -> None:
+        """Drop the values of every metric."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+
+METRICS = MetricsRegistry()
+
+SCRAPE_REQUESTS = METRICS.counter(
+    "actual_exclusives_scrape_requests_total",
+    "Requests sent to the MobyGames API by the status of the response, error when there was no response.",
+    ("status",),
+)
+SCRAPE_RESPONSE_BYTES = METRICS.counter(
+    "actual_exclusives_scrape_response_bytes_total",
+    "Bytes of content received from the MobyGames API after decompression.",
+)
+SCRAPE_REQUEST_SECONDS = METRICS.histogram(
+    "actual_exclusives_scrape_request_seconds",
+    "Time from sending a request to the MobyGames API until the response is read, including retries.",
+)
+SCRAPE_RATE_LIMIT_WAIT_SECONDS = METRICS.histogram(
+    "actual_exclusives_scrape_rate_limit_wait_seconds",
+    "Time requests waited for the rate limit before they were sent.",
+)
+SCRAPE_IMPORTS = METRICS.counter(
+    "actual_exclusives_scrape_imports_total",
+    "Games that were imported by what the import did.",
+    ("outcome",),
+)
+SCRAPE_DB_WRITE_SECONDS = METRICS.histogram(
+    "actual_exclusives_scrape_db_write_seconds",
+    "Time imports spent writing to the database, for a single game or a batch of games.",
+    ("path",),
+)
+SEARCH_SECONDS = METRICS.histogram(
+    "actual_exclusives_search_seconds",
+    "Time the search views took to respond.",
+    ("endpoint",),
+)
+
+
+def write_metrics() -> None:
+    """Write every metric to settings.METRICS_FILE, if it is set."""
+    if settings.METRICS_FILE:
+        METRICS.write(pathlib.Path(settings.METRICS_FILE))
+        logger.info("Metrics written to %s", settings.METRICS_FILE)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve the metrics of the process at /metrics."""
+
+    def do_GET(self) -> None:  # noqa: N802 - Name is set by BaseHTTPRequestHandler
+        """Send the metrics."""
+        if self.path != "/metrics":
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+
+        body = METRICS.render().encode("utf-8")
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002, ANN401 - Signature is set by BaseHTTPRequestHandler
+        """Only log the requests when debugging, a collector reads the metrics every few seconds."""
+        logger.debug(format, *args)
+
+
+def serve_metrics(port: int | None = None) -> ThreadingHTTPServer | None:
+    """Serve the metrics to local requests on a background thread.
+
+    Args:
+    ----
+        port: The port to listen on, settings.METRICS_PORT is used if it is None.
+
+    Returns:
+    -------
+        The server, call shutdown on it once the process is done, or None if there is no port.
+    """
+    port = settings.METRICS_PORT if port is None else port
+    if port is None:
+        return None
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info("Serving metrics at http://127.0.0.1:%s/metrics", server.server_address[1])
+    return server
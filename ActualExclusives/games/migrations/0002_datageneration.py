@@ -0,0 +1,20 @@
+# Generated by Django 5.0 on 2024-01-02 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataGeneration",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("generation", models.IntegerField(default=0)),
+                ("modified", models.DateTimeField()),
+            ],
+        ),
+    ]
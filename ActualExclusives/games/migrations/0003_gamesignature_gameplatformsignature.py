@@ -0,0 +1,90 @@
+# Generated by Django 5.0 on 2024-01-03 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_signatures(apps, schema_editor):
+    """Calculate the signatures for the games that were imported before the tables existed."""
+    GamePlatform = apps.get_model("games", "GamePlatform")
+    GamePlatformCountry = apps.get_model("games", "GamePlatformCountry")
+    GameSignature = apps.get_model("games", "GameSignature")
+    GamePlatformSignature = apps.get_model("games", "GamePlatformSignature")
+
+    def make_signature(ids):
+        return "," + "".join(f"{id_}," for id_ in sorted(set(ids)))
+
+    platforms = {}
+    game_platforms = {}
+    for game_platform_id, game_id, platform_id in GamePlatform.objects.values_list("id", "game_id", "platform_id"):
+        platforms.setdefault(game_id, set()).add(platform_id)
+        game_platforms[game_platform_id] = game_id
+
+    countries = {game_platform_id: set() for game_platform_id in game_platforms}
+    game_countries = {game_id: set() for game_id in platforms}
+    for game_platform_id, country_id in GamePlatformCountry.objects.values_list("game_platform_id", "country_id"):
+        countries[game_platform_id].add(country_id)
+        game_countries[game_platforms[game_platform_id]].add(country_id)
+
+    GameSignature.objects.bulk_create(
+        GameSignature(
+            game_id=game_id,
+            platform_count=len(platform_ids),
+            platform_signature=make_signature(platform_ids),
+            country_count=len(game_countries[game_id]),
+            country_signature=make_signature(game_countries[game_id]),
+        )
+        for game_id, platform_ids in platforms.items()
+    )
+    GamePlatformSignature.objects.bulk_create(
+        GamePlatformSignature(
+            game_platform_id=game_platform_id,
+            country_count=len(country_ids),
+            country_signature=make_signature(country_ids),
+        )
+        for game_platform_id, country_ids in countries.items()
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0002_datageneration"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameSignature",
+            fields=[
+                (
+                    "game",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="games.game",
+                    ),
+                ),
+                ("platform_count", models.IntegerField()),
+                ("platform_signature", models.TextField(db_index=True)),
+                ("country_count", models.IntegerField()),
+                ("country_signature", models.TextField(db_index=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="GamePlatformSignature",
+            fields=[
+                (
+                    "game_platform",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="games.gameplatform",
+                    ),
+                ),
+                ("country_count", models.IntegerField()),
+                ("country_signature", models.TextField(db_index=True)),
+            ],
+        ),
+        migrations.RunPython(populate_signatures, migrations.RunPython.noop),
+    ]
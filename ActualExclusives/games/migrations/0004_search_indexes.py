@@ -0,0 +1,109 @@
+# Generated by Django 5.0 on 2024-01-04 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    """Merge duplicate GamePlatform and GamePlatformCountry rows so the unique constraints can be added."""
+    GamePlatform = apps.get_model("games", "GamePlatform")
+    GamePlatformCountry = apps.get_model("games", "GamePlatformCountry")
+    GamePlatformSignature = apps.get_model("games", "GamePlatformSignature")
+
+    # Keep the oldest row for every (game, platform) and move the countries of the other rows onto it
+    kept = {}
+    duplicates = {}
+    for game_platform_id, game_id, platform_id in GamePlatform.objects.order_by("id").values_list(
+        "id",
+        "game_id",
+        "platform_id",
+    ):
+        key = (game_id, platform_id)
+        if key in kept:
+            duplicates[game_platform_id] = kept[key]
+        else:
+            kept[key] = game_platform_id
+
+    for duplicate_id, kept_id in duplicates.items():
+        GamePlatformCountry.objects.filter(game_platform_id=duplicate_id).update(game_platform_id=kept_id)
+    GamePlatform.objects.filter(id__in=duplicates).delete()
+
+    seen = set()
+    duplicate_countries = []
+    for game_platform_country_id, game_platform_id, country_id in GamePlatformCountry.objects.order_by(
+        "id",
+    ).values_list("id", "game_platform_id", "country_id"):
+        key = (game_platform_id, country_id)
+        if key in seen:
+            duplicate_countries.append(game_platform_country_id)
+        else:
+            seen.add(key)
+    GamePlatformCountry.objects.filter(id__in=duplicate_countries).delete()
+
+    # The releases that were merged into can have more countries than before
+    for game_platform_id in set(duplicates.values()):
+        country_ids = sorted(
+            GamePlatformCountry.objects.filter(game_platform_id=game_platform_id).values_list("country_id", flat=True),
+        )
+        GamePlatformSignature.objects.filter(game_platform_id=game_platform_id).update(
+            country_count=len(country_ids),
+            country_signature="," + "".join(f"{id_}," for id_ in country_ids),
+        )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0003_gamesignature_gameplatformsignature"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="gameplatform",
+            constraint=models.UniqueConstraint(fields=("game", "platform"), name="games_gameplatform_game_platform_uniq"),
+        ),
+        migrations.AddConstraint(
+            model_name="gameplatformcountry",
+            constraint=models.UniqueConstraint(
+                fields=("game_platform", "country"),
+                name="games_gameplatformcountry_game_platform_country_uniq",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="gameplatform",
+            index=models.Index(fields=["platform", "game"], name="games_gp_platform_game_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="gameplatformcountry",
+            index=models.Index(fields=["country", "game_platform"], name="games_gpc_country_gp_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="game",
+            index=models.Index(fields=["name", "id"], name="games_game_name_id_idx"),
+        ),
+        # The single column indexes are the first column of the indexes above
+        migrations.AlterField(
+            model_name="gameplatform",
+            name="game",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to="games.game"),
+        ),
+        migrations.AlterField(
+            model_name="gameplatform",
+            name="platform",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to="games.platform"),
+        ),
+        migrations.AlterField(
+            model_name="gameplatformcountry",
+            name="game_platform",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="games.gameplatform",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="gameplatformcountry",
+            name="country",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to="games.country"),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0 on 2024-01-20 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0004_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ScrapeJob",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("key", models.CharField(max_length=500, unique=True)),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("list_page", "List Page"),
+                            ("game", "Game"),
+                            ("game_platform", "Game Platform"),
+                            ("import", "Import"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("leased", "Leased"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("priority", models.IntegerField()),
+                ("game_id", models.IntegerField(null=True)),
+                ("payload", models.JSONField(default=dict)),
+                ("attempts", models.IntegerField(default=0)),
+                ("available", models.DateTimeField()),
+                ("lease_expires", models.DateTimeField(null=True)),
+                ("completed", models.DateTimeField(null=True)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["status", "priority", "id"], name="games_scrapejob_claim_idx"),
+                    models.Index(fields=["game_id", "kind", "status"], name="games_scrapejob_game_idx"),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.0 on 2024-01-21 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0005_scrapejob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="game",
+            name="content_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="gameplatform",
+            name="content_digest",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2024-01-22 09:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("games", "0006_content_digest"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="lastscrape",
+            name="run",
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.CreateModel(
+            name="RecentImportPage",
+            fields=[
+                ("id", models.AutoField(primary_key=True, serialize=False)),
+                ("run", models.CharField(max_length=100)),
+                ("page", models.IntegerField()),
+                ("imported", models.DateTimeField()),
+                (
+                    "last_scrape",
+                    models.ForeignKey(
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="imported_pages",
+                        to="games.lastscrape",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(fields=("run", "page"), name="games_recentimportpage_unique"),
+                ],
+            },
+        ),
+    ]
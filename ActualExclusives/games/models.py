@@ -47,9 +47,19 @@ class Game(ModelWithTimestamps):
     name = models.CharField(max_length=200)
     image = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
+    # Digest of the genres and releases that were imported, the game is not imported again until it changes
+    content_digest = models.CharField(max_length=64, blank=True)
 
     gameplatform_set: models.QuerySet["GamePlatform"]
 
+    class Meta:
+        """Meta."""
+
+        indexes = (
+            # Results are ordered and paginated by (name, id)
+            models.Index(fields=["name", "id"], name="games_game_name_id_idx"),
+        )
+
     def __str__(self) -> str:
         """Game as string."""
         return self.name
@@ -60,8 +70,23 @@ class GamePlatform(ModelWithId):
 
     gameplatformcountry_set: models.QuerySet["GamePlatformCountry"]
 
-    game = models.ForeignKey(Game, on_delete=models.CASCADE)
-    platform = models.ForeignKey(Platform, on_delete=models.CASCADE)
+    # The single column indexes are left out because they are the first column of the indexes in Meta
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, db_index=False)
+    platform = models.ForeignKey(Platform, on_delete=models.CASCADE, db_index=False)
+    # Digest of the countries that were imported for the releases on the platform
+    content_digest = models.CharField(max_length=64, blank=True)
+
+    class Meta:
+        """Meta."""
+
+        constraints = (
+            # Platforms of a game, this also lets the importer ignore rows that already exist
+            models.UniqueConstraint(fields=["game", "platform"], name="games_gameplatform_game_platform_uniq"),
+        )
+        indexes = (
+            # Games on a platform
+            models.Index(fields=["platform", "game"], name="games_gp_platform_game_idx"),
+        )
 
     def __str__(self) -> str:
         """GamePlatform as string."""
@@ -71,14 +96,64 @@ class GamePlatform(ModelWithId):
 class GamePlatformCountry(ModelWithId):
     """GamePlatformCountry model."""
 
-    game_platform = models.ForeignKey(GamePlatform, on_delete=models.CASCADE)
-    country = models.ForeignKey(Country, on_delete=models.CASCADE)
+    # The single column indexes are left out because they are the first column of the indexes in Meta
+    game_platform = models.ForeignKey(GamePlatform, on_delete=models.CASCADE, db_index=False)
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        """Meta."""
+
+        constraints = (
+            # Countries of a release, this also lets the importer ignore rows that already exist
+            models.UniqueConstraint(
+                fields=["game_platform", "country"],
+                name="games_gameplatformcountry_game_platform_country_uniq",
+            ),
+        )
+        indexes = (
+            # Releases in a country
+            models.Index(fields=["country", "game_platform"], name="games_gpc_country_gp_idx"),
+        )
 
     def __str__(self) -> str:
         """GamePlatformCountry as string."""
         return f"{self.game_platform} - {self.country}"
 
 
+class GameSignature(models.Model):
+    """GameSignature model.
+
+    The platforms and countries of a game as a count and a sorted list of ids (",6,7,"), which turns "exactly these
+    platforms" searches into a single indexed equality lookup. Kept up to date by games.signatures.
+    """
+
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, primary_key=True)
+    platform_count = models.IntegerField()
+    platform_signature = models.TextField(db_index=True)
+    country_count = models.IntegerField()
+    country_signature = models.TextField(db_index=True)
+
+    def __str__(self) -> str:
+        """GameSignature as string."""
+        return f"{self.game} - {self.platform_signature}"
+
+
+class GamePlatformSignature(models.Model):
+    """GamePlatformSignature model.
+
+    The countries of a release on a single platform as a count and a sorted list of ids. Kept up to date by
+    games.signatures.
+    """
+
+    game_platform = models.OneToOneField(GamePlatform, on_delete=models.CASCADE, primary_key=True)
+    country_count = models.IntegerField()
+    country_signature = models.TextField(db_index=True)
+
+    def __str__(self) -> str:
+        """GamePlatformSignature as string."""
+        return f"{self.game_platform} - {self.country_signature}"
+
+
 class GameGenre(ModelWithId):
     """GameGenre model."""
 
@@ -90,11 +165,102 @@ class GameGenre(ModelWithId):
         return f"{self.game} - {self.genre}"
 
 
+class DataGeneration(models.Model):
+    """DataGeneration model.
+
+    Holds a single row with a counter that the scrapers bump whenever imported data changes, which lets the web
+    processes know when anything built from the data needs to be rebuilt.
+    """
+
+    id = models.IntegerField(primary_key=True)  # noqa: A003 - Name of id is good
+    generation = models.IntegerField(default=0)
+    modified = models.DateTimeField()
+
+    def __str__(self) -> str:
+        """DataGeneration as string."""
+        return f"{self.generation} ({self.modified})"
+
+
 class LastScrape(ModelWithId):
     """LastScrape model."""
 
     datetime = models.DateTimeField()
+    # The folder of the download of recent games, blank if it was not recorded
+    run = models.CharField(max_length=100, blank=True)
 
     def __str__(self) -> str:
         """LastScrape as string."""
         return f"{self.datetime}"
+
+
+class RecentImportPage(ModelWithId):
+    """RecentImportPage model.
+
+    A page of a download of recent games whose games were all imported, import_recent skips these pages without opening
+    them.
+    """
+
+    last_scrape = models.ForeignKey(LastScrape, on_delete=models.SET_NULL, null=True, related_name="imported_pages")
+    run = models.CharField(max_length=100)
+    page = models.IntegerField()
+    imported = models.DateTimeField()
+
+    class Meta:
+        """Meta."""
+
+        constraints = (models.UniqueConstraint(fields=["run", "page"], name="games_recentimportpage_unique"),)
+
+    def __str__(self) -> str:
+        """RecentImportPage as string."""
+        return f"{self.run} page {self.page}"
+
+
+class ScrapeJob(models.Model):
+    """ScrapeJob model.
+
+    A piece of scrape work in the queue that scrape.jobs drains. Finished jobs are kept as completion records so that
+    enqueueing the same work again does nothing.
+    """
+
+    class Kind(models.TextChoices):
+        """The kinds of scrape work."""
+
+        LIST_PAGE = "list_page"
+        GAME = "game"
+        GAME_PLATFORM = "game_platform"
+        IMPORT = "import"
+
+    class Status(models.TextChoices):
+        """Where a job is in the queue."""
+
+        PENDING = "pending"
+        LEASED = "leased"
+        DONE = "done"
+        FAILED = "failed"
+
+    id = models.AutoField(primary_key=True)  # noqa: A003 - Name of id is good
+    key = models.CharField(max_length=500, unique=True)
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    priority = models.IntegerField()
+    game_id = models.IntegerField(null=True)
+    payload = models.JSONField(default=dict)
+    attempts = models.IntegerField(default=0)
+    available = models.DateTimeField()
+    lease_expires = models.DateTimeField(null=True)
+    completed = models.DateTimeField(null=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        """Meta."""
+
+        indexes = (
+            # The next job to claim
+            models.Index(fields=["status", "priority", "id"], name="games_scrapejob_claim_idx"),
+            # Unfinished downloads for a game that its import waits for
+            models.Index(fields=["game_id", "kind", "status"], name="games_scrapejob_game_idx"),
+        )
+
+    def __str__(self) -> str:
+        """ScrapeJob as string."""
+        return f"{self.key} ({self.status})"
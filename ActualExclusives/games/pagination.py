@@ -0,0 +1,151 @@
+"""Keyset pagination for the search results.
+
+Results are ordered by (name, id) and each page starts after the last game of the previous page, so every page is a
+single indexed query no matter how deep into the results it is. The position is passed between pages as an opaque
+cursor instead of a page number.
+"""
+from __future__ import annotations
+
+import base64
+import binascii
+import json
+from typing import TYPE_CHECKING
+
+from django.conf import settings
+from django.db.models import Q, QuerySet, prefetch_related_objects
+
+from games.instrumentation import profile_stage
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from games.models import Game
+
+# The related objects that are shown on each card of the results
+RESULT_PREFETCH = ("gameplatform_set__platform", "gameplatform_set__gameplatformcountry_set__country")
+
+
+class InvalidCursorError(ValueError):
+    """The cursor could not be decoded."""
+
+
+def encode_cursor(name: str, game_id: int) -> str:
+    """Create the cursor for the page that starts after a game.
+
+    Args:
+    ----
+        name: The name of the last game on the current page.
+        game_id: The id of the last game on the current page.
+
+    Returns:
+    -------
+        The cursor as a URL safe string.
+    """
+    return base64.urlsafe_b64encode(json.dumps([name, game_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    """Get the name and id of the last game on the previous page from a cursor.
+
+    Args:
+    ----
+        cursor: The cursor from encode_cursor.
+
+    Returns:
+    -------
+        The name and id of the game.
+    """
+    try:
+        name, game_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeError, ValueError, TypeError) as e:
+        msg = f"Invalid cursor {cursor}"
+        raise InvalidCursorError(msg) from e
+
+    if not isinstance(name, str) or not isinstance(game_id, int):
+        msg = f"Invalid cursor {cursor}"
+        raise InvalidCursorError(msg)
+
+    return name, game_id
+
+
+def games_after(games: QuerySet[Game], cursor: str | None) -> QuerySet[Game]:
+    """Filter a queryset of games for the games that come after the cursor.
+
+    Args:
+    ----
+        games: The queryset of games.
+        cursor: The cursor from encode_cursor, or None to start from the first game.
+
+    Returns:
+    -------
+        The games after the cursor ordered by (name, id).
+    """
+    games = games.order_by("name", "id")
+
+    if cursor is None:
+        return games
+
+    name, game_id = decode_cursor(cursor)
+    return games.filter(Q(name__gt=name) | Q(name=name, id__gt=game_id))
+
+
+def get_page(
+    games: QuerySet[Game],
+    cursor: str | None,
+    page_size: int | None = None,
+) -> tuple[list[Game], str | None]:
+    """Get a single page of games.
+
+    Args:
+    ----
+        games: The queryset of games.
+        cursor: The cursor from encode_cursor, or None to get the first page.
+        page_size: The number of games on each page, defaults to settings.SEARCH_PAGE_SIZE.
+
+    Returns:
+    -------
+        The games on the page with their related objects prefetched, and the cursor for the next page or None if this is
+        the last page.
+    """
+    page_size = page_size or settings.SEARCH_PAGE_SIZE
+
+    # One extra game is selected to find out if there is another page without counting every result
+    with profile_stage("search") as stage:
+        page = list(games_after(games, cursor)[: page_size + 1])
+        stage.add_rows(len(page))
+
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        next_cursor = encode_cursor(page[-1].name, page[-1].id)
+
+    with profile_stage("prefetch") as stage:
+        prefetch_related_objects(page, *RESULT_PREFETCH)
+        for game in page:
+            game_platforms = game.gameplatform_set.all()
+            stage.add_rows(len(game_platforms))
+            for game_platform in game_platforms:
+                stage.add_rows(len(game_platform.gameplatformcountry_set.all()))
+
+    return page, next_cursor
+
+
+def iter_pages(games: QuerySet[Game], page_size: int | None = None) -> Iterator[list[Game]]:
+    """Get every page of games one page at a time.
+
+    Args:
+    ----
+        games: The queryset of games.
+        page_size: The number of games on each page, defaults to settings.SEARCH_PAGE_SIZE.
+
+    Yields:
+    ------
+        Each page of games, only one page is kept in memory at a time.
+    """
+    cursor = None
+    while True:
+        page, cursor = get_page(games, cursor, page_size)
+        if page:
+            yield page
+        if cursor is None:
+            return
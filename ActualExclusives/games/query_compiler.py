@@ -0,0 +1,228 @@
+"""Compile a whole SelectFormSet into a single SQL statement.
+
+and_form_parser and or_form_parser run the queries for every form separately, combine the game ids in Python, and then
+send every id back to the database. This builds one statement instead: every form becomes a SELECT of game ids, the
+forms are combined with INTERSECT or UNION, and the result is used as a subquery so the ordering and truncation of the
+results also happen in the database.
+
+The statements give the same results as the ORM functions in games.functions, including the places where they behave in
+unexpected ways (country_form_and only uses the first country, country_form_exclusive checks platform_include).
+"""
+from __future__ import annotations
+
+import itertools
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+from games.models import GamePlatform, GamePlatformCountry, GamePlatformSignature, GameSignature
+from games.signatures import MAX_SUBSET_COUNTRIES, make_signature, subset_signatures
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from django.forms import BaseFormSet
+
+    from games.forms import SelectForm
+
+GAME_PLATFORM_TABLE = GamePlatform._meta.db_table  # noqa: SLF001 - Public Django API
+GAME_PLATFORM_COUNTRY_TABLE = GamePlatformCountry._meta.db_table  # noqa: SLF001 - Public Django API
+GAME_SIGNATURE_TABLE = GameSignature._meta.db_table  # noqa: SLF001 - Public Django API
+GAME_PLATFORM_SIGNATURE_TABLE = GamePlatformSignature._meta.db_table  # noqa: SLF001 - Public Django API
+
+# SQL with the parameters for its placeholders
+SQL = tuple[str, list[int | str]]
+
+# Builds a condition on the GamePlatform rows that are selected using the given table alias
+Condition = Callable[[str], SQL]
+
+
+def placeholders(values: Sequence[int | str]) -> str:
+    """Placeholders for every value in an IN clause."""
+    return ", ".join(["%s"] * len(values))
+
+
+def game_in(subquery: SQL, *, include: bool = True) -> Condition:
+    """Condition for rows whose game is (or is not) in the results of a subquery."""
+    operator = "IN" if include else "NOT IN"
+    return lambda alias: (f'{alias}."game_id" {operator} ({subquery[0]})', subquery[1])
+
+
+def platform_in(platform_ids: Sequence[int]) -> Condition:
+    """Condition for rows that are on one of the platforms."""
+    return lambda alias: (f'{alias}."platform_id" IN ({placeholders(platform_ids)})', list(platform_ids))
+
+
+def country_exists(country_ids: Sequence[int], *, exists: bool = True, inside: bool = True) -> Condition:
+    """Condition for rows that have (or do not have) a release inside (or outside) of the countries."""
+    exists_operator = "EXISTS" if exists else "NOT EXISTS"
+    country_operator = "IN" if inside else "NOT IN"
+
+    def condition(alias: str) -> SQL:
+        return (
+            f'{exists_operator} (SELECT 1 FROM "{GAME_PLATFORM_COUNTRY_TABLE}" gpc '  # noqa: S608 - Only placeholders
+            f'WHERE gpc."game_platform_id" = {alias}."id" '
+            f'AND gpc."country_id" {country_operator} ({placeholders(country_ids)}))',
+            list(country_ids),
+        )
+
+    return condition
+
+
+def country_signature_in(signatures: Sequence[str]) -> Condition:
+    """Condition for rows where the countries of the release match one of the signatures."""
+
+    # A correlated primary key lookup, "id IN (...)" lets SQLite loop over every id in the list for every other value
+    # that is used to search the index, which multiplies the number of lookups
+    def condition(alias: str) -> SQL:
+        return (
+            f'EXISTS (SELECT 1 FROM "{GAME_PLATFORM_SIGNATURE_TABLE}" gps '  # noqa: S608 - Only placeholders
+            f'WHERE gps."game_platform_id" = {alias}."id" '
+            f'AND gps."country_signature" IN ({placeholders(signatures)}))',
+            list(signatures),
+        )
+
+    return condition
+
+
+class QueryCompiler:
+    """Compiles a formset into a single SQL statement that selects the ids of the matching games."""
+
+    def __init__(self) -> None:
+        """Initialize the compiler."""
+        self.alias_counter = itertools.count()
+
+    def next_alias(self) -> str:
+        """Get a table alias that has not been used yet in the statement."""
+        return f"gp{next(self.alias_counter)}"
+
+    def rows_sql(self, conditions: list[Condition]) -> SQL:
+        """SELECT the game ids of the GamePlatform rows that match every condition."""
+        alias = self.next_alias()
+        sql = f'SELECT {alias}."game_id" FROM "{GAME_PLATFORM_TABLE}" {alias}'  # noqa: S608 - Only placeholders
+        params: list[int | str] = []
+
+        where = []
+        for condition in conditions:
+            condition_sql, condition_params = condition(alias)
+            where.append(condition_sql)
+            params.extend(condition_params)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        return sql, params
+
+    def platform_conditions(self, form: SelectForm) -> list[Condition]:
+        """Conditions for the platform parameters, the same as games.functions.platform_form."""
+        platform_ids = [platform.pk for platform in form.cleaned_data["platforms"]]
+        include = form.cleaned_data["platform_include"] == "Yes"
+
+        if form.cleaned_data["platform_search_type"] == "And":
+            # Games that have a row for every platform
+            alias = self.next_alias()
+            games = (
+                f'SELECT {alias}."game_id" FROM "{GAME_PLATFORM_TABLE}" {alias} '  # noqa: S608 - Only placeholders
+                f'WHERE {alias}."platform_id" IN ({placeholders(platform_ids)}) '
+                f'GROUP BY {alias}."game_id" HAVING COUNT(DISTINCT {alias}."platform_id") = %s',
+                [*platform_ids, len(platform_ids)],
+            )
+
+            if include:
+                return [game_in(games), platform_in(platform_ids)]
+            return [game_in(games, include=False)]
+
+        if form.cleaned_data["platform_search_type"] == "Or":
+            if include:
+                return [platform_in(platform_ids)]
+            return [game_in(self.rows_sql([platform_in(platform_ids)]), include=False)]
+
+        if form.cleaned_data["platform_search_type"] == "Exclusive":
+            # Games that are on exactly these platforms
+            games = (
+                f'SELECT "game_id" FROM "{GAME_SIGNATURE_TABLE}" '  # noqa: S608 - Only placeholders
+                'WHERE "platform_signature" = %s',
+                [make_signature(platform_ids)],
+            )
+            return [game_in(games, include=include)]
+
+        msg = f"Unknown platform_search_type {form.cleaned_data['platform_search_type']}"
+        raise ValueError(msg)
+
+    def country_conditions(
+        self,
+        form: SelectForm,
+        conditions: list[Condition],
+    ) -> list[Condition]:
+        """Conditions for the country parameters, the same as games.functions.country_form.
+
+        The country filters check if a game has any row that matches the previous conditions and the country
+        parameters, so the previous conditions are needed to build them.
+        """
+        country_ids = [country.pk for country in form.cleaned_data["countries"]]
+        include = form.cleaned_data["country_include"] == "Yes"
+
+        if form.cleaned_data["country_search_type"] == "And":
+            # Only the first country is checked, the same as country_form_and
+            if include:
+                return [*conditions, game_in(self.rows_sql([*conditions, country_exists(country_ids[:1])]))]
+            return [*conditions, country_exists(country_ids[:1])]
+
+        if form.cleaned_data["country_search_type"] == "Or":
+            country_condition = country_exists(country_ids, exists=include)
+            return [*conditions, game_in(self.rows_sql([*conditions, country_condition]))]
+
+        if form.cleaned_data["country_search_type"] == "Exclusive":
+            if len(country_ids) <= MAX_SUBSET_COUNTRIES:
+                only_in_countries = country_signature_in(subset_signatures(country_ids))
+            else:
+                only_in_countries = country_exists(country_ids, exists=False, inside=False)
+            games = self.rows_sql([*conditions, only_in_countries])
+
+            # country_form_exclusive checks platform_include instead of country_include
+            return [*conditions, game_in(games, include=form.cleaned_data["platform_include"] == "Yes")]
+
+        msg = f"Unknown country_search_type {form.cleaned_data['country_search_type']}"
+        raise ValueError(msg)
+
+    def form_sql(self, form: SelectForm) -> SQL:
+        """SELECT the ids of the games that match a single form."""
+        conditions: list[Condition] = []
+
+        if form.cleaned_data.get("platforms"):
+            conditions = self.platform_conditions(form)
+        if form.cleaned_data.get("countries"):
+            conditions = self.country_conditions(form, conditions)
+
+        return self.rows_sql(conditions)
+
+    def compile_search(self, formset: BaseFormSet, search_type: str) -> SQL | None:
+        """Compile the formset into a single statement.
+
+        Args:
+        ----
+            formset: The formset that was submitted.
+            search_type: The type of search to perform.
+
+        Returns:
+        -------
+            The statement that selects the ids of the matching games, or None if nothing can match.
+        """
+        if search_type == "And Search":
+            operator = " INTERSECT "
+        elif search_type == "Or Search":
+            operator = " UNION "
+        else:
+            return None
+
+        statements = [self.form_sql(form) for form in formset if form.is_valid()]
+        if not statements:
+            return None
+
+        sql = operator.join(statement for statement, _ in statements)
+        params = [param for _, statement_params in statements for param in statement_params]
+        return sql, params
+
+
+def compile_formset(formset: BaseFormSet, search_type: str) -> SQL | None:
+    """Compile the formset into a single statement that selects the ids of the matching games."""
+    return QueryCompiler().compile_search(formset, search_type)
@@ -0,0 +1,145 @@
+"""Fill the database with a reproducible synthetic catalogue for benchmarks.
+
+The distribution follows the real data from MobyGames: most games are on a single platform, a few are on dozens, a
+handful of platforms and countries have most of the releases, and releases of the same game on different platforms
+usually come out in the same countries.
+"""
+from __future__ import annotations
+
+import datetime
+import random
+import string
+
+from django.db import transaction
+
+from games.generation import bump_generation
+from games.models import Country, Game, GamePlatform, GamePlatformCountry, Platform
+from games.signatures import rebuild_signatures
+
+# (number of platforms, weight) for each game
+PLATFORM_COUNT_WEIGHTS = [(0, 1), (1, 70), (2, 14), (3, 7), (4, 3), (5, 2), (8, 1.5), (12, 1), (20, 0.4), (40, 0.1)]
+
+# (number of countries, weight) for each release
+COUNTRY_COUNT_WEIGHTS = [(0, 10), (1, 50), (2, 20), (3, 10), (5, 6), (8, 3), (15, 1)]
+
+# Chance that a release on another platform comes out in the same countries as the first release of the game
+SAME_COUNTRIES_CHANCE = 0.7
+
+# Exponent of the Zipf distribution for how popular platforms and countries are
+POPULARITY_EXPONENT = 1.1
+
+BATCH_SIZE = 2000
+
+ADJECTIVES = ["Super", "Final", "Dark", "Little", "Grand", "Lost", "Mega", "Shadow", "Crystal", "Iron", "Silent"]
+NOUNS = ["Quest", "Racer", "Legends", "Kingdom", "Fighter", "Tactics", "Island", "Saga", "Dungeon", "Odyssey"]
+
+
+class DatabaseNotEmptyError(Exception):
+    """The database already has games in it."""
+
+
+def popularity_weights(count: int) -> list[float]:
+    """Weights where the first item is the most popular and the popularity falls off like a Zipf distribution."""
+    return [1 / (rank**POPULARITY_EXPONENT) for rank in range(1, count + 1)]
+
+
+def weighted_sample(rng: random.Random, population: list[int], weights: list[float], k: int) -> list[int]:
+    """Pick k different items where popular items are more likely to be picked."""
+    k = min(k, len(population))
+    picked: dict[int, None] = {}
+    while len(picked) < k:
+        picked.update(dict.fromkeys(rng.choices(population, weights, k=k - len(picked))))
+    return list(picked)
+
+
+def country_code(country_id: int) -> str:
+    """Create a two letter country code for a country id."""
+    letters = string.ascii_uppercase
+    return letters[(country_id - 1) // len(letters) % len(letters)] + letters[(country_id - 1) % len(letters)]
+
+
+def clear_games() -> None:
+    """Delete every game, platform, and country."""
+    Game.objects.all().delete()
+    Platform.objects.all().delete()
+    Country.objects.all().delete()
+
+
+def generate_sample_data(
+    game_count: int = 500_000,
+    platform_count: int = 300,
+    country_count: int = 50,
+    seed: int = 0,
+    *,
+    clear: bool = False,
+) -> None:
+    """Fill the database with synthetic games.
+
+    Args:
+    ----
+        game_count: The number of games to generate.
+        platform_count: The number of platforms to generate.
+        country_count: The number of countries to generate.
+        seed: The seed for the random number generator, the same seed always gives the same data.
+        clear: Delete the games, platforms, and countries that are already in the database first.
+    """
+    rng = random.Random(seed)
+    now = datetime.datetime(2024, 1, 1, tzinfo=datetime.UTC)
+
+    with transaction.atomic():
+        if clear:
+            clear_games()
+        elif Game.objects.exists():
+            msg = "The database already has games in it, use clear to replace them"
+            raise DatabaseNotEmptyError(msg)
+
+        platform_ids = list(range(1, platform_count + 1))
+        Platform.objects.bulk_create(
+            Platform(id=platform_id, name=f"Platform {platform_id}", imported=True) for platform_id in platform_ids
+        )
+        country_ids = list(range(1, country_count + 1))
+        Country.objects.bulk_create(
+            Country(id=country_id, name=f"Country {country_id}", code=country_code(country_id), flag="", region="")
+            for country_id in country_ids
+        )
+
+        platform_weights = popularity_weights(platform_count)
+        country_weights = popularity_weights(country_count)
+        platform_counts, platform_count_weights = zip(*PLATFORM_COUNT_WEIGHTS, strict=True)
+        country_counts, country_count_weights = zip(*COUNTRY_COUNT_WEIGHTS, strict=True)
+
+        game_platform_id = 0
+        for start in range(1, game_count + 1, BATCH_SIZE):
+            games = []
+            game_platforms = []
+            game_platform_countries = []
+
+            for game_id in range(start, min(start + BATCH_SIZE, game_count + 1)):
+                name = f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {game_id}"
+                games.append(Game(id=game_id, name=name, info_timestamp=now, info_modified_timestamp=now))
+
+                game_platform_count = rng.choices(platform_counts, platform_count_weights)[0]
+                first_countries = None
+                for platform_id in weighted_sample(rng, platform_ids, platform_weights, game_platform_count):
+                    game_platform_id += 1
+                    game_platforms.append(GamePlatform(id=game_platform_id, game_id=game_id, platform_id=platform_id))
+
+                    if first_countries is None or rng.random() > SAME_COUNTRIES_CHANCE:
+                        release_country_count = rng.choices(country_counts, country_count_weights)[0]
+                        countries = weighted_sample(rng, country_ids, country_weights, release_country_count)
+                        if first_countries is None:
+                            first_countries = countries
+                    else:
+                        countries = first_countries
+
+                    game_platform_countries.extend(
+                        GamePlatformCountry(game_platform_id=game_platform_id, country_id=country_id)
+                        for country_id in countries
+                    )
+
+            Game.objects.bulk_create(games)
+            GamePlatform.objects.bulk_create(game_platforms)
+            GamePlatformCountry.objects.bulk_create(game_platform_countries)
+
+        rebuild_signatures()
+        bump_generation()
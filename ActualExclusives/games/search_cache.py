@@ -0,0 +1,139 @@
+"""Cache the results of searches until the next import.
+
+The data only changes when the scrapers import something, so the results of a search can be reused until the data
+generation changes. Searches are turned into a canonical form first so that the same search always uses the same cache
+entry no matter which order the forms, platforms, or countries were selected in.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from django.core.cache import caches
+
+from games.generation import current_generation
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from django.forms import BaseFormSet
+
+    from games.forms import SelectForm
+
+T = TypeVar("T")
+
+# Name of the cache in settings.CACHES, MAX_ENTRIES is set on it so the least recently used searches are evicted
+SEARCH_CACHE_ALIAS = "search"
+
+
+def canonical_form(form: SelectForm) -> dict[str, Any]:
+    """Convert a form into a dict that only contains the fields that change the results.
+
+    Args:
+    ----
+        form: A valid form.
+
+    Returns:
+    -------
+        The fields of the form with the ids sorted and the unused fields removed.
+    """
+    canonical: dict[str, Any] = {}
+
+    if form.cleaned_data.get("platforms"):
+        canonical["platforms"] = sorted(platform.pk for platform in form.cleaned_data["platforms"])
+        canonical["platform_include"] = form.cleaned_data["platform_include"]
+        canonical["platform_search_type"] = form.cleaned_data["platform_search_type"]
+
+    if form.cleaned_data.get("countries"):
+        canonical["countries"] = sorted(country.pk for country in form.cleaned_data["countries"])
+        canonical["country_include"] = form.cleaned_data["country_include"]
+        canonical["country_search_type"] = form.cleaned_data["country_search_type"]
+
+        # Exclusive country searches use platform_include even when there are no platforms
+        if canonical["country_search_type"] == "Exclusive":
+            canonical["platform_include"] = form.cleaned_data["platform_include"]
+
+    return canonical
+
+
+def canonical_search(formset: BaseFormSet, search_type: str) -> str:
+    """Convert a search into a string that is the same for every search that gives the same results.
+
+    Args:
+    ----
+        formset: The formset that was submitted.
+        search_type: The type of search to perform.
+
+    Returns:
+    -------
+        The search as a JSON string.
+    """
+    forms = {json.dumps(canonical_form(form), sort_keys=True) for form in formset if form.is_valid()}
+
+    # And Search and Or Search are both commutative and repeating a form does not change the results
+    return json.dumps({"search_type": search_type, "forms": sorted(forms)})
+
+
+class SearchCache:
+    """Cache for search results that is invalidated when the data generation changes."""
+
+    def __init__(self, alias: str = SEARCH_CACHE_ALIAS) -> None:
+        """Initialize the cache."""
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def key(self, formset: BaseFormSet, search_type: str, *extra: object) -> str:
+        """Create the cache key for a search.
+
+        Args:
+        ----
+            formset: The formset that was submitted.
+            search_type: The type of search to perform.
+            extra: Anything else that changes what is cached for the search.
+
+        Returns:
+        -------
+            The cache key, which includes the data generation so entries from before an import are never used.
+        """
+        search = json.dumps([canonical_search(formset, search_type), current_generation(), [str(e) for e in extra]])
+        return "search:" + hashlib.sha256(search.encode()).hexdigest()
+
+    def get_or_set(self, key: str, default: Callable[[], T]) -> tuple[T, bool]:
+        """Get a value from the cache, or calculate and store it if it is not cached.
+
+        Args:
+        ----
+            key: The cache key from SearchCache.key.
+            default: Calculates the value when it is not cached.
+
+        Returns:
+        -------
+            The value and True if it came from the cache.
+        """
+        cache = caches[self.alias]
+        value = cache.get(key)
+        hit = value is not None
+
+        if not hit:
+            value = default()
+            cache.set(key, value)
+
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        return value, hit
+
+    def stats(self) -> dict[str, int]:
+        """Get the number of cache hits and misses in this process."""
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+
+SEARCH_CACHE = SearchCache()
@@ -0,0 +1,98 @@
+"""Keep the GameSignature and GamePlatformSignature tables up to date.
+
+A signature is a sorted list of ids wrapped in commas (",6,7,"), so two games are on exactly the same platforms when
+their signatures are equal, and a game is on a platform when its signature contains ",<id>,".
+"""
+from __future__ import annotations
+
+import itertools
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from games.models import Game, GamePlatform, GamePlatformCountry, GamePlatformSignature, GameSignature
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+# The largest number of countries that Exclusive searches will list every subset of, 2 ** 8 signatures is still a small
+# IN clause but anything bigger falls back to checking the countries of every release
+MAX_SUBSET_COUNTRIES = 8
+
+# Keep the number of ids in each IN clause below the SQLite variable limit
+BATCH_SIZE = 500
+
+
+def make_signature(ids: Iterable[int]) -> str:
+    """Create the signature for a list of ids."""
+    return "," + "".join(f"{id_}," for id_ in sorted(set(ids)))
+
+
+def subset_signatures(ids: Iterable[int]) -> list[str]:
+    """Create the signature of every subset of a list of ids, including the empty subset."""
+    ids = sorted(set(ids))
+    return [make_signature(subset) for size in range(len(ids) + 1) for subset in itertools.combinations(ids, size)]
+
+
+def update_signatures(game_ids: Iterable[int]) -> None:
+    """Recalculate the signatures for the given games.
+
+    Args:
+    ----
+        game_ids: The ids of the games that were imported.
+    """
+    game_ids = list(game_ids)
+
+    platforms: defaultdict[int, set[int]] = defaultdict(set)
+    game_platform_ids: list[int] = []
+    for game_platform_id, game_id, platform_id in GamePlatform.objects.filter(game_id__in=game_ids).values_list(
+        "id",
+        "game_id",
+        "platform_id",
+    ):
+        platforms[game_id].add(platform_id)
+        game_platform_ids.append(game_platform_id)
+
+    countries: defaultdict[int, set[int]] = defaultdict(set)
+    game_countries: defaultdict[int, set[int]] = defaultdict(set)
+    for game_platform_id, game_id, country_id in GamePlatformCountry.objects.filter(
+        game_platform__game_id__in=game_ids,
+    ).values_list("game_platform_id", "game_platform__game_id", "country_id"):
+        countries[game_platform_id].add(country_id)
+        game_countries[game_id].add(country_id)
+
+    GameSignature.objects.bulk_create(
+        [
+            GameSignature(
+                game_id=game_id,
+                platform_count=len(platforms[game_id]),
+                platform_signature=make_signature(platforms[game_id]),
+                country_count=len(game_countries[game_id]),
+                country_signature=make_signature(game_countries[game_id]),
+            )
+            for game_id in game_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["game"],
+        update_fields=["platform_count", "platform_signature", "country_count", "country_signature"],
+    )
+
+    GamePlatformSignature.objects.bulk_create(
+        [
+            GamePlatformSignature(
+                game_platform_id=game_platform_id,
+                country_count=len(countries[game_platform_id]),
+                country_signature=make_signature(countries[game_platform_id]),
+            )
+            for game_platform_id in game_platform_ids
+        ],
+        update_conflicts=True,
+        unique_fields=["game_platform"],
+        update_fields=["country_count", "country_signature"],
+    )
+
+
+def rebuild_signatures() -> None:
+    """Recalculate the signatures for every game."""
+    game_ids = list(Game.objects.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(game_ids), BATCH_SIZE):
+        update_signatures(game_ids[start : start + BATCH_SIZE])
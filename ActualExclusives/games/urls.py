@@ -8,4 +8,7 @@ urlpatterns = [
     path("", views.index, name="index"),
     path("index", views.index, name="index"),
     path("games", views.games, name="games"),
+    path("api/games", views.games_api, name="games_api"),
+    path("status", views.status, name="status"),
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -2,13 +2,76 @@
 from __future__ import annotations
 
 import datetime
+import functools
+import hmac
+import time
+from typing import TYPE_CHECKING
 
-from django.http import HttpRequest, HttpResponse
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotModified,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
 from django.views.decorators.csrf import csrf_exempt
 
+from games.api import accepts_gzip, encode_payload, search_etag, search_payload
 from games.forms import SelectFormSet
 from games.functions import form_parser
+from games.instrumentation import LATENCY_HISTOGRAM, profile_stage
+from games.metrics import CONTENT_TYPE, METRICS, SEARCH_SECONDS
+from games.pagination import InvalidCursorError, decode_cursor, get_page, iter_pages
+from games.search_cache import SEARCH_CACHE
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+    from django.db.models import QuerySet
+
+    from games.models import Game
+
+    View = Callable[[HttpRequest], HttpResponse | StreamingHttpResponse]
+
+# Placeholder for the results when the page is streamed
+RESULTS_MARKER = "<!-- results -->"
+
+
+def timed_search(endpoint: str) -> Callable[[View], View]:
+    """Record how long a search view takes in SEARCH_SECONDS.
+
+    Streamed results only run the search while the response is sent, so they are recorded once the last chunk is sent
+    with _stream added to the endpoint.
+    """
+
+    def decorator(view: View) -> View:
+        @functools.wraps(view)
+        def wrapper(request: HttpRequest) -> HttpResponse | StreamingHttpResponse:
+            start = time.perf_counter()
+            response = view(request)
+            if response.streaming:
+                response.streaming_content = timed_stream(response.streaming_content, f"{endpoint}_stream", start)
+            else:
+                SEARCH_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def timed_stream(content: Iterable[bytes], endpoint: str, start: float) -> Iterator[bytes]:
+    """Send the chunks of a streamed response and record how long it took once the last chunk is sent."""
+    yield from content
+    SEARCH_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
 
 
 @csrf_exempt
@@ -24,7 +87,8 @@ def index(request: HttpRequest) -> HttpResponse:
 
 
 @csrf_exempt
-def games(request: HttpRequest) -> HttpResponse:
+@timed_search("games")
+def games(request: HttpRequest) -> HttpResponse | StreamingHttpResponse:
     """Results page."""
     start = datetime.datetime.now().astimezone()
     # Manage invalid forms
@@ -37,8 +101,145 @@ def games(request: HttpRequest) -> HttpResponse:
     if not search_type:
         return HttpResponse("Invalid Form")
 
-    # Truncate results to 1,000 to avoid people using the site as a database
-    games = form_parser(formset, search_type)[:1000]
+    # Only the page after the cursor is queried and cached
+    cursor = request.GET.get("cursor") or None
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursorError:
+            return HttpResponse("Invalid Form")
+
+    games = form_parser(formset, search_type)
+
+    if request.GET.get("stream"):
+        return StreamingHttpResponse(stream_results(request, games, start))
+
+    def render_results() -> bytes:
+        page, next_cursor = get_page(games, cursor)
+        context_data = {
+            "games": page,
+            "start": start,
+            "first_page_url": page_url(request, None) if cursor else None,
+            "next_page_url": page_url(request, next_cursor) if next_cursor else None,
+        }
+        with profile_stage("render"):
+            return render(request, "games/results.html", context_data).content
+
+    # The results only change after an import so the rendered page can be reused until then
+    content, hit = SEARCH_CACHE.get_or_set(SEARCH_CACHE.key(formset, search_type, cursor), render_results)
+
+    response = HttpResponse(content)
+    response["X-Search-Cache"] = "hit" if hit else "miss"
+    return response
+
+
+@csrf_exempt
+@timed_search("games_api")
+def games_api(request: HttpRequest) -> HttpResponse:
+    """Search results as JSON."""
+    formset = SelectFormSet(request.GET)
+    search_type = request.GET.get("search_type")
+
+    if not formset.is_valid() or not search_type:
+        return JsonResponse({"error": "Invalid Form"}, status=400)
+
+    cursor = request.GET.get("cursor") or None
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except InvalidCursorError:
+            return JsonResponse({"error": "Invalid Form"}, status=400)
+
+    gzipped = accepts_gzip(request.headers.get("Accept-Encoding", ""))
+    etag = search_etag(formset, search_type, cursor, gzipped=gzipped)
+
+    def render_payload() -> bytes:
+        with profile_stage("search") as stage:
+            payload = search_payload(form_parser(formset, search_type), cursor)
+            stage.add_rows(len(payload["games"]))
+        with profile_stage("render"):
+            return encode_payload(payload, gzipped=gzipped)
+
+    # Unchanged results are answered before running the search
+    if_none_match = parse_etags(request.headers.get("If-None-Match", ""))
+    if etag in if_none_match or "*" in if_none_match:
+        response = HttpResponseNotModified()
+    else:
+        content, _ = SEARCH_CACHE.get_or_set(
+            SEARCH_CACHE.key(formset, search_type, "api", cursor, gzipped),
+            render_payload,
+        )
+        response = HttpResponse(content, content_type="application/json")
+        if gzipped:
+            response["Content-Encoding"] = "gzip"
+
+    response["ETag"] = etag
+    # Clients can keep the response but have to check that it is still current before using it
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
+
+
+@staff_member_required
+def status(request: HttpRequest) -> HttpResponse:
+    """Latency of the recent requests to every endpoint."""
+    context_data = {
+        "instrumentation_enabled": settings.INSTRUMENTATION_ENABLED,
+        "histogram": LATENCY_HISTOGRAM.snapshot(),
+        "search_cache": SEARCH_CACHE.stats(),
+    }
+    return render(request, "games/status.html", context_data)
+
+
+def metrics(request: HttpRequest) -> HttpResponse:
+    """Every metric of the web server in the Prometheus text format, only for requests with settings.METRICS_TOKEN."""
+    if not settings.METRICS_TOKEN:
+        raise Http404
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        return HttpResponseForbidden()
+    return HttpResponse(METRICS.render(), content_type=CONTENT_TYPE)
+
+
+def page_url(request: HttpRequest, cursor: str | None) -> str:
+    """Create the URL for another page of the same search.
+
+    Args:
+    ----
+        request: The request for the current page.
+        cursor: The cursor for the page, or None for the first page.
+
+    Returns:
+    -------
+        The URL of the page.
+    """
+    query = request.GET.copy()
+    query.pop("cursor", None)
+    if cursor:
+        query["cursor"] = cursor
+    return f"{request.path}?{query.urlencode()}"
+
+
+def stream_results(request: HttpRequest, games: QuerySet[Game], start: datetime.datetime) -> Iterator[str]:
+    """Render every result one page at a time.
+
+    The page is rendered with a marker where the results go, everything before the marker is sent before the first
+    query for the results runs.
+
+    Args:
+    ----
+        request: The request for the results.
+        games: The queryset of games that were found.
+        start: When the request started.
+
+    Yields:
+    ------
+        The rendered page in chunks.
+    """
+    page = render_to_string("games/results.html", {"results_marker": RESULTS_MARKER, "start": start}, request)
+    head, tail = page.split(RESULTS_MARKER, 1)
 
-    context_data = {"games": games, "start": start}
-    return render(request, "games/results.html", context_data)
+    yield head
+    for games_page in iter_pages(games):
+        yield render_to_string("games/result_cards.html", {"games": games_page}, request)
+    yield tail
@@ -0,0 +1,189 @@
+"""Client for the MobyGames API that reuses its connections."""
+from __future__ import annotations
+
+import gzip
+import http.client
+import logging
+import ssl
+import threading
+import time
+import urllib.parse
+from typing import TYPE_CHECKING
+
+from api_key import API_KEY
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from email.message import Message
+
+logger = logging.getLogger(__name__)
+
+# Status codes that mean the request can be sent again later
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Errors from a keep-alive connection that the server closed while it was idle, http.client.RemoteDisconnected is a
+# ConnectionResetError
+STALE_CONNECTION_ERRORS = (ConnectionResetError, BrokenPipeError)
+
+
+class ApiError(Exception):
+    """The API responded with an error that will not go away by sending the request again."""
+
+    def __init__(self, url: str, status: int, reason: str) -> None:
+        """Initialize the error."""
+        super().__init__(f"{status} {reason} for {url}")
+        self.status = status
+
+
+class RetryableError(Exception):
+    """The API responded with an error that might go away by sending the request again."""
+
+    def __init__(self, status: int, retry_after: float | None) -> None:
+        """Initialize the error."""
+        super().__init__(f"Status {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class ApiResponse:
+    """A response from the API."""
+
+    def __init__(self, status: int, headers: Message, content: str) -> None:
+        """Initialize the response."""
+        self.status = status
+        self.headers = headers
+        self.content = content
+
+
+class ApiClient:
+    """Sends requests over keep-alive connections and asks for compressed responses."""
+
+    def __init__(  # noqa: PLR0913 - Every setting is optional
+        self,
+        api_key: str = API_KEY,
+        timeout: float = 30,
+        retries: int = 3,
+        backoff: float = 10,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the client.
+
+        Args:
+        ----
+            api_key: The API key that is added to every request.
+            timeout: The number of seconds to wait for a connection or for data before giving up on a request.
+            retries: The number of times to send a request again after a connection error or a temporary error.
+            backoff: The number of seconds to wait before the first retry, the wait doubles after every retry. Retries
+                do not go through the rate limiter, so this should be at least the minimum interval between requests.
+            sleep: Waits for a number of seconds.
+        """
+        self.api_key = api_key
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.connections: dict[tuple[str, str], http.client.HTTPConnection] = {}
+        self.lock = threading.Lock()
+
+    def get(
+        self,
+        url: str,
+        params: dict[str, str | int] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> ApiResponse:
+        """Send a GET request.
+
+        Args:
+        ----
+            url: The URL of the endpoint, it ends with ? like the URLs in the scrapers.
+            params: The query parameters, the API key is added to them.
+            headers: Extra request headers.
+
+        Returns:
+        -------
+            The response, with the content decompressed and decoded.
+        """
+        split_url = urllib.parse.urlsplit(url)
+        if split_url.scheme not in ("http", "https"):
+            msg = "URL must start with 'http:' or 'https:'"
+            raise ValueError(msg)
+
+        query = urllib.parse.urlencode({**(params or {}), "api_key": self.api_key})
+        path = f"{split_url.path or '/'}?{query}"
+        request_headers = {"User-Agent": "Scraper", "Accept-Encoding": "gzip", **(headers or {})}
+
+        attempt = 0
+        with self.lock:
+            while True:
+                reused = (split_url.scheme, split_url.netloc) in self.connections
+                try:
+                    return self.send(split_url.scheme, split_url.netloc, path, request_headers)
+                except (OSError, http.client.HTTPException, RetryableError) as error:
+                    self.close_connection(split_url.scheme, split_url.netloc)
+                    # The server closes connections that were idle for a while, which happens between most requests
+                    # because of the rate limit, so the request is sent again right away on a new connection
+                    if reused and isinstance(error, STALE_CONNECTION_ERRORS):
+                        logger.debug("Reconnecting to %s after %r", split_url.netloc, error)
+                        continue
+                    if attempt == self.retries:
+                        raise
+
+                    delay = self.backoff * 2**attempt
+                    if isinstance(error, RetryableError) and error.retry_after is not None:
+                        delay = max(delay, error.retry_after)
+                    logger.warning("Retrying %s in %s seconds after %r", split_url.path, delay, error)
+                    self.sleep(delay)
+                    attempt += 1
+
+    def send(self, scheme: str, netloc: str, path: str, headers: dict[str, str]) -> ApiResponse:
+        """Send a request over the connection for the host and read the whole response."""
+        connection = self.connection(scheme, netloc)
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+
+        # The whole body has to be read before the connection can be used again
+        body = response.read()
+        if response.status in RETRY_STATUSES:
+            raise RetryableError(response.status, retry_after(response.headers))
+        if response.status >= 400:  # noqa: PLR2004 - Every error status
+            url = f"{scheme}://{netloc}{path.split('?')[0]}"
+            raise ApiError(url, response.status, response.reason)
+
+        if response.headers.get("Content-Encoding", "").lower() == "gzip":
+            body = gzip.decompress(body)
+
+        return ApiResponse(response.status, response.headers, body.decode("utf-8"))
+
+    def connection(self, scheme: str, netloc: str) -> http.client.HTTPConnection:
+        """Get the keep-alive connection for a host, it opens again by itself after the server closes it."""
+        if (scheme, netloc) not in self.connections:
+            if scheme == "https":
+                self.connections[scheme, netloc] = http.client.HTTPSConnection(
+                    netloc,
+                    timeout=self.timeout,
+                    context=ssl.create_default_context(),
+                )
+            else:
+                self.connections[scheme, netloc] = http.client.HTTPConnection(netloc, timeout=self.timeout)
+        return self.connections[scheme, netloc]
+
+    def close_connection(self, scheme: str, netloc: str) -> None:
+        """Close the connection for a host after an error so the next request starts a new one."""
+        if connection := self.connections.pop((scheme, netloc), None):
+            connection.close()
+
+    def close(self) -> None:
+        """Close every connection."""
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections = {}
+
+
+def retry_after(headers: Message) -> float | None:
+    """Get the number of seconds from a Retry-After header, dates are ignored."""
+    value = headers.get("Retry-After", "")
+    return float(value) if value.isdigit() else None
+
+
+API_CLIENT = ApiClient()
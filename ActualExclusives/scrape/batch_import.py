@@ -0,0 +1,327 @@
+"""Import many games at once with a few statements for each table.
+
+GameManager.import_game looks up and creates every genre, platform, release, and country of a game one row at a time.
+BatchImporter imports a whole batch of games in one transaction instead, it finds the rows that already exist with a
+single query for each table and creates the missing rows with bulk_create. The database ends up the same as if every
+game was imported with GameManager.import_game.
+"""
+from __future__ import annotations
+
+import datetime
+import itertools
+import logging
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from django.db import transaction
+from games.metrics import SCRAPE_DB_WRITE_SECONDS, SCRAPE_IMPORTS, UP_TO_DATE
+from games.models import Game, GameGenre, GamePlatform, GamePlatformCountry, Genre, Platform
+from games.signatures import update_signatures
+
+from scrape.content_digest import GameDigests, ImportOutcome, count_outcome, game_digests
+from scrape.countries import COUNTRY_RESOLVER, UnknownCountryError
+from scrape.document_cache import DOCUMENT_CACHE
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from scrape.game import GameManager
+
+logger = logging.getLogger(__name__)
+
+# Number of games that are imported in each transaction
+IMPORT_BATCH_SIZE = 100
+
+
+class GameDocument(NamedTuple):
+    """Everything that is imported for a game."""
+
+    game: dict[str, Any]
+    # The parsed release files of the game by platform id
+    platforms: dict[int, dict[str, Any]]
+    # When the game file was saved, it becomes the info_timestamp of a new game
+    saved: datetime.datetime
+    # The game is only imported again if it is older than these
+    info_timestamp: datetime.datetime | None = None
+    info_modified_timestamp: datetime.datetime | None = None
+
+    @property
+    def game_id(self) -> int:
+        """The id of the game."""
+        return self.game["game_id"]
+
+
+def load_document(
+    game_manager: GameManager,
+    info_timestamp: datetime.datetime | None = None,
+    info_modified_timestamp: datetime.datetime | None = None,
+) -> GameDocument:
+    """Load the downloaded files of a game.
+
+    Args:
+    ----
+        game_manager: The game to load.
+        info_timestamp: The game is only imported again if it is older than this.
+        info_modified_timestamp: The game is only imported again if it was modified before this.
+
+    Returns:
+    -------
+        The document for the game.
+    """
+    game = DOCUMENT_CACHE.get(game_manager.game_json_path)
+    platforms = {
+        platform["platform_id"]: DOCUMENT_CACHE.get(game_manager.game_platform_json_path(platform["platform_id"]))
+        for platform in game["platforms"]
+    }
+    return GameDocument(
+        game,
+        platforms,
+        game_manager.game_json_path.aware_mtime(),
+        info_timestamp,
+        info_modified_timestamp,
+    )
+
+
+class BatchImporter:
+    """Imports games in batches."""
+
+    def __init__(self, batch_size: int = IMPORT_BATCH_SIZE, *, skip_unchanged: bool = True) -> None:
+        """Initialize the importer.
+
+        Args:
+        ----
+            batch_size: The number of games to import in each transaction.
+            skip_unchanged: Skip games and releases that have the same digest as when they were last imported.
+        """
+        self.batch_size = batch_size
+        self.skip_unchanged = skip_unchanged
+
+    def import_games(self, documents: Iterable[GameDocument]) -> list[int]:
+        """Import games, committing after every batch.
+
+        Args:
+        ----
+            documents: The games to import.
+
+        Returns:
+        -------
+            The ids of the games that were outdated and imported.
+        """
+        imported = []
+        documents = iter(documents)
+        while batch := list(itertools.islice(documents, self.batch_size)):
+            with transaction.atomic():
+                imported += self.import_batch(batch)
+        return imported
+
+    def import_batch(self, documents: list[GameDocument]) -> list[int]:
+        """Import a batch of games, it should be called inside of a transaction.
+
+        Returns
+        -------
+            The ids of the games that were outdated and changed, and were imported.
+        """
+        documents, existing = self.outdated(documents)
+        digests = {
+            document.game_id: game_digests(
+                document.game,
+                {platform_id: platform["releases"] for platform_id, platform in document.platforms.items()},
+            )
+            for document in documents
+        }
+        # Games that are outdated but have the same data as last time are skipped
+        changed = [
+            document
+            for document in documents
+            if not self.skip_unchanged
+            or document.game_id not in existing
+            or existing[document.game_id].content_digest != digests[document.game_id].game
+        ]
+        if changed:
+            self.check_countries(changed)
+            logger.info("Importing %s games", len(changed))
+
+            with SCRAPE_DB_WRITE_SECONDS.time(path="batch"):
+                self.import_games_rows(changed, existing, digests)
+                self.import_genres(changed)
+                self.import_platforms(changed, digests)
+                update_signatures([document.game_id for document in changed])
+
+        count_outcome(ImportOutcome.UNCHANGED, len(documents) - len(changed))
+        for document in changed:
+            count_outcome(ImportOutcome.CHANGED if document.game_id in existing else ImportOutcome.CREATED)
+        return [document.game_id for document in changed]
+
+    def outdated(self, documents: list[GameDocument]) -> tuple[list[GameDocument], dict[int, Game]]:
+        """Get the documents for games that are not imported or are outdated, each game only once.
+
+        Returns
+        -------
+            The documents and the games that are already imported by id.
+        """
+        unique = {}
+        for document in documents:
+            unique.setdefault(document.game_id, document)
+
+        existing = Game.objects.in_bulk(list(unique))
+        outdated = [
+            document
+            for game_id, document in unique.items()
+            if game_id not in existing
+            or not existing[game_id].is_up_to_date(document.info_timestamp, document.info_modified_timestamp)
+        ]
+        SCRAPE_IMPORTS.inc(len(unique) - len(outdated), outcome=UP_TO_DATE)
+        return outdated, existing
+
+    def check_countries(self, documents: list[GameDocument]) -> None:
+        """Raise UnknownCountryError with every unknown country of every game before anything is imported."""
+        unknown = [
+            name
+            for document in documents
+            for name in COUNTRY_RESOLVER.find_unknown(
+                (
+                    country
+                    for platform in document.platforms.values()
+                    for release in platform["releases"]
+                    for country in release["countries"]
+                ),
+                document.game_id,
+            )
+        ]
+        if unknown:
+            raise UnknownCountryError(list(dict.fromkeys(unknown)))
+
+    def import_games_rows(
+        self,
+        documents: list[GameDocument],
+        existing: dict[int, Game],
+        digests: dict[int, GameDigests],
+    ) -> None:
+        """Create the games that do not exist yet, only the digest of existing games is updated."""
+        now = datetime.datetime.now().astimezone()
+        Game.objects.bulk_create(
+            [
+                Game(
+                    id=document.game_id,
+                    name=document.game["title"],
+                    # Can't do this using .get because sample_cover returns None not an empty dict
+                    image=None
+                    if document.game["sample_cover"] is None
+                    else document.game["sample_cover"]["thumbnail_image"],
+                    description=document.game["description"],
+                    content_digest=digests[document.game_id].game,
+                    info_modified_timestamp=now,
+                    info_timestamp=document.saved,
+                )
+                for document in documents
+                if document.game_id not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        Game.objects.bulk_update(
+            [
+                Game(id=document.game_id, content_digest=digests[document.game_id].game)
+                for document in documents
+                if document.game_id in existing
+            ],
+            ["content_digest"],
+        )
+
+    def import_genres(self, documents: list[GameDocument]) -> None:
+        """Replace the genres of the games."""
+        genres = {genre["genre_id"]: genre["genre_name"] for document in documents for genre in document.game["genres"]}
+        Genre.objects.bulk_create(
+            [Genre(id=genre_id, genre=genre_name) for genre_id, genre_name in genres.items()],
+            ignore_conflicts=True,
+        )
+
+        GameGenre.objects.filter(game_id__in=[document.game_id for document in documents]).delete()
+        GameGenre.objects.bulk_create(
+            GameGenre(game_id=document.game_id, genre_id=genre["genre_id"])
+            for document in documents
+            for genre in document.game["genres"]
+        )
+
+    def import_platforms(self, documents: list[GameDocument], digests: dict[int, GameDigests]) -> None:
+        """Add the platforms and the countries of every release that changed, existing releases are kept."""
+        game_ids = [document.game_id for document in documents]
+        game_platforms = self.game_platforms(game_ids)
+
+        # Dicts are used instead of sets so rows are created in the same order as GameManager.import_game creates them
+        platform_names: dict[int, str] = {}
+        release_countries: dict[tuple[int, int], dict[str, None]] = {}
+        for document in documents:
+            for platform in document.game["platforms"]:
+                key = (document.game_id, platform["platform_id"])
+                platform_digest = digests[document.game_id].platforms.get(platform["platform_id"])
+                # A platform without releases is not imported, and a platform with the same digest did not change
+                if platform_digest is not None and (
+                    not self.skip_unchanged or game_platforms.get(key, (None, None))[1] != platform_digest
+                ):
+                    platform_names[platform["platform_id"]] = platform["platform_name"]
+                    countries = release_countries.setdefault(key, {})
+                    countries.update(
+                        dict.fromkeys(
+                            country
+                            for release in document.platforms[platform["platform_id"]]["releases"]
+                            for country in release["countries"]
+                        ),
+                    )
+
+        Platform.objects.bulk_create(
+            [Platform(id=platform_id, name=name) for platform_id, name in platform_names.items()],
+            ignore_conflicts=True,
+        )
+
+        # Existing rows are left out instead of relying on ignore_conflicts alone, because a conflicting insert can use
+        # up an id and the rows would no longer get the same ids as with GameManager.import_game
+        GamePlatform.objects.bulk_create(
+            [
+                GamePlatform(
+                    game_id=game_id,
+                    platform_id=platform_id,
+                    content_digest=digests[game_id].platforms[platform_id],
+                )
+                for game_id, platform_id in release_countries
+                if (game_id, platform_id) not in game_platforms
+            ],
+            ignore_conflicts=True,
+        )
+        GamePlatform.objects.bulk_update(
+            [
+                GamePlatform(id=game_platforms[key][0], content_digest=digests[key[0]].platforms[key[1]])
+                for key in release_countries
+                if key in game_platforms
+            ],
+            ["content_digest"],
+        )
+        game_platform_ids = {
+            key: game_platform_id for key, (game_platform_id, _) in self.game_platforms(game_ids).items()
+        }
+
+        country_ids = COUNTRY_RESOLVER.resolve(
+            country for countries in release_countries.values() for country in countries
+        )
+        existing = set(
+            GamePlatformCountry.objects.filter(game_platform__game_id__in=game_ids).values_list(
+                "game_platform_id",
+                "country_id",
+            ),
+        )
+        GamePlatformCountry.objects.bulk_create(
+            [
+                GamePlatformCountry(game_platform_id=game_platform_ids[key], country_id=country_ids[country])
+                for key, countries in release_countries.items()
+                for country in countries
+                if (game_platform_ids[key], country_ids[country]) not in existing
+            ],
+            ignore_conflicts=True,
+        )
+
+    def game_platforms(self, game_ids: list[int]) -> dict[tuple[int, int], tuple[int, str]]:
+        """Get the ids and digests of the releases of games by game id and platform id."""
+        return {
+            (game_id, platform_id): (game_platform_id, content_digest)
+            for game_platform_id, game_id, platform_id, content_digest in GamePlatform.objects.filter(
+                game_id__in=game_ids,
+            ).values_list("id", "game_id", "platform_id", "content_digest")
+        }
@@ -0,0 +1,103 @@
+"""Digests of the parts of a game that are imported, so games that did not change are not imported again.
+
+Importing a game again deletes and creates its genres and looks up every release and country, even when MobyGames sent
+the same data. The digest of a game covers everything an import writes for an existing game, its genres and the
+releases on each platform, and the digest of a release covers the countries on one platform. They are saved with the
+rows, and when a game is imported again with the same digest nothing is written. The title, image, and description are
+left out because they are only written when a game is created.
+"""
+from __future__ import annotations
+
+import collections
+import hashlib
+import json
+import logging
+from enum import StrEnum
+from typing import Any, NamedTuple
+
+from games.metrics import SCRAPE_IMPORTS
+
+logger = logging.getLogger(__name__)
+
+
+class ImportOutcome(StrEnum):
+    """What importing a game that was outdated did."""
+
+    CREATED = "created"
+    CHANGED = "changed"
+    # The game was outdated but the data was the same, nothing was written
+    UNCHANGED = "unchanged"
+
+
+# The outcome of every import in this process since the last report
+IMPORT_OUTCOMES: collections.Counter[ImportOutcome] = collections.Counter()
+
+
+def count_outcome(outcome: ImportOutcome, count: int = 1) -> None:
+    """Record the outcome of imports for the next report and the metrics."""
+    IMPORT_OUTCOMES[outcome] += count
+    SCRAPE_IMPORTS.inc(count, outcome=outcome)
+
+
+class GameDigests(NamedTuple):
+    """The digest of a game and of each of its releases."""
+
+    game: str
+    # By platform id, platforms without releases are not imported and do not have a digest
+    platforms: dict[int, str]
+
+
+def digest(value: Any) -> str:  # noqa: ANN401 - Anything that can be saved as JSON
+    """Get a digest that is the same for equal values."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def game_platform_digest(platform_name: str, releases: list[dict[str, Any]]) -> str:
+    """Get the digest of the releases of a game on a platform, the order of releases and countries does not matter."""
+    return digest(
+        {
+            "name": platform_name,
+            "countries": sorted({country for release in releases for country in release["countries"]}),
+        },
+    )
+
+
+def game_digests(game: dict[str, Any], releases: dict[int, list[dict[str, Any]]]) -> GameDigests:
+    """Get the digests of a game.
+
+    Args:
+    ----
+        game: The parsed game file.
+        releases: The releases of the game by platform id.
+
+    Returns:
+    -------
+        The digests.
+    """
+    platforms = {
+        platform["platform_id"]: game_platform_digest(platform["platform_name"], releases[platform["platform_id"]])
+        for platform in game["platforms"]
+        if releases[platform["platform_id"]]
+    }
+    # Genres can be listed more than once and a row is created for each of them
+    genres = sorted([genre["genre_id"], genre["genre_name"]] for genre in game["genres"])
+    return GameDigests(digest({"genres": genres, "platforms": sorted(platforms.items())}), platforms)
+
+
+def report_outcomes() -> collections.Counter[ImportOutcome]:
+    """Log how many imports changed something since the last report.
+
+    Returns
+    -------
+        The number of imports with each outcome.
+    """
+    outcomes = IMPORT_OUTCOMES.copy()
+    IMPORT_OUTCOMES.clear()
+    if outcomes:
+        logger.info(
+            "Imported games: %s created, %s changed, %s unchanged",
+            outcomes[ImportOutcome.CREATED],
+            outcomes[ImportOutcome.CHANGED],
+            outcomes[ImportOutcome.UNCHANGED],
+        )
+    return outcomes
@@ -0,0 +1,196 @@
+"""Resolve the country names of releases to countries.
+
+Every country of every release used to be matched by looping over countries.json, and then looked up or created with
+get_or_create. The names and alternative names are put in a dict once instead, matched without caring about case or
+extra spaces, and the ids of the Country rows are kept for the whole process. Rows are named with the spelling from
+countries.json, so names that only differ in case or spaces share a row. Names that are not in countries.json are
+collected and reported together at the end of a run.
+"""
+from __future__ import annotations
+
+import functools
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from common.constants import BASE_DIR
+from django.db import transaction
+from games.models import Country
+from json_file import JSONFile
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+COUNTRY_FILE = JSONFile(BASE_DIR) / "countries" / "countries.json"
+
+
+def normalize(name: str) -> str:
+    """Normalize a country name so names that only differ in case or spaces match."""
+    return " ".join(name.split()).casefold()
+
+
+class CountryInfo(NamedTuple):
+    """The information saved for a country."""
+
+    code: str
+    flag: str
+    region: str
+
+
+class UnknownCountryError(ValueError):
+    """Raised when countries are not in countries.json."""
+
+    def __init__(self, names: list[str]) -> None:
+        """Initialize the error.
+
+        Args:
+        ----
+            names: The names that were not found.
+        """
+        self.names = names
+        super().__init__(f"Countries not found: {', '.join(names)}")
+
+
+class CountryIndex:
+    """Every name and alternative name in countries.json, and how it is spelled there, by normalized name."""
+
+    def __init__(self, countries: list[dict[str, Any]]) -> None:
+        """Build the index.
+
+        Args:
+        ----
+            countries: The parsed countries.json.
+        """
+        self.countries: dict[str, tuple[str, CountryInfo]] = {}
+        for country in countries:
+            info = CountryInfo(country["iso2"], country["emoji"], country["region"])
+            for name in [country["name"], *country.get("alternative_names", [])]:
+                # The first country with a name wins, the same as when the list was searched in order
+                self.countries.setdefault(normalize(name), (name, info))
+
+    def get(self, name: str) -> CountryInfo | None:
+        """Get the information for a country, or None if it is not in countries.json."""
+        country = self.countries.get(normalize(name))
+        return None if country is None else country[1]
+
+    def canonical(self, name: str) -> str | None:
+        """Get how a name is spelled in countries.json, or None if it is not in countries.json."""
+        country = self.countries.get(normalize(name))
+        return None if country is None else country[0]
+
+
+class CountryResolver:
+    """Gets the ids of countries by name, the ids are kept for the whole process by the spelling in countries.json."""
+
+    def __init__(self, index: CountryIndex) -> None:
+        """Initialize the resolver.
+
+        Args:
+        ----
+            index: The countries that names are matched against.
+        """
+        self.index = index
+        self.ids: dict[str, int] = {}
+        # The ids of the games each unknown name was found in
+        self.unknown: dict[str, set[int]] = {}
+        self.lock = threading.Lock()
+
+    def find_unknown(self, names: Iterable[str], game_id: int | None = None) -> list[str]:
+        """Get the names that are not in countries.json and remember them for the report.
+
+        Args:
+        ----
+            names: The names to check.
+            game_id: The game the names are from.
+
+        Returns:
+        -------
+            The unknown names in order without duplicates.
+        """
+        unknown = [name for name in dict.fromkeys(names) if self.index.get(name) is None]
+        with self.lock:
+            for name in unknown:
+                game_ids = self.unknown.setdefault(name, set())
+                if game_id is not None:
+                    game_ids.add(game_id)
+        return unknown
+
+    def resolve(self, names: Iterable[str], game_id: int | None = None) -> dict[str, int]:
+        """Get the ids of countries, creating the countries that are not in the database yet.
+
+        Args:
+        ----
+            names: The names of the countries, countries are created in this order.
+            game_id: The game the names are from, it is used in the report of unknown names.
+
+        Raises:
+        ------
+            UnknownCountryError: With every name that is not in countries.json, nothing is created.
+
+        Returns:
+        -------
+            The id of every country by the name it was given as.
+        """
+        names = list(dict.fromkeys(names))
+        unknown = self.find_unknown(names, game_id)
+        if unknown:
+            raise UnknownCountryError(unknown)
+
+        canonical = {name: self.index.canonical(name) or name for name in names}
+        ids = self.canonical_ids(list(dict.fromkeys(canonical.values())))
+        return {name: ids[canonical[name]] for name in names}
+
+    def canonical_ids(self, names: list[str]) -> dict[str, int]:
+        """Get the ids of countries by their spelling in countries.json, creating the countries that do not exist."""
+        with self.lock:
+            ids = {name: self.ids[name] for name in names if name in self.ids}
+        missing = [name for name in names if name not in ids]
+        if not missing:
+            return ids
+
+        found = dict(Country.objects.filter(name__in=missing).values_list("name", "id"))
+        new = [name for name in missing if name not in found]
+        if new:
+            Country.objects.bulk_create(
+                [Country(name=name, **self.index.get(name)._asdict()) for name in new],
+                ignore_conflicts=True,
+            )
+            found.update(Country.objects.filter(name__in=new).values_list("name", "id"))
+
+        # Only keep ids of rows that are committed, ids from a transaction that is rolled back would be wrong
+        transaction.on_commit(functools.partial(self.remember, found))
+        return ids | found
+
+    def remember(self, ids: dict[str, int]) -> None:
+        """Keep the ids of countries."""
+        with self.lock:
+            self.ids.update(ids)
+
+    def clear(self) -> None:
+        """Forget the ids of every country and the unknown names."""
+        with self.lock:
+            self.ids = {}
+            self.unknown = {}
+
+    def report(self) -> dict[str, set[int]]:
+        """Log every unknown name that was found since the last report.
+
+        Returns
+        -------
+            The ids of the games each unknown name was found in.
+        """
+        with self.lock:
+            unknown, self.unknown = self.unknown, {}
+
+        if unknown:
+            logger.warning(
+                "Countries not found in countries.json, the games are imported on a later run once they are added: %s",
+                "; ".join(f"{name} ({len(game_ids)} games)" for name, game_ids in unknown.items()),
+            )
+        return unknown
+
+
+COUNTRY_INDEX = CountryIndex(COUNTRY_FILE.parsed())
+COUNTRY_RESOLVER = CountryResolver(COUNTRY_INDEX)
@@ -0,0 +1,146 @@
+"""Parsed JSON documents that are shared by every stage of the scrape.
+
+A game file is written from a list page, read to find its platforms, and read again to import it, and every release
+file is parsed again when it is imported, even though download_and_save already parsed the same content to check it.
+The content of a file is put in the cache when it is downloaded or written, and files that are read are parsed once.
+The cache counts the size of the content of every document, and the least recently used documents are dropped once it
+is over settings.DOCUMENT_CACHE_BYTES.
+"""
+from __future__ import annotations
+
+import collections
+import json
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from scrape.raw_store import RawFile
+
+logger = logging.getLogger(__name__)
+
+
+class CacheStats(NamedTuple):
+    """How the cache was used since the last report."""
+
+    hits: int
+    misses: int
+    evictions: int
+    # The size of the content of the documents that are in the cache
+    size: int
+    documents: int
+
+    @property
+    def hit_rate(self) -> float:
+        """The share of reads that did not have to parse the file."""
+        reads = self.hits + self.misses
+        return self.hits / reads if reads else 0.0
+
+
+class DocumentCache:
+    """Parsed documents by key, the least recently used ones are dropped once the cache is full."""
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize the cache.
+
+        Args:
+        ----
+            max_size: The most bytes of content the documents in the cache can have together.
+        """
+        self.max_size = max_size
+        # The document and the size of its content by key, from the least to the most recently used
+        self.documents: collections.OrderedDict[str, tuple[Any, int]] = collections.OrderedDict()
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        # Downloads are saved on the background threads of the scheduler
+        self.lock = threading.Lock()
+
+    def get(self, file: RawFile) -> Any:  # noqa: ANN401 - Any JSON
+        """Get the parsed content of a file, the file is only read and parsed if it is not in the cache.
+
+        The same object is returned every time, so it must not be changed.
+        """
+        key = str(file)
+        with self.lock:
+            if key in self.documents:
+                self.hits += 1
+                self.documents.move_to_end(key)
+                return self.documents[key][0]
+            self.misses += 1
+
+        # Parsing is done without the lock so downloads are not held up by it
+        content = file.read_text(encoding="utf-8")
+        return self.put(file, content)
+
+    def put(self, file: RawFile, content: str, document: Any = None) -> Any:  # noqa: ANN401 - Any JSON
+        """Add the content of a file that was downloaded or written.
+
+        Args:
+        ----
+            file: The file the content is saved in.
+            content: The content of the file.
+            document: The parsed content, it is parsed from content if it is None.
+
+        Returns:
+        -------
+            The parsed content.
+        """
+        document = json.loads(content) if document is None else document
+        size = len(content.encode("utf-8"))
+        key = str(file)
+        with self.lock:
+            self.remove(key)
+            # A document that is larger than the whole cache would only push out everything else
+            if size <= self.max_size:
+                self.documents[key] = (document, size)
+                self.size += size
+                while self.size > self.max_size:
+                    _, (_, evicted_size) = self.documents.popitem(last=False)
+                    self.size -= evicted_size
+                    self.evictions += 1
+        return document
+
+    def discard(self, file: RawFile) -> None:
+        """Remove a file that was deleted or changed without its content."""
+        with self.lock:
+            self.remove(str(file))
+
+    def remove(self, key: str) -> None:
+        """Remove a document, it must be called with the lock held."""
+        if key in self.documents:
+            _, size = self.documents.pop(key)
+            self.size -= size
+
+    def clear(self) -> None:
+        """Remove every document and reset the counts."""
+        with self.lock:
+            self.documents.clear()
+            self.size = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def report(self) -> CacheStats:
+        """Log the hit rate and size of the cache, and reset the counts.
+
+        Returns
+        -------
+            How the cache was used since the last report.
+        """
+        with self.lock:
+            stats = CacheStats(self.hits, self.misses, self.evictions, self.size, len(self.documents))
+            self.hits = self.misses = self.evictions = 0
+
+        if stats.hits or stats.misses:
+            logger.info(
+                "Document cache: %.1f%% of %s reads were cached, %s documents using %.1f MB, %s evicted",
+                stats.hit_rate * 100,
+                stats.hits + stats.misses,
+                stats.documents,
+                stats.size / 1024 / 1024,
+                stats.evictions,
+            )
+        return stats
+
+
+DOCUMENT_CACHE = DocumentCache(settings.DOCUMENT_CACHE_BYTES)
@@ -1,39 +1,102 @@
 """Function to download a file and save it to the file system."""
 from __future__ import annotations
 
+import http.client
 import json
-import time
-import urllib.parse
-import urllib.request
+from http import HTTPStatus
 from typing import TYPE_CHECKING
 
-from api_key import API_KEY
+from games.metrics import SCRAPE_REQUEST_SECONDS, SCRAPE_REQUESTS, SCRAPE_RESPONSE_BYTES
+
+from scrape.api_client import API_CLIENT, ApiClient, ApiError, RetryableError
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.raw_store import set_mtime
+from scrape.scheduler import DOWNLOAD_SCHEDULER
+from scrape.validators import VALIDATOR_STORE, Validators, ValidatorStore, content_hash
 
 if TYPE_CHECKING:
-    from json_file import JSONFile
+    from concurrent.futures import Future
+
+    from scrape.raw_store import RawFile
+
+
+def fetch_and_save(
+    url: str,
+    file_path: RawFile,
+    params: dict[str, str | int] | None = None,
+    *,
+    client: ApiClient = API_CLIENT,
+    store: ValidatorStore = VALIDATOR_STORE,
+) -> bool:
+    """Download a file and save it to the file system or the packed store right away, ignoring the rate limit.
+
+    If the file was downloaded before the request is conditional on the validators of the last download. When the file
+    did not change it is not written again, only its modification time is updated to show that it is fresh.
+
+    Args:
+    ----
+        url: The URL of the endpoint.
+        file_path: Where to save the file.
+        params: The query parameters.
+        client: The client that sends the request.
+        store: Where the validators of the downloaded files are kept.
+
+    Returns:
+    -------
+        True if the content of the file changed.
+    """
+    validators = store.get(file_path) if file_path.exists() else None
+    headers = validators.request_headers() if validators else None
+    try:
+        with SCRAPE_REQUEST_SECONDS.time():
+            response = client.get(url, params, headers)
+    except (ApiError, RetryableError) as error:
+        SCRAPE_REQUESTS.inc(status=error.status)
+        raise
+    except (OSError, http.client.HTTPException):
+        SCRAPE_REQUESTS.inc(status="error")
+        raise
+    SCRAPE_REQUESTS.inc(status=response.status)
+    SCRAPE_RESPONSE_BYTES.inc(len(response.content.encode("utf-8")))
+
+    if response.status == HTTPStatus.NOT_MODIFIED and validators:
+        set_mtime(file_path)
+        return False
+
+    content = response.content
+
+    # Load the content to verify it is valid JSON before saving it, it is kept so the file does not have to be parsed
+    document = json.loads(content)
+
+    new_hash = content_hash(content)
+    if validators:
+        old_hash = validators.content_hash
+    else:
+        # Files that were downloaded before validators were saved can still be compared by their content
+        old_hash = content_hash(file_path.read_text(encoding="utf-8")) if file_path.exists() else None
+
+    changed = new_hash != old_hash
+    if changed:
+        file_path.write(content)
+    else:
+        set_mtime(file_path)
+    DOCUMENT_CACHE.put(file_path, content, document)
 
+    store.set(file_path, Validators(response.headers.get("ETag"), response.headers.get("Last-Modified"), new_hash))
+    return changed
 
-def download_and_save(url: str, file_path: JSONFile, params: dict[str, str | int] | None = None) -> None:
-    """Download a file and save it to the file system."""
-    if not params:
-        params = {}
 
-    url = url + urllib.parse.urlencode({**params, "api_key": API_KEY})
+def submit_download(url: str, file_path: RawFile, params: dict[str, str | int] | None = None) -> Future[bool]:
+    """Download a file and save it to the file system in the background once the rate limit allows it.
 
-    # This is completely pointless, but it SHOULD fullfills a ruff linter requirement, unfortunately it does not work
-    # even though this code was copied directly from the documentation.
-    if not url.startswith(("http:", "https:")):
-        msg = "URL must start with 'http:' or 'https:'"
-        raise ValueError(msg)
+    The result of the future is True if the content of the file changed.
+    """
+    return DOWNLOAD_SCHEDULER.submit(fetch_and_save, url, file_path, params)
 
-    request = urllib.request.Request(url, headers={"User-Agent": "Scraper"})  # noqa: S310 - This linter is bugged
-    content = urllib.request.urlopen(request).read().decode("utf-8")  # noqa: S310 - This linter is bugged
 
-    # Load the content to verify it is valid JSON before saving it
-    json.loads(content)
-    file_path.write(content)
+def download_and_save(url: str, file_path: RawFile, params: dict[str, str | int] | None = None) -> bool:
+    """Download a file and save it to the file system, waiting until it is saved.
 
-    # Always sleep 10 seconds after every download according to the API requirements
-    time.sleep(10)
-    # Don't bother returning the response and just reload it from the file every time because the 10 second wait makes
-    # the difference in performance negligible
+    Returns True if the content of the file changed.
+    """
+    return submit_download(url, file_path, params).result()
@@ -4,24 +4,31 @@ from __future__ import annotations
 import datetime
 import json
 import logging
-import os
 from typing import TYPE_CHECKING
 
 import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
-from common.constants import BASE_DIR, DOWNLOADED_FILES_DIR
+from common.constants import DOWNLOADED_FILES_DIR
 from django.db import transaction
-from games.models import Country, Game, GameGenre, GamePlatform, GamePlatformCountry, Genre, Platform
+from games.metrics import SCRAPE_DB_WRITE_SECONDS, SCRAPE_IMPORTS, UP_TO_DATE
+from games.models import Game, GameGenre, GamePlatform, GamePlatformCountry, Genre, Platform
+from games.signatures import update_signatures
 from json_file import JSONFile
 
-from scrape.download_and_save import download_and_save
+from scrape.content_digest import ImportOutcome, count_outcome, game_digests
+from scrape.countries import COUNTRY_RESOLVER
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.download_and_save import download_and_save, submit_download
+from scrape.raw_store import GAMES_FOLDER, raw_file, set_mtime
+from scrape.scheduler import wait_for
 
 if TYPE_CHECKING:
+    from concurrent.futures import Future
     from typing import Any
 
+    from scrape.raw_store import RawFile
+
 BASE_GAMES_URL = "https://api.mobygames.com/v1/games?"
 GAME_LIST_FOLDER = JSONFile(DOWNLOADED_FILES_DIR) / "platforms"
-COUNTRY_FILE = JSONFile(BASE_DIR) / "countries" / "countries.json"
-COUNTRIES = COUNTRY_FILE.parsed()
 
 
 logging.getLogger().setLevel(logging.INFO)
@@ -35,11 +42,11 @@ class GameManager:
     def __init__(self, game_id: int) -> None:
         """Initialize the game manager."""
         self.game_id = game_id
-        self.game_json_path = JSONFile(DOWNLOADED_FILES_DIR / "games" / f"{self.game_id}.json")
+        self.game_json_path = raw_file(f"{GAMES_FOLDER}/{self.game_id}.json")
 
-    def game_platform_json_path(self, platform_id: int) -> JSONFile:
+    def game_platform_json_path(self, platform_id: int) -> RawFile:
         """Path for the platform JSON file."""
-        return JSONFile(DOWNLOADED_FILES_DIR, "games", self.game_id, "platforms", f"{platform_id}.json")
+        return raw_file(f"{GAMES_FOLDER}/{self.game_id}/platforms/{platform_id}.json")
 
     def game_platform_json_url(self, platform_id: int) -> str:
         """Url for the platform JSON file."""
@@ -49,14 +56,23 @@ class GameManager:
         """Url for the game JSON file."""
         return f"https://api.mobygames.com/v1/games/{self.game_id}?"
 
-    def extract_game_json(self, game_json: dict[str, Any], data_timestamp: datetime.datetime) -> None:
-        """Save the game json to the file system."""
+    def extract_game_json(self, game_json: dict[str, Any], data_timestamp: datetime.datetime) -> bool:
+        """Save the game json to the file system.
+
+        Returns
+        -------
+            True if the content of the file changed.
+        """
         game_json_path = self.game_json_path
-        if not game_json_path.up_to_date(data_timestamp):
-            game_json_path.write(json.dumps(game_json))
-            a_time = game_json_path.lstat().st_mtime
-            m_time = data_timestamp.timestamp()
-            os.utime(game_json_path, (a_time, m_time))
+        if game_json_path.up_to_date(data_timestamp):
+            return False
+
+        changed = not game_json_path.exists() or DOCUMENT_CACHE.get(game_json_path) != game_json
+        content = json.dumps(game_json)
+        game_json_path.write(content)
+        set_mtime(game_json_path, data_timestamp)
+        DOCUMENT_CACHE.put(game_json_path, content, game_json)
+        return changed
 
     def download_game(self, minimum_info_timestamp: datetime.datetime | None = None) -> None:
         """Download the game information."""
@@ -71,7 +87,12 @@ class GameManager:
 
     def download_game_platforms(self, minimum_info_timestamp: datetime.datetime | None = None) -> None:
         """Download all of the platform information for a game."""
-        game_json_parsed = self.game_json_path.parsed_cached()
+        wait_for(self.submit_game_platforms(minimum_info_timestamp))
+
+    def submit_game_platforms(self, minimum_info_timestamp: datetime.datetime | None = None) -> list[Future[bool]]:
+        """Start downloading all of the platform information for a game in the background."""
+        downloads = []
+        game_json_parsed = DOCUMENT_CACHE.get(self.game_json_path)
         for platform in game_json_parsed["platforms"]:
             game_json_path = self.game_platform_json_path(platform["platform_id"])
             if game_json_path.outdated(minimum_info_timestamp):
@@ -87,7 +108,9 @@ class GameManager:
                 )
 
                 url = self.game_platform_json_url(platform["platform_id"])
-                download_and_save(url, game_json_path)
+                downloads.append(submit_download(url, game_json_path))
+
+        return downloads
 
     @transaction.atomic
     def import_game(
@@ -96,7 +119,7 @@ class GameManager:
         info_modified_timestamp: datetime.datetime | None = None,
     ) -> None:
         """Import the information for a specific game."""
-        game = self.game_json_path.parsed_cached()
+        game = DOCUMENT_CACHE.get(self.game_json_path)
         game_string = f"{self.game_id}. {game['title']}"
 
         logger.info("Importing: %s", game_string)
@@ -106,28 +129,50 @@ class GameManager:
         # Check if game is already imported
         if game_object and game_object.is_up_to_date(info_timestamp, info_modified_timestamp):
             logger.info("Data Up To Date: %s", game_string)
+            SCRAPE_IMPORTS.inc(outcome=UP_TO_DATE)
+            return
+
+        releases = {
+            platform["platform_id"]: DOCUMENT_CACHE.get(self.game_platform_json_path(platform["platform_id"]))[
+                "releases"
+            ]
+            for platform in game["platforms"]
+        }
+        digests = game_digests(game, releases)
+
+        # Only the timestamps changed, MobyGames sent the same data again
+        if game_object and game_object.content_digest == digests.game:
+            logger.info("Data Unchanged: %s", game_string)
+            count_outcome(ImportOutcome.UNCHANGED)
             return
 
         logger.info("Data Outdated: %s", game_string)
+        outcome = ImportOutcome.CHANGED if game_object else ImportOutcome.CREATED
 
         # Can't do this using .get because sample_cover returns None not an empty dict
         image_url = None if game["sample_cover"] is None else game["sample_cover"]["thumbnail_image"]
 
-        # Use game["game_id"] instead of self.game_id just in case there is ever a mismatch due to some silly mistake
-        game_object = Game.objects.get_or_create(
-            id=game["game_id"],
-            defaults={
-                "id": game["game_id"],
-                "name": game["title"],
-                "image": image_url,
-                "description": game["description"],
-                "info_modified_timestamp": datetime.datetime.now().astimezone(),
-                "info_timestamp": self.game_json_path.aware_mtime(),
-            },
-        )[0]
-
-        self.import_game_genres(game_object, game)
-        self.import_game_platforms(game_object, game)
+        with SCRAPE_DB_WRITE_SECONDS.time(path="game"):
+            # Use game["game_id"] instead of self.game_id just in case there is ever a mismatch due to a silly mistake
+            game_object, created = Game.objects.get_or_create(
+                id=game["game_id"],
+                defaults={
+                    "id": game["game_id"],
+                    "name": game["title"],
+                    "image": image_url,
+                    "description": game["description"],
+                    "content_digest": digests.game,
+                    "info_modified_timestamp": datetime.datetime.now().astimezone(),
+                    "info_timestamp": self.game_json_path.aware_mtime(),
+                },
+            )
+            if not created:
+                game_object.content_digest = digests.game
+                game_object.save(update_fields=["content_digest"])
+
+            self.import_game_genres(game_object, game)
+            self.import_game_platforms(game_object, game, releases, digests.platforms)
+        count_outcome(outcome)
 
     def import_game_genres(self, game_object: Game, game: dict[str, Any]) -> None:
         """Import all of the genres for a game."""
@@ -138,28 +183,54 @@ class GameManager:
             genre_object = Genre.objects.get_or_create(id=genre["genre_id"], defaults={"genre": genre["genre_name"]})[0]
             GameGenre.objects.create(game=game_object, genre=genre_object)
 
-    def import_game_platforms(self, game_object: Game, game: dict[str, Any]) -> None:
-        """Import all of the platforms for a game."""
-        for platform in game["platforms"]:
-            parsed_game_platforms = self.game_platform_json_path(platform["platform_id"]).parsed()
-
-            for release in parsed_game_platforms["releases"]:
-                platform_object = Platform.objects.get_or_create(
-                    id=platform["platform_id"],
-                    name=platform["platform_name"],
-                )[0]
-                game_platform = GamePlatform.objects.get_or_create(game=game_object, platform=platform_object)[0]
-
+    def import_game_platforms(
+        self,
+        game_object: Game,
+        game: dict[str, Any],
+        releases: dict[int, list[dict[str, Any]]],
+        digests: dict[int, str],
+    ) -> None:
+        """Import all of the platforms for a game, the platforms with the same digest as last time are skipped."""
+        imported_digests = dict(
+            GamePlatform.objects.filter(game=game_object).values_list("platform_id", "content_digest"),
+        )
+        changed = [
+            platform
+            for platform in game["platforms"]
+            if platform["platform_id"] in digests
+            and imported_digests.get(platform["platform_id"]) != digests[platform["platform_id"]]
+        ]
+
+        # Every unknown country of the game is found at once, before any country is created
+        country_ids = COUNTRY_RESOLVER.resolve(
+            (
+                country
+                for platform in changed
+                for release in releases[platform["platform_id"]]
+                for country in release["countries"]
+            ),
+            self.game_id,
+        )
+
+        for platform in changed:
+            platform_object = Platform.objects.get_or_create(
+                id=platform["platform_id"],
+                name=platform["platform_name"],
+            )[0]
+            game_platform = GamePlatform.objects.update_or_create(
+                game=game_object,
+                platform=platform_object,
+                defaults={"content_digest": digests[platform["platform_id"]]},
+            )[0]
+
+            for release in releases[platform["platform_id"]]:
                 for country in release["countries"]:
-                    country_code, flag, region = self.get_country_match(country)
-                    country_object = Country.objects.get_or_create(
-                        name=country,
-                        code=country_code,
-                        flag=flag,
-                        region=region,
-                    )[0]
+                    GamePlatformCountry.objects.get_or_create(
+                        game_platform=game_platform,
+                        country_id=country_ids[country],
+                    )
 
-                    GamePlatformCountry.objects.get_or_create(game_platform=game_platform, country=country_object)
+        update_signatures([game_object.id])
 
     def update_game(
         self,
@@ -172,12 +243,3 @@ class GameManager:
         self.extract_game_json(game, data_timestamp)
         self.download_game_platforms(minimum_info_timestamp)
         self.import_game(minimum_info_timestamp, minimum_info_modified_timestamp)
-
-    def get_country_match(self, country: str) -> tuple[str, str, str]:
-        """Get the country code, flag, and region for a country."""
-        for country_info in COUNTRIES:
-            if country_info["name"] == country or country in country_info.get("alternative_names", []):
-                return country_info["iso2"], country_info["emoji"], country_info["region"]
-
-        msg = f"Country not found: {country}"
-        raise ValueError(msg)
@@ -4,6 +4,7 @@ import logging
 
 import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
 from common.constants import DOWNLOADED_FILES_DIR
+from games.generation import bump_generation
 from games.models import Platform
 from json_file import JSONFile
 
@@ -30,6 +31,9 @@ def import_platforms() -> None:
     for platform in PLATFORMS_JSON_PATH.parsed()["platforms"]:
         import_platform(platform["platform_id"], platform["platform_name"])
 
+    # The cached platform choices are rebuilt after the data generation changes
+    bump_generation()
+
 
 # This is a seperate function just in case I need to import a platform after the list of platforms has been imported.
 # For example a new platform is added to MobyGames and new games are released on it.
@@ -0,0 +1,513 @@
+"""Crash-safe queue of scrape work.
+
+Every piece of scrape work is a ScrapeJob row. The scrape entry points enqueue jobs and run_worker drains them. A worker
+leases each job before it starts it, so if the worker is killed the lease runs out and the job is picked up again by the
+next worker. Finished jobs are kept, so enqueueing the same work again does nothing and a worker that is started again
+resumes exactly where the last one stopped. Jobs that failed too many times are tried again when the same work is
+enqueued again.
+
+Downloads run on the background download scheduler while everything that touches the database runs on the worker's
+thread, so importing one game overlaps with the downloads for the next games. Each kind of job is a stage of the
+scrape, every stage can have its own limit on the downloads it has waiting in the scheduler so the next list page can
+download while the releases of the last one are still downloading, and a stage can be held back while the jobs it
+enqueues pile up. The worker logs the throughput of every stage when it stops.
+"""
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import datetime
+import logging
+import os
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q, QuerySet
+from games.generation import bump_generation
+from games.models import ScrapeJob
+
+from scrape.scheduler import cancel
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from concurrent.futures import Future
+
+    from paved_path import PavedPath
+
+logger = logging.getLogger(__name__)
+
+# Jobs with a higher priority are claimed first, imports go first so that each game is finished before the next one is
+# started and only the work for a few games is ever half done
+PRIORITIES = {
+    ScrapeJob.Kind.IMPORT: 30,
+    ScrapeJob.Kind.GAME_PLATFORM: 20,
+    ScrapeJob.Kind.GAME: 10,
+    ScrapeJob.Kind.LIST_PAGE: 0,
+}
+
+# How long a worker can hold a job before another worker may take it over
+LEASE_DURATION = datetime.timedelta(minutes=10)
+
+# Number of times a job is tried before it is marked as failed
+MAX_ATTEMPTS = 5
+
+# How long to wait before trying a failed job again, it is multiplied by the number of attempts
+RETRY_DELAY = datetime.timedelta(minutes=1)
+
+# How long to wait before trying a job again after an error that only goes away once something outside of the scrape is
+# fixed, the worker stops before then so the job is tried again on a later run
+POSTPONE_DELAY = datetime.timedelta(hours=1)
+
+# Number of downloads that can wait in the download scheduler at the same time, they must all start well before their
+# leases run out
+MAX_DOWNLOADS_IN_FLIGHT = 10
+
+# Number of jobs that change the data between each bump of the data generation
+CHANGES_PER_GENERATION = 100
+
+# Number of keys in each statement that puts failed jobs back in the queue
+REQUEUE_CHUNK_SIZE = 500
+
+UNFINISHED = (ScrapeJob.Status.PENDING, ScrapeJob.Status.LEASED)
+
+
+class JobType(NamedTuple):
+    """How to run a kind of job.
+
+    start_download runs on the worker's thread, it returns the future from submit_download when the job needs to
+    download something, or None when it does not. Once the download is saved its result is kept in the payload as
+    download_result, and finish runs on the worker's thread in the same transaction that marks the job as done.
+
+    Kinds of jobs without downloads can have finish_batch, then up to batch_size jobs that are ready are claimed
+    together and finished in a single transaction. If the batch fails each job is finished on its own with finish, so
+    one bad job does not fail the whole batch.
+
+    max_in_flight limits the downloads of this kind that wait in the download scheduler at the same time, on top of
+    MAX_DOWNLOADS_IN_FLIGHT for every kind together. Jobs of a kind with max_backlog are only claimed while fewer than
+    max_backlog jobs of the kinds in backlog_kinds are unfinished, unless there is nothing else to do.
+
+    Jobs that raise one of the errors in postpone_errors are tried again after POSTPONE_DELAY without counting it as an
+    attempt, so they never fail for good because of something that has to be fixed by hand.
+    """
+
+    finish: Callable[[ScrapeJob], None]
+    start_download: Callable[[ScrapeJob], Future[Any] | None] | None = None
+    changes_data: bool = False
+    finish_batch: Callable[[list[ScrapeJob]], None] | None = None
+    batch_size: int = 1
+    max_in_flight: int | None = None
+    max_backlog: int | None = None
+    backlog_kinds: tuple[str, ...] = ()
+    postpone_errors: tuple[type[Exception], ...] = ()
+
+
+class StageThroughput(NamedTuple):
+    """How many jobs of a kind a worker ran."""
+
+    done: int
+    failed: int
+    # How long the worker ran
+    seconds: float
+
+    @property
+    def per_minute(self) -> float:
+        """The number of jobs that were done each minute."""
+        return self.done / self.seconds * 60 if self.seconds else 0.0
+
+
+def new_job(kind: str, key: str, payload: dict[str, Any], game_id: int | None = None) -> ScrapeJob:
+    """Create a job that can be enqueued.
+
+    Args:
+    ----
+        kind: The kind of the job.
+        key: Identifies the work, a job is only ever enqueued once for each key.
+        payload: Everything the job needs to run, it must be JSON serializable.
+        game_id: The game the job is for, imports wait until the downloads for their game are done.
+
+    Returns:
+    -------
+        The unsaved job.
+    """
+    return ScrapeJob(
+        key=key,
+        kind=kind,
+        priority=PRIORITIES[kind],
+        game_id=game_id,
+        payload=payload,
+        available=datetime.datetime.now().astimezone(),
+    )
+
+
+def enqueue(*jobs: ScrapeJob) -> None:
+    """Add jobs to the queue, jobs with the same key as a job that was already added are ignored.
+
+    Jobs with the same key that failed too many times are tried again from the first attempt.
+    """
+    ScrapeJob.objects.bulk_create(jobs, ignore_conflicts=True)
+    requeue([job.key for job in jobs])
+
+
+def requeue(keys: list[str]) -> int:
+    """Put the jobs with the keys that failed too many times back in the queue with no attempts.
+
+    Returns
+    -------
+        The number of jobs that were put back.
+    """
+    requeued = 0
+    # SQLite limits the number of parameters of a statement
+    for start in range(0, len(keys), REQUEUE_CHUNK_SIZE):
+        requeued += ScrapeJob.objects.filter(
+            key__in=keys[start : start + REQUEUE_CHUNK_SIZE],
+            status=ScrapeJob.Status.FAILED,
+        ).update(
+            status=ScrapeJob.Status.PENDING,
+            attempts=0,
+            available=datetime.datetime.now().astimezone(),
+        )
+    if requeued:
+        logger.info("Requeued %s jobs that failed before", requeued)
+    return requeued
+
+
+def requeue_folder(folder: PavedPath) -> int:
+    """Put the jobs for the files in a folder that failed too many times back in the queue with no attempts.
+
+    The key of every job of a game list has the path of its page, so this retries every stage of a list whose first
+    page is already done and would not be enqueued again.
+
+    Returns
+    -------
+        The number of jobs that were put back.
+    """
+    keys = ScrapeJob.objects.filter(key__contains=f"{folder}{os.sep}", status=ScrapeJob.Status.FAILED)
+    return requeue(list(keys.values_list("key", flat=True)))
+
+
+def failed_count() -> int:
+    """Get the number of jobs that failed too many times and are only tried again when they are enqueued again."""
+    return ScrapeJob.objects.filter(status=ScrapeJob.Status.FAILED).count()
+
+
+def claimable(now: datetime.datetime) -> QuerySet[ScrapeJob]:
+    """Get the jobs that a worker can claim."""
+    unfinished_downloads = ScrapeJob.objects.filter(
+        game_id=OuterRef("game_id"),
+        kind=ScrapeJob.Kind.GAME_PLATFORM,
+        status__in=UNFINISHED,
+    )
+    return (
+        ScrapeJob.objects.filter(
+            Q(status=ScrapeJob.Status.PENDING, available__lte=now)
+            | Q(status=ScrapeJob.Status.LEASED, lease_expires__lte=now),
+        )
+        # Imports wait until every download for the same game is done
+        .exclude(Exists(unfinished_downloads), kind=ScrapeJob.Kind.IMPORT)
+    )
+
+
+def claim(kinds: list[str]) -> ScrapeJob | None:
+    """Lease the next job.
+
+    Args:
+    ----
+        kinds: The kinds of jobs that can be claimed.
+
+    Returns:
+    -------
+        The job with the highest priority that is ready, or None if there is no job ready.
+    """
+    while True:
+        now = datetime.datetime.now().astimezone()
+        ready = claimable(now).filter(kind__in=kinds)
+        job = ready.order_by("-priority", "id").first()
+        if job is None:
+            return None
+
+        # Another worker could claim the same job between the select and the update
+        claimed = ready.filter(id=job.id).update(
+            status=ScrapeJob.Status.LEASED,
+            lease_expires=now + LEASE_DURATION,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def claim_many(kinds: list[str], limit: int) -> list[ScrapeJob]:
+    """Lease up to limit jobs that are ready, in the same order claim would lease them.
+
+    Jobs that another worker claims at the same time are left out, so fewer jobs can be returned even though more jobs
+    are ready.
+    """
+    now = datetime.datetime.now().astimezone()
+    ready = claimable(now).filter(kind__in=kinds)
+    job_ids = list(ready.order_by("-priority", "id").values_list("id", flat=True)[:limit])
+    if not job_ids:
+        return []
+
+    # The lease expiry tells the jobs claimed by this update apart from jobs claimed by another worker
+    lease_expires = now + LEASE_DURATION
+    ready.filter(id__in=job_ids).update(
+        status=ScrapeJob.Status.LEASED,
+        lease_expires=lease_expires,
+        attempts=F("attempts") + 1,
+    )
+    return list(
+        ScrapeJob.objects.filter(id__in=job_ids, status=ScrapeJob.Status.LEASED, lease_expires=lease_expires).order_by(
+            "-priority",
+            "id",
+        ),
+    )
+
+
+def complete(job: ScrapeJob) -> None:
+    """Mark a job as done."""
+    job.status = ScrapeJob.Status.DONE
+    job.completed = datetime.datetime.now().astimezone()
+    job.lease_expires = None
+    job.error = ""
+    job.save(update_fields=["status", "completed", "lease_expires", "error", "payload"])
+
+
+def fail(job: ScrapeJob, error: BaseException) -> None:
+    """Put a job that failed back in the queue, or mark it as failed after too many attempts."""
+    now = datetime.datetime.now().astimezone()
+    job.status = ScrapeJob.Status.FAILED if job.attempts >= MAX_ATTEMPTS else ScrapeJob.Status.PENDING
+    job.available = now + RETRY_DELAY * job.attempts
+    job.lease_expires = None
+    job.error = repr(error)
+    job.save(update_fields=["status", "available", "lease_expires", "error"])
+
+
+def postpone(job: ScrapeJob, error: BaseException) -> None:
+    """Put a job back in the queue until POSTPONE_DELAY is over without counting it as an attempt."""
+    job.status = ScrapeJob.Status.PENDING
+    job.attempts -= 1
+    job.available = datetime.datetime.now().astimezone() + POSTPONE_DELAY
+    job.lease_expires = None
+    job.error = repr(error)
+    job.save(update_fields=["status", "attempts", "available", "lease_expires", "error"])
+
+
+def release(job: ScrapeJob) -> None:
+    """Put a job back in the queue without counting it as an attempt, used when the worker is stopped."""
+    ScrapeJob.objects.filter(id=job.id, status=ScrapeJob.Status.LEASED).update(
+        status=ScrapeJob.Status.PENDING,
+        lease_expires=None,
+        attempts=F("attempts") - 1,
+    )
+
+
+class Worker:
+    """Runs jobs, downloads wait in the download scheduler while other jobs run."""
+
+    def __init__(self, job_types: dict[str, JobType]) -> None:
+        """Initialize the worker.
+
+        Args:
+        ----
+            job_types: How to run each kind of job, jobs of other kinds are left in the queue.
+        """
+        self.job_types = job_types
+        self.in_flight: dict[Future[Any], ScrapeJob] = {}
+        self.current: list[ScrapeJob] = []
+        self.done = 0
+        self.changes = 0
+        self.done_by_kind: collections.Counter[str] = collections.Counter()
+        self.failed_by_kind: collections.Counter[str] = collections.Counter()
+        self.started = time.monotonic()
+
+    def run(self) -> int:
+        """Run jobs until the queue has no more jobs that are ready.
+
+        Returns
+        -------
+            The number of jobs that were done.
+        """
+        self.started = time.monotonic()
+        try:
+            while self.step():
+                pass
+        except BaseException:
+            self.stop()
+            raise
+        finally:
+            if self.changes:
+                bump_generation()
+            self.report()
+
+        return self.done
+
+    def ready_kinds(self, *, backpressure: bool = True) -> list[str]:
+        """Get the kinds of jobs that can be claimed without going over the limits of their stage.
+
+        Args:
+        ----
+            backpressure: Leave out the kinds that have too many unfinished jobs waiting after them.
+
+        Returns:
+        -------
+            The kinds that can be claimed.
+        """
+        in_flight = collections.Counter(job.kind for job in self.in_flight.values())
+        kinds = []
+        for kind, job_type in self.job_types.items():
+            if job_type.start_download and (
+                len(self.in_flight) >= MAX_DOWNLOADS_IN_FLIGHT
+                or in_flight[kind] >= (job_type.max_in_flight or MAX_DOWNLOADS_IN_FLIGHT)
+            ):
+                continue
+            if (
+                backpressure
+                and job_type.max_backlog is not None
+                and ScrapeJob.objects.filter(kind__in=job_type.backlog_kinds, status__in=UNFINISHED).count()
+                >= job_type.max_backlog
+            ):
+                continue
+            kinds.append(kind)
+        return kinds
+
+    def step(self) -> bool:
+        """Finish the downloads that were saved and start the next job.
+
+        Returns
+        -------
+            False once there are no jobs that are ready and no downloads left to wait for.
+        """
+        for download in [download for download in self.in_flight if download.done()]:
+            self.finish(self.in_flight.pop(download), download)
+
+        job = claim(self.ready_kinds())
+        if job is None and not self.in_flight:
+            # The jobs a stage is held back for can be waiting to be retried, it must not stop the worker
+            job = claim(self.ready_kinds(backpressure=False))
+        if job is None:
+            if not self.in_flight:
+                return False
+            concurrent.futures.wait(self.in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            return True
+
+        self.current = [job]
+        job_type = self.job_types[job.kind]
+        if job_type.finish_batch:
+            self.current += claim_many([job.kind], job_type.batch_size - 1)
+            self.finish_batch(self.current)
+        else:
+            self.start(job)
+        self.current = []
+        return True
+
+    def start(self, job: ScrapeJob) -> None:
+        """Start a job, it is finished right away unless it has to wait for a download."""
+        start_download = self.job_types[job.kind].start_download
+        try:
+            download = start_download(job) if start_download else None
+        except Exception as error:  # noqa: BLE001 - Any error fails the job
+            self.failed(job, error)
+            return
+
+        if download is None:
+            self.finish(job, None)
+        else:
+            self.in_flight[download] = job
+
+    def finish(self, job: ScrapeJob, download: Future[Any] | None) -> None:
+        """Finish a job after its download is saved, in the same transaction that marks it as done."""
+        try:
+            if download is not None:
+                job.payload = {**job.payload, "download_result": download.result()}
+            with transaction.atomic():
+                self.job_types[job.kind].finish(job)
+                complete(job)
+        except Exception as error:  # noqa: BLE001 - Any error fails the job
+            self.failed(job, error)
+            return
+
+        self.finished(job)
+
+    def finish_batch(self, jobs: list[ScrapeJob]) -> None:
+        """Finish jobs of the same kind in one transaction, or one at a time if that fails."""
+        job_type = self.job_types[jobs[0].kind]
+        try:
+            with transaction.atomic():
+                job_type.finish_batch(jobs)
+                for job in jobs:
+                    complete(job)
+        except Exception as error:  # noqa: BLE001 - The jobs are finished one at a time instead
+            logger.warning(
+                "Batch of %s %s jobs failed, finishing them one at a time, %r",
+                len(jobs),
+                jobs[0].kind,
+                error,
+            )
+            for job in jobs:
+                self.finish(job, None)
+            return
+
+        for job in jobs:
+            self.finished(job)
+
+    def finished(self, job: ScrapeJob) -> None:
+        """Count a job that is done and bump the data generation after enough changes."""
+        self.done += 1
+        self.done_by_kind[job.kind] += 1
+        self.changes += self.job_types[job.kind].changes_data
+        if self.changes >= CHANGES_PER_GENERATION:
+            bump_generation()
+            self.changes = 0
+
+    def failed(self, job: ScrapeJob, error: BaseException) -> None:
+        """Put a job that failed back in the queue and count it."""
+        if isinstance(error, self.job_types[job.kind].postpone_errors):
+            logger.warning("Job postponed: %s, %r", job.key, error)
+            postpone(job, error)
+        else:
+            logger.warning("Job failed: %s, %r", job.key, error)
+            fail(job, error)
+        self.failed_by_kind[job.kind] += 1
+
+    def throughput(self) -> dict[str, StageThroughput]:
+        """Get how many jobs of each kind were run since the worker started."""
+        seconds = time.monotonic() - self.started
+        return {
+            kind: StageThroughput(self.done_by_kind[kind], self.failed_by_kind[kind], seconds)
+            for kind in self.job_types
+            if self.done_by_kind[kind] or self.failed_by_kind[kind]
+        }
+
+    def report(self) -> None:
+        """Log the throughput of every stage that ran jobs."""
+        for kind, throughput in self.throughput().items():
+            logger.info(
+                "Stage %s: %s done, %s failed, %.1f per minute",
+                kind,
+                throughput.done,
+                throughput.failed,
+                throughput.per_minute,
+            )
+
+    def stop(self) -> None:
+        """Hand back every job that was not finished so the next worker starts them right away."""
+        cancel(self.in_flight)
+        for job in [*self.in_flight.values(), *self.current]:
+            release(job)
+
+
+def run_worker(job_types: dict[str, JobType]) -> int:
+    """Run jobs until the queue has no more jobs that are ready.
+
+    Jobs that are waiting to be retried, and jobs that another worker is running, are left for the next run.
+
+    Args:
+    ----
+        job_types: How to run each kind of job, jobs of other kinds are left in the queue.
+
+    Returns:
+    -------
+        The number of jobs that were done.
+    """
+    return Worker(job_types).run()
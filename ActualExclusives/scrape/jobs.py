@@ -0,0 +1,312 @@
+"""The scrape work that goes through the job queue.
+
+A list page job downloads a page of a game list and enqueues a game job for every game on it and a job for the next
+page. A game job saves the game from the list page and enqueues a game platform job for every platform file that is
+outdated and an import job. Game platform jobs download the platform files and the import job imports the game once
+they are all done.
+
+The next list page downloads while the platform files for the games on the last one are still downloading, as long as
+fewer than MAX_GAMES_WAITING games are waiting to be imported.
+"""
+from __future__ import annotations
+
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any
+
+from games.metrics import serve_metrics, write_metrics
+from games.models import Game, LastScrape, Platform, ScrapeJob
+from json_file import JSONFile
+from paved_path import PavedPath
+
+from scrape.batch_import import IMPORT_BATCH_SIZE, BatchImporter, load_document
+from scrape.content_digest import ImportOutcome, count_outcome, report_outcomes
+from scrape.countries import COUNTRY_RESOLVER, UnknownCountryError
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.download_and_save import submit_download
+from scrape.game import GameManager
+from scrape.job_queue import MAX_DOWNLOADS_IN_FLIGHT, JobType, enqueue, failed_count, new_job, run_worker
+from scrape.recent_manifest import RECENT_MANIFEST
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+GAMES_URL = "https://api.mobygames.com/v1/games?"
+RECENT_GAMES_URL = "https://api.mobygames.com/v1/games/recent?"
+RESULTS_PER_PAGE = 100
+
+# The kinds of game lists
+PLATFORM_LIST = "platform"
+RECENT_LIST = "recent"
+# A recent games list that was already downloaded and is only imported
+RECENT_IMPORT_LIST = "recent_import"
+
+# Number of list pages that can download while the releases of the games on the pages before are downloading
+LIST_PAGES_IN_FLIGHT = 1
+
+# Number of games from list pages that can wait to be imported before the next list page is started
+MAX_GAMES_WAITING = 2 * RESULTS_PER_PAGE
+
+
+def list_page_job(
+    game_list: str,
+    folder: PavedPath,
+    page: int,
+    url: str | None = None,
+    params: dict[str, Any] | None = None,
+) -> ScrapeJob:
+    """Create a job for a page of a game list.
+
+    Args:
+    ----
+        game_list: The kind of game list.
+        folder: The folder the pages are saved in, each page is saved as {page}.json.
+        page: The number of the page, starting from 0.
+        url: The URL of the game list, or None if the page was already downloaded.
+        params: The query parameters of the first page, the offset is added for each page.
+
+    Returns:
+    -------
+        The unsaved job.
+    """
+    params = {**(params or {}), "offset": page * RESULTS_PER_PAGE}
+    payload = {"list": game_list, "folder": str(folder), "page": page, "url": url, "params": params}
+    return new_job(ScrapeJob.Kind.LIST_PAGE, f"list_page:{game_list}:{folder / f'{page}.json'}", payload)
+
+
+def platform_list_job(platform_id: int, folder: PavedPath) -> ScrapeJob:
+    """Create a job for the first page of the games on a platform."""
+    return list_page_job(PLATFORM_LIST, folder, 0, GAMES_URL, {"platform": platform_id})
+
+
+def recent_list_job(folder: PavedPath, age: int) -> ScrapeJob:
+    """Create a job for the first page of the games that changed in the last age days."""
+    return list_page_job(RECENT_LIST, folder, 0, RECENT_GAMES_URL, {"age": age, "format": "normal"})
+
+
+def recent_import_job(file_path: PavedPath) -> ScrapeJob:
+    """Create a job to import a page of recent games that was already downloaded."""
+    return list_page_job(RECENT_IMPORT_LIST, file_path.parent, int(file_path.stem))
+
+
+def list_page_path(job: ScrapeJob) -> JSONFile:
+    """Get the path of the page of a list page job."""
+    return JSONFile(job.payload["folder"], f"{job.payload['page']}.json")
+
+
+def optional_datetime(value: str | None) -> datetime.datetime | None:
+    """Parse a datetime that was saved in a payload."""
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+def start_list_page(job: ScrapeJob) -> Future[bool] | None:
+    """Download a page of a game list if it was not downloaded yet."""
+    path = list_page_path(job)
+    if path.exists() or not job.payload["url"]:
+        return None
+
+    logger.info("Downloading %s games page %s", job.payload["list"], job.payload["page"] + 1)
+    return submit_download(job.payload["url"], path, job.payload["params"])
+
+
+def finish_list_page(job: ScrapeJob) -> None:
+    """Enqueue the games on a page of a game list and the next page."""
+    path = list_page_path(job)
+    payload = job.payload
+    games = DOCUMENT_CACHE.get(path)["games"]
+
+    if payload["list"] != RECENT_LIST:
+        minimum_info_timestamp = path.aware_mtime().isoformat() if payload["list"] == RECENT_IMPORT_LIST else None
+        enqueue(
+            *[
+                new_job(
+                    ScrapeJob.Kind.GAME,
+                    f"game:{path}:{game['game_id']}",
+                    {
+                        "list_path": str(path),
+                        "game_id": game["game_id"],
+                        "minimum_info_timestamp": minimum_info_timestamp,
+                    },
+                    game["game_id"],
+                )
+                for game in games
+            ],
+        )
+
+    if payload["list"] == RECENT_LIST:
+        RECENT_MANIFEST.add_page(
+            path.parent.name,
+            payload["page"],
+            path.aware_mtime(),
+            last=len(games) != RESULTS_PER_PAGE,
+        )
+
+    if len(games) == RESULTS_PER_PAGE:
+        if payload["url"]:
+            folder = PavedPath(payload["folder"])
+            enqueue(list_page_job(payload["list"], folder, payload["page"] + 1, payload["url"], payload["params"]))
+        return
+
+    # This was the last page
+    if payload["list"] == PLATFORM_LIST:
+        Platform.objects.filter(id=payload["params"]["platform"]).update(imported=True)
+    elif payload["list"] == RECENT_LIST:
+        logger.info("Download Complete: List of recent games downloaded")
+        LastScrape.objects.create(datetime=datetime.datetime.now().astimezone(), run=path.parent.name)
+
+
+def finish_game(job: ScrapeJob) -> None:
+    """Save a game from a game list and enqueue the downloads and import for it."""
+    game_id = job.payload["game_id"]
+    list_path = JSONFile(job.payload["list_path"])
+    game = next(game for game in DOCUMENT_CACHE.get(list_path)["games"] if game["game_id"] == game_id)
+    minimum_info_timestamp = optional_datetime(job.payload["minimum_info_timestamp"])
+
+    game_manager = GameManager(game_id)
+    game_changed = game_manager.extract_game_json(game, list_path.aware_mtime())
+
+    jobs = [
+        new_job(
+            ScrapeJob.Kind.GAME_PLATFORM,
+            f"game_platform:{list_path}:{game_id}:{platform['platform_id']}",
+            {
+                "game_id": game_id,
+                "platform_id": platform["platform_id"],
+                "minimum_info_timestamp": job.payload["minimum_info_timestamp"],
+            },
+            game_id,
+        )
+        for platform in game["platforms"]
+        if game_manager.game_platform_json_path(platform["platform_id"]).outdated(minimum_info_timestamp)
+    ]
+    jobs.append(
+        new_job(
+            ScrapeJob.Kind.IMPORT,
+            f"import:{list_path}:{game_id}",
+            {
+                "game_id": game_id,
+                "info_timestamp": job.payload["minimum_info_timestamp"],
+                "game_changed": game_changed,
+            },
+            game_id,
+        ),
+    )
+    enqueue(*jobs)
+
+
+def start_game_platform(job: ScrapeJob) -> Future[bool] | None:
+    """Download the releases of a game on a platform if the file is outdated."""
+    game_manager = GameManager(job.payload["game_id"])
+    platform_id = job.payload["platform_id"]
+    path = game_manager.game_platform_json_path(platform_id)
+    if not path.outdated(optional_datetime(job.payload["minimum_info_timestamp"])):
+        return None
+
+    download_type = "Downloading Updated File" if path.exists() else "Downloading Initial File"
+    logger.info("%s for game %s on platform %s", download_type, job.payload["game_id"], platform_id)
+    return submit_download(game_manager.game_platform_json_url(platform_id), path)
+
+
+def finish_game_platform(job: ScrapeJob) -> None:  # noqa: ARG001 - Same signature as every job
+    """Nothing is left to do once the file is saved."""
+
+
+def files_unchanged(job: ScrapeJob) -> bool:
+    """Check if an import can be skipped because none of the files of the game changed since it was imported.
+
+    The game file from the list page and every release file that was downloaded for it have to be the same as before,
+    the game has to be imported with a digest, and no other import of the game can be waiting to import files that
+    changed earlier.
+    """
+    if job.payload.get("game_changed", True):
+        return False
+
+    # The keys of the release jobs of an import start with the list page and game of the import
+    game_key = job.key.removeprefix(f"{ScrapeJob.Kind.IMPORT}:")
+    releases = ScrapeJob.objects.filter(key__startswith=f"{ScrapeJob.Kind.GAME_PLATFORM}:{game_key}:")
+    if any(payload.get("download_result", False) for payload in releases.values_list("payload", flat=True)):
+        return False
+
+    other_imports = ScrapeJob.objects.filter(game_id=job.game_id, kind=ScrapeJob.Kind.IMPORT).exclude(id=job.id)
+    if other_imports.exclude(status=ScrapeJob.Status.DONE).exists():
+        return False
+
+    return Game.objects.filter(id=job.payload["game_id"]).exclude(content_digest="").exists()
+
+
+def changed_imports(jobs: list[ScrapeJob]) -> list[ScrapeJob]:
+    """Get the imports whose files changed, the others are counted as unchanged without opening their files."""
+    changed = [job for job in jobs if not files_unchanged(job)]
+    if skipped := len(jobs) - len(changed):
+        logger.info("Skipped %s imports of games whose files did not change", skipped)
+        count_outcome(ImportOutcome.UNCHANGED, skipped)
+    return changed
+
+
+def finish_import(job: ScrapeJob) -> None:
+    """Import a game unless none of its files changed."""
+    if changed_imports([job]):
+        GameManager(job.payload["game_id"]).import_game(optional_datetime(job.payload["info_timestamp"]))
+
+
+def finish_imports(jobs: list[ScrapeJob]) -> None:
+    """Import a batch of games, skipping the games whose files did not change."""
+    BatchImporter().import_batch(
+        [
+            load_document(GameManager(job.payload["game_id"]), optional_datetime(job.payload["info_timestamp"]))
+            for job in changed_imports(jobs)
+        ],
+    )
+
+
+JOB_TYPES = {
+    ScrapeJob.Kind.LIST_PAGE: JobType(
+        finish_list_page,
+        start_list_page,
+        max_in_flight=LIST_PAGES_IN_FLIGHT,
+        # Every game on a list page gets one import job
+        max_backlog=MAX_GAMES_WAITING,
+        backlog_kinds=(ScrapeJob.Kind.IMPORT,),
+    ),
+    ScrapeJob.Kind.GAME: JobType(finish_game),
+    ScrapeJob.Kind.GAME_PLATFORM: JobType(
+        finish_game_platform,
+        start_game_platform,
+        # A download is always left for the next list page
+        max_in_flight=MAX_DOWNLOADS_IN_FLIGHT - LIST_PAGES_IN_FLIGHT,
+    ),
+    ScrapeJob.Kind.IMPORT: JobType(
+        finish_import,
+        changes_data=True,
+        finish_batch=finish_imports,
+        batch_size=IMPORT_BATCH_SIZE,
+        # Games with countries that are not in countries.json are imported on a later run once they are added
+        postpone_errors=(UnknownCountryError,),
+    ),
+}
+
+
+def work() -> int:
+    """Run the scrape jobs until the queue is empty, then report imports, unknown countries, and jobs that failed.
+
+    The metrics are served on settings.METRICS_PORT while the jobs run and written to settings.METRICS_FILE afterwards.
+
+    Returns
+    -------
+        The number of jobs that were done.
+    """
+    metrics_server = serve_metrics()
+    try:
+        return run_worker(JOB_TYPES)
+    finally:
+        report_outcomes()
+        COUNTRY_RESOLVER.report()
+        DOCUMENT_CACHE.report()
+        if failed := failed_count():
+            logger.warning("%s jobs failed too many times, they are tried again when they are enqueued again", failed)
+        write_metrics()
+        if metrics_server:
+            metrics_server.shutdown()
+            metrics_server.server_close()
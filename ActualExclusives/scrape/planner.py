@@ -0,0 +1,244 @@
+"""Plan the API calls of a scrape before any of them are sent.
+
+Every call to the API has to wait MINIMUM_REQUEST_INTERVAL seconds, so a scrape of every platform or a long recent games
+backfill takes days. The planner finds every call the scrape would make with what is known before sending a request:
+the jobs in the queue, the list pages of the platforms that are not imported yet, the release files of the games on
+them that are missing or outdated, and the next page of every game list. Each file is only planned once even when a
+game is on several lists, and the calls are ordered by how soon they lead to an imported game. The pages after the
+planned page of a list are only known once it is downloaded, so the plan is a lower bound for every list that is not
+finished.
+
+With --budget only that many of the most valuable calls are made, the files are saved where the scrape looks for
+them, so the next run of the scrape uses them instead of downloading them again.
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import datetime
+import logging
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
+from games.models import Platform, ScrapeJob
+from json_file import JSONFile
+
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.download_and_save import download_and_save
+from scrape.game import GameManager
+from scrape.job_queue import UNFINISHED, enqueue
+from scrape.jobs import (
+    GAMES_URL,
+    PLATFORM_LIST,
+    RESULTS_PER_PAGE,
+    list_page_job,
+    list_page_path,
+    optional_datetime,
+    recent_list_job,
+)
+from scrape.platform_games import GAME_LIST_FOLDER
+from scrape.recent import RECENT_FOLDER, recent_days, unfinished_recent_download
+from scrape.scheduler import MINIMUM_REQUEST_INTERVAL
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from scrape.raw_store import RawFile
+
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+# How valuable each kind of call is, lower is more valuable
+# Release files finish games that are waiting to be imported
+RELEASES_VALUE = 0
+# List pages that continue a list that was already started
+QUEUED_LIST_PAGE_VALUE = 1
+RECENT_LIST_PAGE_VALUE = 2
+# List pages that start or continue the list of a platform that is not imported
+PLATFORM_LIST_PAGE_VALUE = 3
+
+
+class PlannedCall(NamedTuple):
+    """A call to the API that the scrape would make."""
+
+    kind: str
+    url: str
+    params: dict[str, Any] | None
+    path: RawFile
+    # Calls with a lower value are made first
+    value: tuple[int, ...]
+    # The game of a release file
+    game_id: int | None = None
+    # The list page job that carries on from the page once it is saved, None for release files
+    job: ScrapeJob | None = None
+
+
+class ScrapePlan(NamedTuple):
+    """Every call the scrape would make, from the most to the least valuable."""
+
+    calls: list[PlannedCall]
+
+    @property
+    def open_lists(self) -> int:
+        """The number of game lists that can have more pages after the planned ones."""
+        return sum(call.kind == ScrapeJob.Kind.LIST_PAGE for call in self.calls)
+
+    @property
+    def eta(self) -> datetime.timedelta:
+        """How long the planned calls take with the rate limit."""
+        return datetime.timedelta(seconds=len(self.calls) * MINIMUM_REQUEST_INTERVAL)
+
+
+def list_page_call(job: ScrapeJob, value: int) -> PlannedCall:
+    """Plan the call for a list page job."""
+    return PlannedCall(
+        ScrapeJob.Kind.LIST_PAGE,
+        job.payload["url"],
+        job.payload["params"],
+        list_page_path(job),
+        (value, job.payload["page"]),
+        job=job,
+    )
+
+
+def release_call(
+    game_id: int,
+    platform_id: int,
+    minimum_info_timestamp: datetime.datetime | None,
+) -> PlannedCall | None:
+    """Plan the call for a release file, or None if the file was saved after minimum_info_timestamp."""
+    game_manager = GameManager(game_id)
+    path = game_manager.game_platform_json_path(platform_id)
+    if not path.outdated(minimum_info_timestamp):
+        return None
+    return PlannedCall(
+        ScrapeJob.Kind.GAME_PLATFORM,
+        game_manager.game_platform_json_url(platform_id),
+        None,
+        path,
+        (RELEASES_VALUE, game_id, platform_id),
+        game_id,
+    )
+
+
+def release_calls(game: dict[str, Any], minimum_info_timestamp: datetime.datetime | None) -> Iterator[PlannedCall]:
+    """Plan the calls for the release files of a game that are missing or older than minimum_info_timestamp."""
+    for platform in game["platforms"]:
+        if call := release_call(game["game_id"], platform["platform_id"], minimum_info_timestamp):
+            yield call
+
+
+def queued_calls() -> Iterator[PlannedCall]:
+    """Plan the calls for the unfinished jobs in the queue."""
+    for job in ScrapeJob.objects.filter(status__in=UNFINISHED).order_by("id"):
+        minimum_info_timestamp = optional_datetime(job.payload.get("minimum_info_timestamp"))
+        if job.kind == ScrapeJob.Kind.LIST_PAGE:
+            if job.payload["url"] and not list_page_path(job).exists():
+                yield list_page_call(job, QUEUED_LIST_PAGE_VALUE)
+        elif job.kind == ScrapeJob.Kind.GAME:
+            list_path = JSONFile(job.payload["list_path"])
+            game = next(game for game in DOCUMENT_CACHE.get(list_path)["games"] if game["game_id"] == job.game_id)
+            yield from release_calls(game, minimum_info_timestamp)
+        elif job.kind == ScrapeJob.Kind.GAME_PLATFORM and (
+            call := release_call(job.payload["game_id"], job.payload["platform_id"], minimum_info_timestamp)
+        ):
+            yield call
+
+
+def platform_calls(platform: Platform) -> Iterator[PlannedCall]:
+    """Plan the calls for the release files of the games on the downloaded pages of a platform, and its next page."""
+    folder = GAME_LIST_FOLDER / f"{platform.id}"
+    page = 0
+    while (path := folder / f"{page}.json").exists():
+        games = DOCUMENT_CACHE.get(path)["games"]
+        for game in games:
+            # Platform lists only download release files that are missing
+            yield from release_calls(game, None)
+        if len(games) != RESULTS_PER_PAGE:
+            return
+        page += 1
+
+    job = list_page_job(PLATFORM_LIST, folder, page, GAMES_URL, {"platform": platform.id})
+    yield list_page_call(job, PLATFORM_LIST_PAGE_VALUE)
+
+
+def recent_calls() -> Iterator[PlannedCall]:
+    """Plan the first page of the next download of recent games, unless the last download is recent enough."""
+    # An unfinished download is resumed from the queue instead
+    if unfinished_recent_download():
+        return
+
+    if (days := recent_days()) is not None:
+        job = recent_list_job(RECENT_FOLDER / datetime.datetime.now().astimezone(), days)
+        yield list_page_call(job, RECENT_LIST_PAGE_VALUE)
+
+
+def plan() -> ScrapePlan:
+    """Find every call the scrape would make without sending any request.
+
+    Returns
+    -------
+        The calls from the most to the least valuable, each file is only in it once.
+    """
+    calls: dict[str, PlannedCall] = {}
+    sources = [queued_calls(), recent_calls()]
+    sources += [platform_calls(platform) for platform in Platform.objects.filter(imported=False).order_by("id")]
+    for source in sources:
+        for call in source:
+            # A game can be on more than one list, and the queue can already have the same call
+            calls.setdefault(str(call.path), call)
+
+    files = collections.Counter(call.game_id for call in calls.values() if call.game_id is not None)
+    # The games that need the fewest release files are imported the soonest
+    return ScrapePlan(sorted(calls.values(), key=lambda call: (call.value[0], files[call.game_id], *call.value[1:])))
+
+
+def report(scrape_plan: ScrapePlan) -> None:
+    """Log how many calls the plan has and how long they take."""
+    releases = sum(call.kind == ScrapeJob.Kind.GAME_PLATFORM for call in scrape_plan.calls)
+    logger.info(
+        "Planned %s calls taking %s: %s release files and %s list pages, each list page can lead to more calls",
+        len(scrape_plan.calls),
+        scrape_plan.eta,
+        releases,
+        scrape_plan.open_lists,
+    )
+
+
+def execute(scrape_plan: ScrapePlan, budget: int) -> int:
+    """Make the most valuable calls of a plan.
+
+    Args:
+    ----
+        scrape_plan: The calls to make.
+        budget: The most calls to make.
+
+    Returns:
+    -------
+        The number of calls that were made.
+    """
+    calls = scrape_plan.calls[:budget]
+    for count, call in enumerate(calls, 1):
+        logger.info("Call %s of %s: %s", count, len(calls), call.path)
+        download_and_save(call.url, call.path, call.params)
+        if call.job is not None:
+            # The scrape carries on from the saved page instead of downloading it again
+            enqueue(call.job)
+    return len(calls)
+
+
+def main() -> None:
+    """Plan the scrape and make the most valuable calls if there is a budget."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget", type=int, help="Make this many of the most valuable calls, only plan without it")
+    arguments = parser.parse_args()
+
+    scrape_plan = plan()
+    report(scrape_plan)
+    if arguments.budget is not None:
+        execute(scrape_plan, arguments.budget)
+
+
+if __name__ == "__main__":
+    main()
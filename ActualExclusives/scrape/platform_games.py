@@ -8,10 +8,9 @@ from common.constants import BASE_DIR, DOWNLOADED_FILES_DIR
 from games.models import Platform
 from json_file import JSONFile
 
-from scrape.download_and_save import download_and_save
-from scrape.game import GameManager
+from scrape.job_queue import enqueue, requeue_folder
+from scrape.jobs import platform_list_job, work
 
-BASE_GAMES_URL = "https://api.mobygames.com/v1/games?"
 GAME_LIST_FOLDER = JSONFile(DOWNLOADED_FILES_DIR) / "platforms"
 COUNTRY_FILE = JSONFile(BASE_DIR) / "countries" / "countries.json"
 COUNTRIES = COUNTRY_FILE.parsed()
@@ -24,27 +23,19 @@ logging.basicConfig(level=logging.DEBUG)
 
 
 def download_and_import_platform_games(platform: Platform) -> None:
-    """Download the list of games for a platform."""
-    offset = 0
-    while True:
-        # Your code here
-        offset += 1
-        game_list_json_path = platform_games_json_path(platform.id, offset)
+    """Download and import the list of games for a platform."""
+    enqueue_platform(platform)
+    work()
 
-        if not game_list_json_path.exists():
-            logger.info("Downloading Games: %s, page %s", platform, offset + 1)
-            download_and_save(BASE_GAMES_URL, game_list_json_path, {"offset": offset * 100, "platform": platform.id})
 
-        # Download every game listed
-        parsed_json = game_list_json_path.parsed()
-        for game in parsed_json["games"]:
-            game_manager = GameManager(game["game_id"])
-            game_manager.extract_game_json(game, game_list_json_path.aware_mtime())
-            game_manager.download_game_platforms()
-            game_manager.import_game()
+def enqueue_platform(platform: Platform) -> None:
+    """Add the first page of the games for a platform to the job queue, the next pages are added as they download.
 
-        if len(parsed_json["games"]) != RESULTS_PER_PAGE:
-            break
+    Jobs of the platform that failed too many times on an earlier run are tried again.
+    """
+    folder = GAME_LIST_FOLDER / f"{platform.id}"
+    enqueue(platform_list_job(platform.id, folder))
+    requeue_folder(folder)
 
 
 def platform_games_json_path(platform: int, offset: int) -> JSONFile:
@@ -53,12 +44,15 @@ def platform_games_json_path(platform: int, offset: int) -> JSONFile:
 
 
 def main() -> None:
-    """Download and import the list of games for a platform."""
+    """Download and import the list of games for a platform.
+
+    Every platform that is not imported yet is added to the job queue, the job queue marks each platform as imported
+    after its last page, and resumes where it stopped if it is interrupted.
+    """
     for platform in Platform.objects.all().filter(imported=False):
         logger.info("Importing Platform: %s", platform.name)
-        download_and_import_platform_games(platform)
-        platform.imported = True
-        platform.save()
+        enqueue_platform(platform)
+    work()
 
 
 if __name__ == "__main__":
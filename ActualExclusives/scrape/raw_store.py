@@ -0,0 +1,373 @@
+"""Where the downloaded game and release files are kept.
+
+By default every game and every release of a game is saved as its own JSON file in downloaded_files, which adds up to
+millions of small files for the whole catalogue. When settings.RAW_STORE is "packed" they are saved in a single SQLite
+database instead, each one compressed on its own and stored by the path it would have in downloaded_files together with
+the time it was fetched. PackedFile has the same methods as JSONFile, so the scrapers work the same with both stores.
+
+Run this module to copy the files that were already downloaded from one store to the other, with --delete they are
+removed from the store they were copied from.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import TYPE_CHECKING, Any
+
+import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
+from common.constants import DOWNLOADED_FILES_DIR
+from django.conf import settings
+from json_file import JSONFile
+
+from scrape.document_cache import DOCUMENT_CACHE
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from paved_path import PavedPath
+
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+PACKED_STORE_PATH = DOWNLOADED_FILES_DIR.parent / "downloaded_files.sqlite3"
+
+# The folder in downloaded_files that is kept in the raw store, the game lists are few and stay as files
+GAMES_FOLDER = "games"
+
+COMPRESSION_LEVEL = 6
+
+# Number of files that are moved in each transaction of the packed store
+MIGRATE_BATCH_SIZE = 1000
+
+
+class FileStore:
+    """Saves every file on its own in a folder."""
+
+    def __init__(self, root: PavedPath) -> None:
+        """Initialize the store.
+
+        Args:
+        ----
+            root: The folder the files are saved in.
+        """
+        self.root = root
+
+    def file(self, key: str) -> JSONFile:
+        """Get a file by its path relative to the folder."""
+        return JSONFile(self.root / key)
+
+    def keys(self, folder: str) -> list[str]:
+        """Get the keys of the files directly in a folder."""
+        path = self.root / folder
+        if not path.exists():
+            return []
+        return sorted(f"{folder}/{file.name}" for file in path.iterdir() if file.suffix == ".json")
+
+    def all_keys(self) -> list[str]:
+        """Get the keys of every file in the games folder."""
+        path = self.root / GAMES_FOLDER
+        if not path.exists():
+            return []
+        return sorted(file.relative_to(self.root).as_posix() for file in path.rglob("*.json"))
+
+    def remove_empty_folders(self) -> None:
+        """Remove the folders in the games folder that are empty after their files were moved."""
+        path = self.root / GAMES_FOLDER
+        if not path.exists():
+            return
+        # The deepest folders are removed first so their parents can be empty too
+        for folder in [*sorted((folder for folder in path.rglob("*") if folder.is_dir()), reverse=True), path]:
+            if not any(folder.iterdir()):
+                folder.rmdir()
+
+
+class PackedStore:
+    """Saves every file compressed in a single SQLite database."""
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the store, the database is only opened when it is first used.
+
+        Args:
+        ----
+            path: The path of the database.
+        """
+        self.path = path
+        self.connection: sqlite3.Connection | None = None
+        # Parse processes that are forked from a process that already opened the database open it again
+        self.pid: int | None = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open the database and create the table the first time it is used, it must be called with the lock held."""
+        if self.connection is None or self.pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Downloads are saved on a background thread, the lock makes sure only one thread uses it at a time
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.pid = os.getpid()
+            # Parse processes can read while the import writes
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (key TEXT PRIMARY KEY, content BLOB NOT NULL, fetched REAL NOT NULL)",
+            )
+        return self.connection
+
+    def file(self, key: str) -> PackedFile:
+        """Get a file by the path it would have in the folder."""
+        return PackedFile(self, key)
+
+    def fetched(self, key: str) -> float | None:
+        """Get when a file was fetched as a timestamp, or None if it does not exist."""
+        with self.lock:
+            row = self.connect().execute("SELECT fetched FROM files WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def read(self, key: str) -> str:
+        """Get the content of a file."""
+        with self.lock:
+            row = self.connect().execute("SELECT content FROM files WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(2, "No such file in the packed store", key)
+        return zlib.decompress(row[0]).decode("utf-8")
+
+    def write(self, key: str, content: str, fetched: float | None = None) -> None:
+        """Save a file, fetched defaults to now."""
+        compressed = zlib.compress(content.encode("utf-8"), COMPRESSION_LEVEL)
+        fetched = time.time() if fetched is None else fetched
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO files (key, content, fetched) VALUES (?, ?, ?)",
+                    (key, compressed, fetched),
+                )
+
+    def write_many(self, files: Iterable[tuple[str, str, float]]) -> None:
+        """Save files in one transaction.
+
+        Args:
+        ----
+            files: The key, content, and fetched timestamp of every file.
+        """
+        rows = [
+            (key, zlib.compress(content.encode("utf-8"), COMPRESSION_LEVEL), fetched) for key, content, fetched in files
+        ]
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO files (key, content, fetched) VALUES (?, ?, ?)", rows)
+
+    def touch(self, key: str, fetched: float | None = None) -> None:
+        """Change when a file was fetched, fetched defaults to now."""
+        fetched = time.time() if fetched is None else fetched
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute("UPDATE files SET fetched = ? WHERE key = ?", (fetched, key))
+
+    def delete(self, key: str) -> None:
+        """Delete a file."""
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute("DELETE FROM files WHERE key = ?", (key,))
+
+    def delete_many(self, keys: list[str]) -> None:
+        """Delete files in one transaction."""
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.executemany("DELETE FROM files WHERE key = ?", [(key,) for key in keys])
+
+    def keys(self, folder: str) -> list[str]:
+        """Get the keys of the files directly in a folder."""
+        with self.lock:
+            rows = self.connect().execute(
+                # GLOB with a fixed prefix uses the primary key index
+                "SELECT key FROM files WHERE key GLOB ? AND key NOT GLOB ? ORDER BY key",
+                (f"{folder}/*", f"{folder}/*/*"),
+            )
+            return [row[0] for row in rows]
+
+    def all_keys(self) -> list[str]:
+        """Get the keys of every file."""
+        with self.lock:
+            return [row[0] for row in self.connect().execute("SELECT key FROM files ORDER BY key")]
+
+    def close(self) -> None:
+        """Close the database."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+class PackedFile:
+    """A file in a PackedStore with the methods of JSONFile that the scrapers use."""
+
+    def __init__(self, store: PackedStore, key: str) -> None:
+        """Initialize the file.
+
+        Args:
+        ----
+            store: The store the file is in.
+            key: The path the file would have in the downloaded files folder.
+        """
+        self.store = store
+        self.key = key
+
+    def __str__(self) -> str:
+        """Get the key of the file."""
+        return self.key
+
+    def __repr__(self) -> str:
+        """Get the store and key of the file."""
+        return f"PackedFile({self.store.path}, {self.key})"
+
+    def exists(self) -> bool:
+        """Check if the file was saved."""
+        return self.store.fetched(self.key) is not None
+
+    def read_text(self, encoding: str = "utf-8") -> str:  # noqa: ARG002 - Same signature as Path.read_text
+        """Get the content of the file."""
+        return self.store.read(self.key)
+
+    def parsed(self) -> Any:  # noqa: ANN401 - Any JSON
+        """Parse the file."""
+        return json.loads(self.read_text())
+
+    def parsed_cached(self) -> Any:  # noqa: ANN401 - Any JSON
+        """Parse the file the first time and then get the same object while it is in the document cache."""
+        return DOCUMENT_CACHE.get(self)
+
+    def write(self, content: str) -> None:
+        """Save the file."""
+        DOCUMENT_CACHE.discard(self)
+        self.store.write(self.key, content)
+
+    def unlink(self) -> None:
+        """Delete the file."""
+        DOCUMENT_CACHE.discard(self)
+        self.store.delete(self.key)
+
+    def aware_mtime(self) -> datetime.datetime:
+        """Get when the file was fetched."""
+        fetched = self.store.fetched(self.key)
+        if fetched is None:
+            raise FileNotFoundError(2, "No such file in the packed store", self.key)
+        return datetime.datetime.fromtimestamp(fetched).astimezone()
+
+    def outdated(self, minimum_timestamp: datetime.datetime | None = None) -> bool:
+        """Check if the file does not exist or was fetched before minimum_timestamp."""
+        fetched = self.store.fetched(self.key)
+        if fetched is None:
+            return True
+        return minimum_timestamp is not None and fetched < minimum_timestamp.timestamp()
+
+    def up_to_date(self, minimum_timestamp: datetime.datetime | None = None) -> bool:
+        """Check if the file exists and was fetched after minimum_timestamp."""
+        return not self.outdated(minimum_timestamp)
+
+
+RawFile = JSONFile | PackedFile
+
+RAW_STORES: dict[str, FileStore | PackedStore] = {
+    "files": FileStore(DOWNLOADED_FILES_DIR),
+    "packed": PackedStore(PACKED_STORE_PATH),
+}
+
+
+def raw_store() -> FileStore | PackedStore:
+    """Get the store in settings.RAW_STORE."""
+    return RAW_STORES[settings.RAW_STORE]
+
+
+def raw_file(key: str) -> RawFile:
+    """Get a file in the store in settings.RAW_STORE by the path it has in the downloaded files folder."""
+    return raw_store().file(key)
+
+
+def set_mtime(file: RawFile, timestamp: datetime.datetime | None = None) -> None:
+    """Change when a file was fetched, timestamp defaults to now."""
+    if isinstance(file, PackedFile):
+        file.store.touch(file.key, None if timestamp is None else timestamp.timestamp())
+    elif timestamp is None:
+        os.utime(file)
+    else:
+        os.utime(file, (file.lstat().st_atime, timestamp.timestamp()))
+
+
+def migrate(source: FileStore | PackedStore, destination: FileStore | PackedStore, *, delete: bool = False) -> int:
+    """Copy every file from one store to another, keeping when each file was fetched.
+
+    The files are copied in batches of MIGRATE_BATCH_SIZE, a packed store saves each batch in one transaction, and the
+    files of a batch are only deleted from the source once the whole batch is saved.
+
+    Args:
+    ----
+        source: The store to copy from.
+        destination: The store to copy to.
+        delete: Delete each file from the source after it is copied.
+
+    Returns:
+    -------
+        The number of files that were copied.
+    """
+    keys = source.all_keys()
+    logger.info("%s %s files", "Moving" if delete else "Copying", len(keys))
+    for start in range(0, len(keys), MIGRATE_BATCH_SIZE):
+        batch = keys[start : start + MIGRATE_BATCH_SIZE]
+        files = [(key, source.file(key)) for key in batch]
+        contents = [(key, file.read_text(encoding="utf-8"), file.aware_mtime()) for key, file in files]
+        if isinstance(destination, PackedStore):
+            destination.write_many((key, content, fetched.timestamp()) for key, content, fetched in contents)
+            for key in batch:
+                DOCUMENT_CACHE.discard(destination.file(key))
+        else:
+            for key, content, fetched in contents:
+                destination_file = destination.file(key)
+                destination_file.write(content)
+                set_mtime(destination_file, fetched)
+
+        if delete:
+            if isinstance(source, PackedStore):
+                source.delete_many(batch)
+                for key in batch:
+                    DOCUMENT_CACHE.discard(source.file(key))
+            else:
+                for _, file in files:
+                    file.unlink()
+        logger.info("Copied %s of %s files", start + len(batch), len(keys))
+
+    if delete and isinstance(source, FileStore):
+        source.remove_empty_folders()
+
+    logger.info("%s Complete: %s files", "Move" if delete else "Copy", len(keys))
+    return len(keys)
+
+
+def main() -> None:
+    """Copy the downloaded files from one store to the other."""
+    parser = argparse.ArgumentParser(description="Copy the downloaded game and release files to another store.")
+    parser.add_argument("destination", choices=sorted(RAW_STORES), help="The store to copy the files to")
+    parser.add_argument(
+        "--delete",
+        action="store_true",
+        help="Delete the files from the store they are copied from once they are saved in the other store",
+    )
+    arguments = parser.parse_args()
+
+    (source,) = (store for name, store in RAW_STORES.items() if name != arguments.destination)
+    migrate(source, RAW_STORES[arguments.destination], delete=arguments.delete)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,119 +1,161 @@
 """Download the list of recent games from MobyGames and import it."""
 from __future__ import annotations
 
+import argparse
 import logging
+import os
 from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 
 import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
-from common.constants import DOWNLOADED_FILES_DIR
-from games.models import LastScrape
-from json_file import JSONFile
-from paved_path import PavedPath
+from games.models import LastScrape, RecentImportPage, ScrapeJob
 
-from scrape.download_and_save import download_and_save
-from scrape.game import GameManager
+from scrape.job_queue import UNFINISHED, enqueue, requeue_folder
+from scrape.jobs import RECENT_LIST, recent_import_job, recent_list_job, work
+from scrape.recent_manifest import RECENT_FOLDER, RECENT_MANIFEST
 
-BASE_URL = "https://api.mobygames.com/v1/games/recent?"
-RECENT_FOLDER = PavedPath(DOWNLOADED_FILES_DIR) / "recent"
-COMPLETED_RECENT_FOLDER = PavedPath(DOWNLOADED_FILES_DIR) / "completed_recent"
-
-RESULTS_PER_PAGE = 100
+if TYPE_CHECKING:
+    from scrape.recent_manifest import RecentRun
 
 logging.getLogger().setLevel(logging.INFO)
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 
-def download(date_folder: PavedPath, age: int) -> None:
-    """Download the list of recent games from MobyGames."""
-    for offset in range(999):
-        json_path = JSONFile(date_folder / f"{offset}.json")
-
-        # If the file does not exist download it
-        if not json_path.exists():
-            logger.info("Downloading Recent Games Page %s", (offset + 1))
-            download_and_save(BASE_URL, json_path, {"offset": offset * 100, "age": age, "format": "normal"})
-
-        parsed_json = json_path.parsed()
-
-        # Check if this is the last page so downloads can stop
-        if len(parsed_json["games"]) != RESULTS_PER_PAGE:
-            logger.info("Download Complete: List of recent games downloaded")
-            break
+def import_last_scrape_date() -> None:
+    """Get the date from the last complete download in the manifest."""
+    if run := RECENT_MANIFEST.newest_complete():
+        LastScrape.objects.create(datetime=run.completed, run=run.name)
 
 
-def import_last_scrape_date(*folders: PavedPath) -> None:
-    """Get the date from the last scrape."""
-    for folder in folders:
-        if last_good_scrape := newest_scrape_from_folder(folder):
-            LastScrape.objects.create(datetime=last_good_scrape)
-            break
+def recent_days() -> int | None:
+    """Get how many days of recent games the next download needs, or None if the last download was within a day."""
+    last_scrape = LastScrape.objects.order_by("-datetime").values_list("datetime", flat=True).first()
+    if last_scrape is None and (run := RECENT_MANIFEST.newest_complete()):
+        last_scrape = run.completed
 
+    # If there really was no last scrape download the last 21 days
+    if last_scrape is None:
+        return 21
 
-def newest_scrape_from_folder(recent_dir: PavedPath, folder_index: int = 0) -> datetime | None:
-    """Get the date from the specified folder."""
-    if folders := [f for f in recent_dir.iterdir() if f.is_dir()]:
-        newest_folders = sorted(folders, key=lambda f: f.aware_mtime(), reverse=True)
-
-        # Check if the folder for the current index exists
-        if folder_index < len(newest_folders):
-            newest_folder = newest_folders[folder_index]
-
-            if files := list(newest_folder.iterdir()):
-                newest_file = max(files, key=lambda f: f.aware_mtime())
-                parsed_file = JSONFile(newest_file).parsed()
-                # Check if this is the last page or if there are more pages that did not download
-                if len(parsed_file["games"]) != RESULTS_PER_PAGE:
-                    return newest_file.aware_mtime()
+    if last_scrape > (datetime.now().astimezone() - timedelta(days=1)).astimezone():
+        return None
 
-                # If there are more pages that did not download check the next folder
-                return newest_scrape_from_folder(recent_dir, folder_index + 1)
-    return None
+    # I don't know exactly how days are calculated and when this will be run, but a 2 day buffer should be enough for
+    # every possible situation
+    return (datetime.now().astimezone() - last_scrape).days + 2
 
 
 def download_recent() -> None:
     """Download the list of recent games from MobyGames and import it."""
     current_datetime = RECENT_FOLDER / datetime.now().astimezone()
 
-    # If last scrape does not exist try to recreate it from existing files
-    if not LastScrape.objects.exists():
-        import_last_scrape_date(RECENT_FOLDER, COMPLETED_RECENT_FOLDER)
+    # Finish a download that was interrupted before starting a new one
+    if unfinished_recent_download():
+        logger.info("Resuming the last download of recent games")
+        work()
+        return
 
-    # If there really was no last scrape download the last 21 days
+    # If last scrape does not exist try to recreate it from existing files
     if not LastScrape.objects.exists():
-        days = 21
-    else:
-        last_scrape = LastScrape.objects.latest("datetime")
-        if last_scrape.datetime > (datetime.now().astimezone() - timedelta(days=1)).astimezone():
-            logger.warning("Updating skipped: Last download was withing 24 hours")
-            return
+        import_last_scrape_date()
 
-        # I don't know exactly how days are calculated and when this will be run, but a 2 day buffer should be enough
-        # for every possible situation
-        days = (datetime.now().astimezone() - last_scrape.datetime).days + 2
+    days = recent_days()
+    if days is None:
+        logger.warning("Updating skipped: Last download was withing 24 hours")
+        return
 
     logger.info("Downloading last %s days of recent games", days)
-    download(current_datetime, days)
-
-    LastScrape.objects.create(datetime=datetime.now().astimezone())
-
-
-def import_recent() -> None:
-    """Import the downloaded recent games."""
-    for date_folder in RECENT_FOLDER.iterdir():
-        # Make sure file is at least 48 hours old to make sure I don't end up doing double downloads because of the 2
-        # day buffer
-        if date_folder.aware_mtime() < (datetime.now().astimezone() - timedelta(days=2)).astimezone():
-            for file_path in date_folder.iterdir():
-                json_file = JSONFile(file_path)
-                parsed_json = json_file.parsed()
-                for game in parsed_json["games"]:
-                    game_manager = GameManager(game["game_id"])
-                    game_manager.extract_game_json(game, json_file.aware_mtime())
-                    game_manager.download_game_platforms(json_file.aware_mtime())
-                    game_manager.import_game(json_file.aware_mtime())
+    # The job for the last page adds the LastScrape
+    enqueue(recent_list_job(current_datetime, days))
+    work()
+
+
+def import_recent(*, reimport: bool = False) -> None:
+    """Import the pages of complete downloads of recent games that were not imported yet.
+
+    Args:
+    ----
+        reimport: Import every page of every complete download again, including the pages that were already imported.
+    """
+    # Make sure the download is at least 48 hours old to make sure I don't end up doing double downloads because of the
+    # 2 day buffer
+    runs = RECENT_MANIFEST.importable(datetime.now().astimezone() - timedelta(days=2), include_imported=reimport)
+    if reimport:
+        forget_imported_pages(runs)
+
+    # Pages that were imported are skipped without opening them
+    imported_pages = set(RecentImportPage.objects.filter(run__in=[run.name for run in runs]).values_list("run", "page"))
+    pages = {run: [page for page in range(run.pages) if (run.name, page) not in imported_pages] for run in runs}
+    for run, run_pages in pages.items():
+        folder = RECENT_MANIFEST.run_folder(run)
+        enqueue(*[recent_import_job(folder / f"{page}.json") for page in run_pages])
+        # The games of a page that failed on an earlier run are not enqueued again by the page
+        requeue_folder(folder)
+
+    work()
+
+    for run, run_pages in pages.items():
+        record_imported_pages(run, run_pages)
+
+
+def forget_imported_pages(runs: list[RecentRun]) -> None:
+    """Forget that the pages of downloads were imported, so they and the games on them are imported again."""
+    RecentImportPage.objects.filter(run__in=[run.name for run in runs]).delete()
+    for run in runs:
+        # The jobs that downloaded the pages are kept, the job queue ignores new jobs with the key of a finished job
+        ScrapeJob.objects.filter(
+            key__contains=f"{RECENT_MANIFEST.run_folder(run)}{os.sep}",
+            status__in=[ScrapeJob.Status.DONE, ScrapeJob.Status.FAILED],
+        ).exclude(key__startswith=f"{ScrapeJob.Kind.LIST_PAGE}:{RECENT_LIST}:").delete()
+
+
+def record_imported_pages(run: RecentRun, pages: list[int]) -> None:
+    """Record the pages whose jobs all finished, and move the download to the completed folder once every page is."""
+    folder = RECENT_MANIFEST.run_folder(run)
+    # The key of every job for a page or a game on it has the path of the page
+    unfinished = list(
+        ScrapeJob.objects.filter(key__contains=f"{folder}{os.sep}")
+        .exclude(status=ScrapeJob.Status.DONE)
+        .values_list("key", flat=True),
+    )
+    last_scrape = LastScrape.objects.filter(run=run.name).first()
+    now = datetime.now().astimezone()
+    RecentImportPage.objects.bulk_create(
+        [
+            RecentImportPage(last_scrape=last_scrape, run=run.name, page=page, imported=now)
+            for page in pages
+            if not any(str(folder / f"{page}.json") in key for key in unfinished)
+        ],
+        ignore_conflicts=True,
+    )
+
+    if RecentImportPage.objects.filter(run=run.name).count() < run.pages:
+        logger.warning(
+            "Import Incomplete: The failed jobs of recent games downloaded at %s are tried again next time",
+            run.name,
+        )
+    elif not run.imported:
+        RECENT_MANIFEST.mark_imported(run.name)
+
+
+def unfinished_recent_download() -> bool:
+    """Check if the job queue still has pages of recent games to download."""
+    return ScrapeJob.objects.filter(
+        kind=ScrapeJob.Kind.LIST_PAGE,
+        payload__list=RECENT_LIST,
+        status__in=UNFINISHED,
+    ).exists()
+
+
+def main() -> None:
+    """Download the list of recent games and import it."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reimport", action="store_true", help="Import the pages that were already imported again")
+    arguments = parser.parse_args()
+    download_recent()
+    import_recent(reimport=arguments.reimport)
 
 
 if __name__ == "__main__":
-    download_recent()
-    import_recent()
+    main()
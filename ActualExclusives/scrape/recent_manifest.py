@@ -0,0 +1,158 @@
+"""Manifest of every download of the recent games list.
+
+Finding the last complete download used to sort every folder in recent by modification time and parse the newest page
+of each folder until one was complete, and importing walked every folder and page on every run, even the ones that
+were imported long ago. The manifest records the pages of each download, when it was complete, and whether it was
+imported, so both only have to read one small file.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+from typing import NamedTuple
+
+from common.constants import DOWNLOADED_FILES_DIR
+from json_file import JSONFile
+from paved_path import PavedPath
+
+RECENT_FOLDER = PavedPath(DOWNLOADED_FILES_DIR) / "recent"
+COMPLETED_RECENT_FOLDER = PavedPath(DOWNLOADED_FILES_DIR) / "completed_recent"
+RECENT_MANIFEST_PATH = JSONFile(DOWNLOADED_FILES_DIR) / "recent_manifest.json"
+
+RESULTS_PER_PAGE = 100
+
+
+class RecentRun(NamedTuple):
+    """A download of the recent games list, it is saved in a folder named after when it started."""
+
+    name: str
+    # Number of pages that were downloaded, they are saved as 0.json, 1.json, and so on
+    pages: int = 0
+    # When the last page was downloaded, None until the last page is downloaded
+    completed: datetime.datetime | None = None
+    imported: bool = False
+
+    @property
+    def complete(self) -> bool:
+        """Check if every page was downloaded."""
+        return self.completed is not None
+
+
+class RecentManifest:
+    """The manifest file, it is only read the first time it is used."""
+
+    def __init__(self, path: JSONFile, folder: PavedPath, completed_folder: PavedPath) -> None:
+        """Initialize the manifest.
+
+        Args:
+        ----
+            path: The path of the manifest file.
+            folder: The folder with the downloads that were not imported yet.
+            completed_folder: The folder the downloads are moved to once they are imported.
+        """
+        self.path = path
+        self.folder = folder
+        self.completed_folder = completed_folder
+        self.runs: dict[str, RecentRun] | None = None
+
+    def load(self) -> dict[str, RecentRun]:
+        """Get every download by name, the manifest is built from the folders if it does not exist yet."""
+        if self.runs is None:
+            if self.path.exists():
+                self.runs = {
+                    name: RecentRun(name, run["pages"], optional_datetime(run["completed"]), run["imported"])
+                    for name, run in self.path.parsed()["runs"].items()
+                }
+            else:
+                self.runs = {}
+                self.add_folders(self.folder, imported=False)
+                self.add_folders(self.completed_folder, imported=True)
+                self.save()
+        return self.runs
+
+    def save(self) -> None:
+        """Save the manifest, it is replaced in one step so an interrupted save never leaves half a file."""
+        runs = {
+            name: {
+                "pages": run.pages,
+                "completed": run.completed.isoformat() if run.completed else None,
+                "imported": run.imported,
+            }
+            for name, run in (self.runs or {}).items()
+        }
+        temporary_path = self.path.with_name(f"{self.path.name}.tmp")
+        temporary_path.write(json.dumps({"runs": runs}, indent=2))
+        temporary_path.replace(self.path)
+
+    def add_folders(self, folder: PavedPath, *, imported: bool) -> None:
+        """Add the downloads that were saved before there was a manifest."""
+        if not folder.exists():
+            return
+
+        assert self.runs is not None  # noqa: S101 - Only called while loading
+        # Only the last page of each download is parsed, and only once
+        for run_folder in (run_folder for run_folder in folder.iterdir() if run_folder.is_dir()):
+            pages = sorted(int(page.stem) for page in run_folder.iterdir() if page.stem.isdigit())
+            run = RecentRun(run_folder.name, len(pages), imported=imported)
+            if pages:
+                last_page = JSONFile(run_folder / f"{pages[-1]}.json")
+                if len(last_page.parsed()["games"]) != RESULTS_PER_PAGE:
+                    run = run._replace(completed=last_page.aware_mtime())
+            self.runs[run.name] = run
+
+    def add_page(self, name: str, page: int, downloaded: datetime.datetime, *, last: bool) -> None:
+        """Record a page that was downloaded, the download is complete once the last page is downloaded."""
+        runs = self.load()
+        run = runs.get(name, RecentRun(name))
+        run = run._replace(pages=max(run.pages, page + 1))
+        if last:
+            run = run._replace(completed=downloaded)
+        runs[name] = run
+        self.save()
+
+    def mark_imported(self, name: str) -> None:
+        """Record that a download was imported and move it to the completed folder."""
+        runs = self.load()
+        folder = self.folder / name
+        if folder.exists():
+            self.completed_folder.mkdir(parents=True, exist_ok=True)
+            folder.rename(self.completed_folder / name)
+        runs[name] = runs[name]._replace(imported=True)
+        self.save()
+
+    def newest_complete(self) -> RecentRun | None:
+        """Get the newest complete download, or None if no download is complete."""
+        return max((run for run in self.load().values() if run.completed), key=lambda run: run.completed, default=None)
+
+    def importable(self, completed_before: datetime.datetime, *, include_imported: bool = False) -> list[RecentRun]:
+        """Get the downloads that are complete but not imported yet, and that finished before completed_before.
+
+        Args:
+        ----
+            completed_before: Downloads that finished after this are not imported yet.
+            include_imported: Include the downloads that were already imported.
+
+        Returns:
+        -------
+            The downloads from the oldest to the newest.
+        """
+        return sorted(
+            (
+                run
+                for run in self.load().values()
+                if run.completed and run.completed < completed_before and (include_imported or not run.imported)
+            ),
+            key=lambda run: run.completed,
+        )
+
+    def run_folder(self, run: RecentRun) -> PavedPath:
+        """Get the folder the pages of a download are in."""
+        return (self.completed_folder if run.imported else self.folder) / run.name
+
+
+def optional_datetime(value: str | None) -> datetime.datetime | None:
+    """Parse a datetime that was saved in the manifest."""
+    return datetime.datetime.fromisoformat(value) if value else None
+
+
+RECENT_MANIFEST = RecentManifest(RECENT_MANIFEST_PATH, RECENT_FOLDER, COMPLETED_RECENT_FOLDER)
@@ -0,0 +1,206 @@
+"""Import every game that was already downloaded again, without using the network.
+
+Reading and parsing the JSON files of every game takes much longer than writing the rows, so the files are parsed by a
+pool of processes and only the parts that are imported are sent back. The main process is the only one that writes to
+the database, it imports the games in batches with BatchImporter as the parsed games come in.
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import datetime
+import itertools
+import logging
+import os
+from typing import TYPE_CHECKING, NamedTuple
+
+import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
+from django.db import transaction
+from games.generation import bump_generation
+from games.metrics import write_metrics
+
+from scrape.batch_import import IMPORT_BATCH_SIZE, BatchImporter, GameDocument, load_document
+from scrape.content_digest import report_outcomes
+from scrape.countries import COUNTRY_RESOLVER, UnknownCountryError
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.game import GameManager
+from scrape.raw_store import GAMES_FOLDER, raw_store
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+logging.getLogger().setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.DEBUG)
+
+# Number of games each parse process gets at a time
+PARSE_CHUNK_SIZE = 64
+
+
+class ReimportResult(NamedTuple):
+    """What happened to the games that were found."""
+
+    imported: int
+    # Games that were up to date or had the same digest
+    skipped: int
+    # Games with files that are missing or with countries that are not in countries.json
+    failed: int
+
+
+def downloaded_game_ids() -> list[int]:
+    """Get the id of every game that has a downloaded game file."""
+    stems = (key.removeprefix(f"{GAMES_FOLDER}/").removesuffix(".json") for key in raw_store().keys(GAMES_FOLDER))
+    return sorted(int(stem) for stem in stems if stem.isdigit())
+
+
+def compact_document(document: GameDocument) -> GameDocument:
+    """Only keep the parts of a game that are imported, so less has to be sent between processes."""
+    game = document.game
+    sample_cover = game["sample_cover"]
+    return document._replace(
+        game={
+            "game_id": game["game_id"],
+            "title": game["title"],
+            "sample_cover": None if sample_cover is None else {"thumbnail_image": sample_cover["thumbnail_image"]},
+            "description": game["description"],
+            "genres": [{"genre_id": genre["genre_id"], "genre_name": genre["genre_name"]} for genre in game["genres"]],
+            "platforms": [
+                {"platform_id": platform["platform_id"], "platform_name": platform["platform_name"]}
+                for platform in game["platforms"]
+            ],
+        },
+        platforms={
+            platform_id: {"releases": [{"countries": release["countries"]} for release in platform["releases"]]}
+            for platform_id, platform in document.platforms.items()
+        },
+    )
+
+
+def parse_game(game_id: int, info_modified_timestamp: datetime.datetime | None = None) -> GameDocument | None:
+    """Parse the files of a game, this runs in the parse processes.
+
+    Args:
+    ----
+        game_id: The game to parse.
+        info_modified_timestamp: Games that were imported before this are imported again.
+
+    Returns:
+    -------
+        The parts of the game that are imported, or None if a file is missing.
+    """
+    try:
+        document = load_document(GameManager(game_id), info_modified_timestamp=info_modified_timestamp)
+    except FileNotFoundError as error:
+        logger.warning("Missing file for game %s: %s", game_id, error.filename)
+        return None
+    return compact_document(document)
+
+
+def parse_games(
+    game_ids: list[int],
+    workers: int,
+    info_modified_timestamp: datetime.datetime | None = None,
+) -> Iterator[GameDocument | None]:
+    """Parse games in a pool of processes, the games are yielded in the same order as game_ids.
+
+    Args:
+    ----
+        game_ids: The games to parse.
+        workers: The number of parse processes, 0 parses every game in this process.
+        info_modified_timestamp: Games that were imported before this are imported again.
+
+    Yields:
+    ------
+        The parsed game, or None if a file is missing.
+    """
+    timestamps = itertools.repeat(info_modified_timestamp)
+    if workers == 0:
+        yield from map(parse_game, game_ids, timestamps)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        yield from executor.map(parse_game, game_ids, timestamps, chunksize=PARSE_CHUNK_SIZE)
+
+
+def import_documents(documents: Iterable[GameDocument | None], importer: BatchImporter) -> tuple[int, int]:
+    """Import the parsed games in batches, a batch with unknown countries is imported one game at a time instead.
+
+    Args:
+    ----
+        documents: The parsed games, None for games that could not be parsed.
+        importer: Imports each batch.
+
+    Returns:
+    -------
+        The number of games that were imported and the number of games that failed.
+    """
+    imported = failed = 0
+    documents = iter(documents)
+    while parsed := list(itertools.islice(documents, importer.batch_size)):
+        batch = [document for document in parsed if document is not None]
+        failed += len(parsed) - len(batch)
+        try:
+            with transaction.atomic():
+                imported += len(importer.import_batch(batch))
+        except UnknownCountryError:
+            for document in batch:
+                try:
+                    with transaction.atomic():
+                        imported += len(importer.import_batch([document]))
+                except UnknownCountryError:  # noqa: PERF203 - Only when a batch has unknown countries
+                    failed += 1
+    return imported, failed
+
+
+def reimport(
+    workers: int | None = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    *,
+    force: bool = False,
+) -> ReimportResult:
+    """Import every game that was downloaded.
+
+    Args:
+    ----
+        workers: The number of parse processes, None uses one for each CPU and 0 parses in this process.
+        batch_size: The number of games to import in each transaction.
+        force: Import the genres, platforms, and countries of games that are up to date or unchanged again.
+
+    Returns:
+    -------
+        What happened to the games.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    game_ids = downloaded_game_ids()
+    info_modified_timestamp = datetime.datetime.now().astimezone() if force else None
+    logger.info("Reimporting %s games with %s parse processes", len(game_ids), workers)
+
+    try:
+        imported, failed = import_documents(
+            parse_games(game_ids, workers, info_modified_timestamp),
+            BatchImporter(batch_size, skip_unchanged=not force),
+        )
+    finally:
+        bump_generation()
+        report_outcomes()
+        COUNTRY_RESOLVER.report()
+        DOCUMENT_CACHE.report()
+        write_metrics()
+
+    result = ReimportResult(imported, len(game_ids) - imported - failed, failed)
+    logger.info("Reimport Complete: %s imported, %s up to date, %s failed", *result)
+    return result
+
+
+def main() -> None:
+    """Import every game that was downloaded."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, help="Number of parse processes, defaults to the number of CPUs")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Games imported per transaction")
+    parser.add_argument("--force", action="store_true", help="Import games that are up to date or unchanged again")
+    arguments = parser.parse_args()
+    reimport(arguments.workers, arguments.batch_size, force=arguments.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Schedule downloads on a background thread while keeping to the API rate limit.
+
+Every request to the API goes through a single token bucket that limits how often requests can start. The requests run
+on a background thread, so the scrapers can parse and import the previous response while the next request waits for
+its turn, instead of sleeping after every request.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from games.metrics import SCRAPE_RATE_LIMIT_WAIT_SECONDS
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+T = TypeVar("T")
+
+# The API allows one request every 10 seconds
+MINIMUM_REQUEST_INTERVAL = 10
+
+
+class RateLimiter:
+    """Token bucket that limits how often requests can start."""
+
+    def __init__(
+        self,
+        interval: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the rate limiter.
+
+        Args:
+        ----
+            interval: The number of seconds it takes to earn a token, with a burst of 1 this is the minimum number of
+                seconds between the start of two requests.
+            burst: The maximum number of tokens that can be saved up.
+            clock: Gets the current time in seconds.
+            sleep: Waits for a number of seconds.
+        """
+        self.interval = interval
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.tokens = float(burst)
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def refill(self) -> None:
+        """Add the tokens that were earned since the last update."""
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+        self.updated = now
+
+    def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        # The lock is held while waiting so requests start in the order they asked for a token
+        with self.lock:
+            self.refill()
+            wait = 0.0
+            if self.tokens < 1:
+                wait = (1 - self.tokens) * self.interval
+                self.sleep(wait)
+                self.refill()
+            SCRAPE_RATE_LIMIT_WAIT_SECONDS.observe(wait)
+            self.tokens = max(self.tokens - 1, 0)
+
+
+class DownloadScheduler:
+    """Runs downloads one at a time on a background thread, in the order they were submitted."""
+
+    def __init__(self, limiter: RateLimiter) -> None:
+        """Initialize the scheduler, the background thread is started when the first download is submitted."""
+        self.limiter = limiter
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download")
+
+    def submit(self, function: Callable[..., T], *args: Any) -> Future[T]:  # noqa: ANN401 - Any download
+        """Run a download once the rate limiter allows it.
+
+        Args:
+        ----
+            function: Downloads and saves a single response.
+            args: Passed to the function.
+
+        Returns:
+        -------
+            A future that is done once the response is saved, result() returns the result of the function or raises
+            any error from the download.
+        """
+        return self.executor.submit(self.run, function, *args)
+
+    def run(self, function: Callable[..., T], *args: Any) -> T:  # noqa: ANN401 - Any download
+        """Wait for the rate limiter and then run the download."""
+        self.limiter.acquire()
+        return function(*args)
+
+
+def wait_for(downloads: Iterable[Future[T]]) -> list[T]:
+    """Wait for downloads to be saved and get their results, raising the first error."""
+    return [download.result() for download in downloads]
+
+
+def cancel(downloads: Iterable[Future[Any]]) -> None:
+    """Cancel downloads that have not started yet."""
+    for download in downloads:
+        download.cancel()
+
+
+DOWNLOAD_SCHEDULER = DownloadScheduler(RateLimiter(MINIMUM_REQUEST_INTERVAL))
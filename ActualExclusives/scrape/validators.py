@@ -0,0 +1,117 @@
+"""Remember the validators of every downloaded file so refreshes can be conditional requests.
+
+The ETag and Last-Modified headers of each response and a hash of its content are kept in a small SQLite database next
+to the downloaded files. When a file is downloaded again the validators are sent as If-None-Match and
+If-Modified-Since, and if the API responds with 304 Not Modified, or with the same content, the file is only marked as
+fresh instead of being written again.
+"""
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING, NamedTuple
+
+from common.constants import DOWNLOADED_FILES_DIR
+
+from scrape.raw_store import PackedFile
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from scrape.raw_store import RawFile
+
+VALIDATORS_PATH = DOWNLOADED_FILES_DIR.parent / "downloaded_files_validators.sqlite3"
+
+
+class Validators(NamedTuple):
+    """The validators of a downloaded file."""
+
+    etag: str | None
+    last_modified: str | None
+    content_hash: str
+
+    def request_headers(self) -> dict[str, str]:
+        """Get the headers that make a request conditional."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+def content_hash(content: str) -> str:
+    """Hash the content of a response."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class ValidatorStore:
+    """SQLite database of the validators of every downloaded file."""
+
+    def __init__(self, path: Path, root: Path) -> None:
+        """Initialize the store, the database is only opened when it is first used.
+
+        Args:
+        ----
+            path: The path of the database.
+            root: The folder with the downloaded files, files are stored by their path relative to it.
+        """
+        self.path = path
+        self.root = root
+        self.connection: sqlite3.Connection | None = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """Open the database and create the table the first time it is used."""
+        if self.connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Downloads are saved on a background thread, the lock makes sure only one thread uses it at a time
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS validators "
+                "(path TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT NOT NULL)",
+            )
+        return self.connection
+
+    def key(self, file_path: RawFile) -> str:
+        """Get the key of a file, so the store still works after the folder is moved or the files are packed."""
+        if isinstance(file_path, PackedFile):
+            return file_path.key
+        try:
+            return file_path.relative_to(self.root).as_posix()
+        except ValueError:
+            return file_path.as_posix()
+
+    def get(self, file_path: RawFile) -> Validators | None:
+        """Get the validators of a file, or None if they were never saved."""
+        with self.lock:
+            row = (
+                self.connect()
+                .execute(
+                    "SELECT etag, last_modified, content_hash FROM validators WHERE path = ?",
+                    (self.key(file_path),),
+                )
+                .fetchone()
+            )
+        return Validators(*row) if row else None
+
+    def set(self, file_path: RawFile, validators: Validators) -> None:  # noqa: A003 - Same name as dict
+        """Save the validators of a file."""
+        with self.lock:
+            connection = self.connect()
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO validators (path, etag, last_modified, content_hash) VALUES (?, ?, ?, ?)",
+                    (self.key(file_path), *validators),
+                )
+
+    def close(self) -> None:
+        """Close the database."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+VALIDATOR_STORE = ValidatorStore(VALIDATORS_PATH, DOWNLOADED_FILES_DIR)
@@ -0,0 +1,128 @@
+"""Fixtures shared by the tests."""  # noqa: INP001 - Tests are not packages
+from __future__ import annotations
+
+import datetime
+import random
+import threading
+from http.server import ThreadingHTTPServer
+from typing import TYPE_CHECKING
+
+import _activate_django  # type: ignore # noqa: F401, PGH003 - Modified global path
+import pytest
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test.utils import setup_test_environment, teardown_test_environment
+from fake_api import FakeApiHandler
+from games.choice_cache import CHOICE_CACHE
+from games.metrics import METRICS
+from games.models import Country, Game, GamePlatform, GamePlatformCountry, Platform
+from games.signatures import rebuild_signatures
+from paved_path import PavedPath
+from scrape.countries import COUNTRY_RESOLVER
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.raw_store import RAW_STORES, FileStore
+from test_batch_import import EXISTING_GAME_ID, save_games
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator
+
+PLATFORM_COUNT = 6
+COUNTRY_COUNT = 5
+GAME_COUNT = 80
+
+
+@pytest.fixture(scope="session")
+def _django_test_database() -> Iterator[None]:
+    """Create a separate test database so the tests never touch db.sqlite3."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    yield
+    connection.creation.destroy_test_db(old_name, verbosity=0)
+    teardown_test_environment()
+
+
+@pytest.fixture()
+def _db(_django_test_database: None) -> Iterator[None]:
+    """Run the test inside a transaction that is rolled back afterwards."""
+    # The data generation is rolled back too, so anything cached by a previous test would look current
+    for cache in caches.all():
+        cache.clear()
+    CHOICE_CACHE.clear()
+    COUNTRY_RESOLVER.clear()
+    DOCUMENT_CACHE.clear()
+    METRICS.clear()
+
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(rollback=True)
+
+
+@pytest.fixture()
+def _sample_games(_db: None) -> None:
+    """Fill the database with a small random catalogue that covers every edge case the searches care about.
+
+    Most games are on one platform, some are on several, some releases have no countries, and multi-platform games get
+    different countries on every platform.
+    """
+    rng = random.Random(5)
+    now = datetime.datetime.now().astimezone()
+
+    platforms = [Platform.objects.create(id=index, name=f"Platform {index}") for index in range(1, PLATFORM_COUNT + 1)]
+    countries = [
+        Country.objects.create(name=f"Country {index}", code=f"C{index}", flag=f"C{index}", region="Region")
+        for index in range(1, COUNTRY_COUNT + 1)
+    ]
+
+    for game_id in range(1, GAME_COUNT + 1):
+        game = Game.objects.create(
+            id=game_id,
+            name=f"Game {game_id % 7} {game_id}",
+            info_timestamp=now,
+            info_modified_timestamp=now,
+        )
+        platform_count = rng.choice([0, 1, 1, 1, 1, 2, 2, 3, PLATFORM_COUNT])
+        for platform in rng.sample(platforms, platform_count):
+            game_platform = GamePlatform.objects.create(game=game, platform=platform)
+            for country in rng.sample(countries, rng.choice([0, 1, 1, 2, 3])):
+                GamePlatformCountry.objects.create(game_platform=game_platform, country=country)
+
+    rebuild_signatures()
+
+
+@pytest.fixture()
+def _raw_files(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep the downloaded game and release files in the temporary folder."""
+    monkeypatch.setitem(RAW_STORES, "files", FileStore(PavedPath(tmp_path)))
+
+
+@pytest.fixture()
+def _downloaded_files(_raw_files: None) -> None:
+    """Save the downloaded files for every game in test_batch_import.GAMES in the temporary folder."""
+    save_games()
+
+
+@pytest.fixture()
+def _imported_game(_db: None) -> None:
+    """Add a game that is already imported and has no downloaded files."""
+    now = datetime.datetime.now().astimezone()
+    Game.objects.create(
+        id=EXISTING_GAME_ID,
+        name="Already Imported",
+        image="",
+        description="",
+        info_timestamp=now,
+        info_modified_timestamp=now,
+    )
+
+
+@pytest.fixture()
+def server_url() -> Iterator[str]:
+    """Run the stand-in for the MobyGames API and get its URL."""
+    FakeApiHandler.reset()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeApiHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,79 @@
+"""Local stand-in for the MobyGames API used by the scraper tests."""  # noqa: INP001 - Tests are not packages
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import urllib.parse
+from http.server import BaseHTTPRequestHandler
+from typing import ClassVar
+
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class FakeApiHandler(BaseHTTPRequestHandler):
+    """Responds with the JSON in bodies, or the path as JSON, and records every request."""
+
+    protocol_version = "HTTP/1.1"
+    requests: ClassVar[list[dict[str, str]]] = []
+    failures: ClassVar[dict[str, int]] = {}
+    bodies: ClassVar[dict[str, str]] = {}
+    # Close every connection after the response without telling the client, like a server with a short keep-alive
+    drop_connections: ClassVar[bool] = False
+
+    @classmethod
+    def reset(cls) -> None:
+        """Forget the requests and responses of the previous test."""
+        cls.requests = []
+        cls.failures = {}
+        cls.bodies = {}
+        cls.drop_connections = False
+
+    def do_GET(self) -> None:  # noqa: N802 - Name is set by http.server
+        """Respond to a GET request."""
+        split_url = urllib.parse.urlsplit(self.path)
+        self.requests.append(
+            {
+                "path": split_url.path,
+                "query": split_url.query,
+                "port": str(self.client_address[1]),
+                "accept_encoding": self.headers.get("Accept-Encoding", ""),
+                "if_none_match": self.headers.get("If-None-Match", ""),
+                "if_modified_since": self.headers.get("If-Modified-Since", ""),
+            },
+        )
+
+        body = self.bodies.get(split_url.path, json.dumps({"path": split_url.path})).encode()
+        etag = f'"{hashlib.sha256(body).hexdigest()}"'
+
+        if self.failures.get(split_url.path, 0) > 0:
+            self.failures[split_url.path] -= 1
+            self.respond(503, b"{}")
+        elif split_url.path == "/missing":
+            self.respond(404, b"{}")
+        elif self.headers.get("If-None-Match") == etag:
+            self.respond(304, b"", {"ETag": etag})
+        else:
+            self.respond(200, body, {"ETag": etag, "Last-Modified": LAST_MODIFIED})
+
+        if self.drop_connections:
+            self.close_connection = True
+
+    def respond(self, status: int, body: bytes, headers: dict[str, str] | None = None) -> None:
+        """Send a gzipped response when the client asked for one."""
+        gzipped = bool(body) and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            body = gzip.compress(body)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args: object) -> None:
+        """Keep the test output clean."""
@@ -0,0 +1,38 @@
+"""Helpers for building search formsets in the tests."""  # noqa: INP001 - Tests are not packages
+from __future__ import annotations
+
+import itertools
+
+from games.forms import SelectFormSet
+
+PLATFORM_SELECTIONS = [[1], [2, 3], [1, 4, 5]]
+COUNTRY_SELECTIONS = [[], [2], [1, 3]]
+YES_NO = ["Yes", "No"]
+SEARCH_TYPES = ["Exclusive", "Or", "And"]
+
+FormData = dict[str, list[int] | str]
+
+
+def make_formset(*forms: FormData) -> SelectFormSet:
+    """Create a bound formset from the fields of each form."""
+    data: FormData = {"form-TOTAL_FORMS": str(len(forms)), "form-INITIAL_FORMS": "0"}
+    for index, form in enumerate(forms):
+        data.update({f"form-{index}-{key}": value for key, value in form.items()})
+    return SelectFormSet(data)
+
+
+def every_form() -> list[FormData]:
+    """Create every combination of form fields for the platforms and countries in the sample games."""
+    return [
+        {
+            "platforms": platforms,
+            "platform_include": platform_include,
+            "platform_search_type": platform_search_type,
+            "countries": countries,
+            "country_include": country_include,
+            "country_search_type": country_search_type,
+        }
+        for platforms, platform_include, platform_search_type, countries, country_include, country_search_type in (
+            itertools.product(PLATFORM_SELECTIONS, YES_NO, SEARCH_TYPES, COUNTRY_SELECTIONS, YES_NO, SEARCH_TYPES)
+        )
+    ]
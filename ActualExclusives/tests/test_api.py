@@ -0,0 +1,67 @@
+"""Tests for the JSON search API."""
+from __future__ import annotations
+
+import gzip
+import json
+
+import pytest
+from django.test import Client
+from games.functions import form_parser
+from games.generation import bump_generation
+from games.models import GamePlatformCountry
+from search_helpers import make_formset
+
+JAPAN_ONLY = {"countries": [2], "country_include": "Yes", "country_search_type": "Or"}
+API_URL = "/api/games?form-TOTAL_FORMS=1&form-INITIAL_FORMS=0&form-0-countries=2&form-0-country_include=Yes"
+API_URL += "&form-0-country_search_type=Or&search_type=And+Search"
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestGamesApi:
+    """Tests for the games_api view."""
+
+    def test_payload(self) -> None:
+        """Test that the API returns the same games as the results page with their platforms and countries."""
+        formset = make_formset(JAPAN_ONLY)
+        assert formset.is_valid()
+        expected = list(form_parser(formset, "And Search").values_list("id", flat=True))
+
+        payload = Client().get(API_URL).json()
+
+        assert [game_id for game_id, _ in payload["games"]] == expected[: len(payload["games"])]
+        game_id, platforms = payload["games"][0]
+        for platform_id, country_ids in platforms:
+            assert country_ids == sorted(
+                GamePlatformCountry.objects.filter(
+                    game_platform__game_id=game_id,
+                    game_platform__platform_id=platform_id,
+                ).values_list("country_id", flat=True),
+            )
+
+    def test_not_modified(self) -> None:
+        """Test that unchanged results are answered with 304 until the data changes."""
+        client = Client()
+        etag = client.get(API_URL)["ETag"]
+
+        assert client.get(API_URL, HTTP_IF_NONE_MATCH=etag).status_code == 304  # noqa: PLR2004 - Not Modified
+
+        bump_generation()
+
+        response = client.get(API_URL, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200  # noqa: PLR2004 - OK
+        assert response["ETag"] != etag
+
+    def test_gzip(self) -> None:
+        """Test that compressed responses have the same payload and their own ETag."""
+        client = Client()
+        plain = client.get(API_URL)
+        compressed = client.get(API_URL, HTTP_ACCEPT_ENCODING="gzip, deflate")
+
+        assert compressed["Content-Encoding"] == "gzip"
+        assert compressed["Vary"] == "Accept-Encoding"
+        assert compressed["ETag"] != plain["ETag"]
+        assert json.loads(gzip.decompress(compressed.content)) == plain.json()
+
+        # The ETag of the uncompressed response does not match the compressed response
+        response = client.get(API_URL, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=plain["ETag"])
+        assert response.status_code == 200  # noqa: PLR2004 - OK
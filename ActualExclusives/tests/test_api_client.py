@@ -0,0 +1,83 @@
+"""Tests for the MobyGames API client using a local HTTP server."""
+from __future__ import annotations
+
+import json
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+from fake_api import FakeApiHandler
+from scrape.api_client import ApiClient, ApiError
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+@pytest.fixture()
+def client() -> Iterator[ApiClient]:
+    """Create a client that does not wait between retries."""
+    api_client = ApiClient(api_key="key", timeout=5, retries=2, sleep=lambda _: None)
+    yield api_client
+    api_client.close()
+
+
+class TestApiClient:
+    """Tests for ApiClient."""
+
+    def test_get(self, server_url: str, client: ApiClient) -> None:
+        """Test that the parameters and the API key are sent and the gzipped response is decoded."""
+        response = client.get(f"{server_url}/v1/games?", {"offset": 100})
+
+        assert json.loads(response.content) == {"path": "/v1/games"}
+        assert FakeApiHandler.requests[0]["query"] == "offset=100&api_key=key"
+        assert FakeApiHandler.requests[0]["accept_encoding"] == "gzip"
+
+    def test_keep_alive(self, server_url: str, client: ApiClient) -> None:
+        """Test that every request is sent over the same connection."""
+        for _ in range(3):
+            client.get(f"{server_url}/v1/games?")
+
+        assert len({request["port"] for request in FakeApiHandler.requests}) == 1
+
+    def test_reconnect(self, server_url: str) -> None:
+        """Test that a request on a connection the server closed is sent again right away on a new connection."""
+        sleeps: list[float] = []
+        client = ApiClient(api_key="key", timeout=5, retries=0, sleep=sleeps.append)
+        FakeApiHandler.drop_connections = True
+        try:
+            for _ in range(3):
+                assert client.get(f"{server_url}/v1/games?").status == HTTPStatus.OK
+        finally:
+            client.close()
+
+        assert sleeps == []
+        assert len({request["port"] for request in FakeApiHandler.requests}) == len(FakeApiHandler.requests)
+
+    def test_retry(self, server_url: str, client: ApiClient) -> None:
+        """Test that temporary errors are retried."""
+        FakeApiHandler.failures["/v1/games"] = 2
+
+        response = client.get(f"{server_url}/v1/games?")
+
+        assert response.status == 200  # noqa: PLR2004 - HTTP status
+        assert len(FakeApiHandler.requests) == 3  # noqa: PLR2004 - Two failures and a success
+
+    def test_retry_limit(self, server_url: str, client: ApiClient) -> None:
+        """Test that the last temporary error is raised after every retry failed."""
+        FakeApiHandler.failures["/v1/games"] = 3
+
+        with pytest.raises(Exception, match="503"):
+            client.get(f"{server_url}/v1/games?")
+
+    def test_error(self, server_url: str, client: ApiClient) -> None:
+        """Test that errors that will not go away are not retried."""
+        with pytest.raises(ApiError) as error:
+            client.get(f"{server_url}/missing?")
+
+        assert error.value.status == 404  # noqa: PLR2004 - HTTP status
+        assert len(FakeApiHandler.requests) == 1
+
+    def test_connection_error(self, client: ApiClient) -> None:
+        """Test that connection errors are raised after every retry failed."""
+        with pytest.raises(OSError):  # noqa: PT011 - Any connection error
+            client.get("http://127.0.0.1:9/v1/games?")
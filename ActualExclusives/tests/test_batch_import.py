@@ -0,0 +1,200 @@
+"""Tests that the batch importer leaves the database the same as importing every game on its own."""
+from __future__ import annotations
+
+import datetime
+import json
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from games.models import Country, Game, GameGenre, GamePlatform, GamePlatformCountry, Genre, Platform
+from scrape.batch_import import BatchImporter, load_document
+from scrape.content_digest import ImportOutcome, report_outcomes
+from scrape.countries import UnknownCountryError
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.game import GameManager
+
+if TYPE_CHECKING:
+    from paved_path import PavedPath
+
+# (game id, genres, {platform id: countries of each release})
+GAMES = [
+    (101, [(1, "Action")], {1: [["United States", "Japan"]], 2: [["Japan"], ["Germany"]]}),
+    (102, [(1, "Action"), (2, "Puzzle"), (2, "Puzzle")], {2: [["Germany", "United States"]]}),
+    # A platform without releases and a release without countries
+    (103, [], {3: [], 1: [[]]}),
+    # A country that is only known by its alternative name
+    (104, [(3, "Racing")], {4: [["Czechoslovakia (1945-1992)", "Japan"]]}),
+    (105, [(2, "Puzzle")], {1: [["Worldwide"]], 4: [["Worldwide", "United States"]]}),
+]
+EXISTING_GAME_ID = 102
+
+
+def write_json(path: PavedPath, content: dict[str, Any]) -> None:
+    """Save a downloaded file, without the content that was cached for it before."""
+    path.write(json.dumps(content))
+    DOCUMENT_CACHE.discard(path)
+
+
+def save_games() -> None:
+    """Save the downloaded files for every game in GAMES."""
+    for game_id, genres, platforms in GAMES:
+        game_manager = GameManager(game_id)
+        write_json(
+            game_manager.game_json_path,
+            {
+                "game_id": game_id,
+                "title": f"Game {game_id}",
+                "sample_cover": {"thumbnail_image": f"{game_id}.png"} if game_id % 2 else None,
+                "description": f"Description {game_id}",
+                "genres": [{"genre_id": genre_id, "genre_name": name} for genre_id, name in genres],
+                "platforms": [
+                    {"platform_id": platform_id, "platform_name": f"Platform {platform_id}"}
+                    for platform_id in platforms
+                ],
+            },
+        )
+        for platform_id, releases in platforms.items():
+            write_json(
+                game_manager.game_platform_json_path(platform_id),
+                {"releases": [{"countries": countries} for countries in releases]},
+            )
+
+
+def table_rows() -> dict[str, list[tuple[Any, ...]]]:
+    """Get every row that the importers write, except for the time the games were imported."""
+    return {
+        "games": list(
+            Game.objects.order_by("id").values_list(
+                "id",
+                "name",
+                "image",
+                "description",
+                "content_digest",
+                "info_timestamp",
+            ),
+        ),
+        "genres": list(Genre.objects.order_by("id").values_list("id", "genre")),
+        "game_genres": list(GameGenre.objects.order_by("game_id", "genre_id").values_list("game_id", "genre_id")),
+        "platforms": list(Platform.objects.order_by("id").values_list("id", "name", "imported")),
+        "countries": list(Country.objects.order_by("id").values_list("id", "name", "code", "flag", "region")),
+        "game_platforms": list(
+            GamePlatform.objects.order_by("id").values_list("id", "game_id", "platform_id", "content_digest"),
+        ),
+        "game_platform_countries": list(
+            GamePlatformCountry.objects.order_by("id").values_list("game_platform_id", "country_id"),
+        ),
+        "signatures": list(
+            Game.objects.order_by("id").values_list(
+                "id",
+                "gamesignature__platform_signature",
+                "gamesignature__country_signature",
+            ),
+        ),
+    }
+
+
+@pytest.mark.usefixtures("_db", "_downloaded_files", "_imported_game")
+class TestBatchImporter:
+    """Tests for BatchImporter."""
+
+    def import_one_at_a_time(self, *info_timestamps: datetime.datetime | None) -> dict[str, list[tuple[Any, ...]]]:
+        """Import every game with GameManager.import_game for each info_timestamp, get the rows, and roll back."""
+        with transaction.atomic():
+            for info_timestamp in info_timestamps or [None]:
+                for game_id, _, _ in GAMES:
+                    GameManager(game_id).import_game(info_timestamp)
+            rows = table_rows()
+            transaction.set_rollback(rollback=True)
+        return rows
+
+    def test_same_rows(self) -> None:
+        """Test that importing in batches creates the same rows with the same ids."""
+        expected = self.import_one_at_a_time()
+
+        imported = BatchImporter(batch_size=2).import_games(
+            load_document(GameManager(game_id)) for game_id, _, _ in GAMES
+        )
+
+        assert table_rows() == expected
+        assert imported == [game_id for game_id, _, _ in GAMES if game_id != EXISTING_GAME_ID]
+
+    def test_import_again(self) -> None:
+        """Test that importing outdated games again keeps the rows the same."""
+        later = datetime.datetime.now().astimezone() + datetime.timedelta(days=1)
+        expected = self.import_one_at_a_time(None, later)
+
+        importer = BatchImporter()
+        importer.import_games(load_document(GameManager(game_id)) for game_id, _, _ in GAMES)
+        importer.import_games(load_document(GameManager(game_id), later) for game_id, _, _ in GAMES)
+
+        assert table_rows() == expected
+
+    def test_fewer_queries(self) -> None:
+        """Test that a batch uses a fixed number of queries instead of several for every row."""
+        with CaptureQueriesContext(connection) as one_at_a_time:
+            self.import_one_at_a_time()
+
+        documents = [load_document(GameManager(game_id)) for game_id, _, _ in GAMES]
+        with CaptureQueriesContext(connection) as batch:
+            BatchImporter().import_games(documents)
+
+        assert len(batch) * 3 < len(one_at_a_time)
+
+    def test_unknown_countries(self) -> None:
+        """Test that every unknown country in the batch is raised at once before anything is imported."""
+        documents = [load_document(GameManager(game_id)) for game_id, _, _ in GAMES]
+        documents[0].platforms[1]["releases"].append({"countries": ["Atlantis"]})
+        documents[3].platforms[4]["releases"].append({"countries": ["Lemuria", "Japan"]})
+
+        with pytest.raises(UnknownCountryError) as error:
+            BatchImporter().import_games(documents)
+
+        assert error.value.names == ["Atlantis", "Lemuria"]
+        assert list(Game.objects.values_list("id", flat=True)) == [EXISTING_GAME_ID]
+
+    def test_unchanged(self) -> None:
+        """Test that outdated games with the same data as last time are skipped without writing anything."""
+        later = datetime.datetime.now().astimezone() + datetime.timedelta(days=1)
+        importer = BatchImporter()
+        importer.import_games(load_document(GameManager(game_id)) for game_id, _, _ in GAMES)
+        # The game that existed before has no digest yet
+        assert importer.import_games(load_document(GameManager(game_id), later) for game_id, _, _ in GAMES) == [
+            EXISTING_GAME_ID,
+        ]
+        rows = table_rows()
+        report_outcomes()
+
+        documents = [load_document(GameManager(game_id), later) for game_id, _, _ in GAMES]
+        with CaptureQueriesContext(connection) as queries:
+            assert importer.import_games(documents) == []
+            GameManager(GAMES[0][0]).import_game(later)
+
+        assert table_rows() == rows
+        assert all(query["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE")) for query in queries)
+        assert report_outcomes() == {ImportOutcome.UNCHANGED: len(GAMES) + 1}
+
+    def test_changed_release(self) -> None:
+        """Test that only the releases that changed are imported again, the same as importing every game on its own."""
+        later = datetime.datetime.now().astimezone() + datetime.timedelta(days=1)
+        release_path = GameManager(101).game_platform_json_path(2)
+        original = release_path.read_text()
+
+        with transaction.atomic():
+            for game_id, _, _ in GAMES:
+                GameManager(game_id).import_game()
+            write_json(release_path, {"releases": [{"countries": ["Japan", "Worldwide"]}]})
+            for game_id, _, _ in GAMES:
+                GameManager(game_id).import_game(later)
+            expected = table_rows()
+            transaction.set_rollback(rollback=True)
+
+        write_json(release_path, json.loads(original))
+        importer = BatchImporter()
+        importer.import_games(load_document(GameManager(game_id)) for game_id, _, _ in GAMES)
+        write_json(release_path, {"releases": [{"countries": ["Japan", "Worldwide"]}]})
+        imported = importer.import_games(load_document(GameManager(game_id), later) for game_id, _, _ in GAMES)
+
+        assert imported == [101, EXISTING_GAME_ID]
+        assert table_rows() == expected
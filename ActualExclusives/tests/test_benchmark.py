@@ -0,0 +1,76 @@
+"""Tests for the synthetic data generator and the search benchmark."""
+from __future__ import annotations
+
+import pytest
+from django.db.models import Count
+from games.benchmark import run_benchmark
+from games.models import Game, GamePlatform, GamePlatformCountry
+from games.sample_data import DatabaseNotEmptyError, generate_sample_data
+
+GAME_COUNT = 500
+SEARCH_COMBINATIONS = 72
+
+
+@pytest.mark.usefixtures("_db")
+class TestSampleData:
+    """Tests for generate_sample_data."""
+
+    def snapshot(self) -> list[tuple[int, int, int]]:
+        """Get every release and its countries."""
+        return list(
+            GamePlatformCountry.objects.order_by("id").values_list(
+                "game_platform__game_id",
+                "game_platform__platform_id",
+                "country_id",
+            ),
+        )
+
+    def test_reproducible(self) -> None:
+        """Test that the same seed always generates the same data."""
+        generate_sample_data(GAME_COUNT, 30, 10, seed=1)
+        first = self.snapshot()
+        generate_sample_data(GAME_COUNT, 30, 10, seed=1, clear=True)
+
+        assert self.snapshot() == first
+
+    def test_distribution(self) -> None:
+        """Test that most games are on one platform and that the first platform is the most popular."""
+        generate_sample_data(GAME_COUNT, 30, 10)
+        platform_counts = Game.objects.annotate(platforms=Count("gameplatform")).values_list("platforms", flat=True)
+        releases = dict(
+            GamePlatform.objects.values("platform_id")
+            .annotate(releases=Count("id"))
+            .values_list(
+                "platform_id",
+                "releases",
+            ),
+        )
+
+        assert Game.objects.count() == GAME_COUNT
+        assert sum(count == 1 for count in platform_counts) > GAME_COUNT / 2
+        assert max(platform_counts) > 1
+        assert max(releases, key=releases.__getitem__) == 1
+
+    def test_not_empty(self) -> None:
+        """Test that existing games are not replaced unless clear is used."""
+        generate_sample_data(10, 3, 3)
+
+        with pytest.raises(DatabaseNotEmptyError):
+            generate_sample_data(10, 3, 3)
+
+
+@pytest.mark.usefixtures("_db")
+class TestBenchmark:
+    """Tests for run_benchmark."""
+
+    def test_results(self) -> None:
+        """Test that every search is timed through form_parser and the view."""
+        generate_sample_data(GAME_COUNT, 30, 10)
+
+        results = run_benchmark(repeat=2)
+
+        assert results["dataset"]["games"] == GAME_COUNT
+        assert len(results["results"]) == SEARCH_COMBINATIONS * 2
+        for result in results["results"]:
+            assert result["p50_ms"] <= result["p95_ms"]
+            assert result["queries"] > 0
@@ -0,0 +1,78 @@
+"""Tests for the cached choices of SelectForm."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.db import connection
+from games.generation import bump_generation
+from games.models import Country, Platform
+from search_helpers import make_formset
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def count_queries(function: Callable[[], object]) -> int:
+    """Run a function and count the statements that it ran."""
+    statements = []
+
+    def record(execute: Callable[..., Any], sql: str, *args: Any) -> Any:  # noqa: ANN401 - Wraps any statement
+        statements.append(sql)
+        return execute(sql, *args)
+
+    with connection.execute_wrapper(record):
+        function()
+
+    return len(statements)
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestChoiceCache:
+    """Tests for validating and rendering SelectForm from the choice cache."""
+
+    def test_cleaned_data(self) -> None:
+        """Test that the selected instances are returned in name order like the queryset they replace."""
+        formset = make_formset({"platforms": [3, 1], "countries": [2]})
+
+        assert formset.is_valid()
+        expected = list(Platform.objects.filter(id__in=[1, 3]).order_by("name"))
+        assert formset.forms[0].cleaned_data["platforms"] == expected
+        assert formset.forms[0].cleaned_data["countries"] == [Country.objects.get(id=2)]
+
+    def test_invalid_choice(self) -> None:
+        """Test that ids that do not exist are rejected."""
+        assert not make_formset({"platforms": [1, 999]}).is_valid()
+        assert not make_formset({"countries": ["one"]}).is_valid()
+
+    def test_no_queries(self) -> None:
+        """Test that once the choices are cached a formset only checks the data generation."""
+        make_formset({}).is_valid()
+
+        def validate_and_render() -> None:
+            formset = make_formset({"platforms": [1, 2], "countries": [2]}, {"platforms": [4]})
+            assert formset.is_valid()
+            for form in [*formset.forms, formset.empty_form]:
+                form.as_p()
+
+        assert count_queries(validate_and_render) == 1
+
+    def test_selected_options(self) -> None:
+        """Test that the selected platforms are rendered as selected."""
+        html = make_formset({"platforms": [2]}).forms[0]["platforms"].as_widget()
+
+        assert '<option value="2" selected>Platform 2</option>' in html
+        assert '<option value="1">Platform 1</option>' in html
+        assert 'name="form-0-platforms"' in html
+        assert "multiple" in html
+
+    def test_new_platform(self) -> None:
+        """Test that platforms imported after the choices were cached can be chosen after the generation changes."""
+        make_formset({}).is_valid()
+        Platform.objects.create(id=100, name="New Platform")
+
+        assert not make_formset({"platforms": [100]}).is_valid()
+
+        bump_generation()
+
+        assert make_formset({"platforms": [100]}).is_valid()
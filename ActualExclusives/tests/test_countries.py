@@ -0,0 +1,93 @@
+"""Tests for resolving the country names of releases."""
+from __future__ import annotations
+
+import pytest
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from games.models import Country
+from scrape.countries import CountryIndex, CountryInfo, CountryResolver, UnknownCountryError
+
+COUNTRIES = [
+    {"name": "Japan", "iso2": "JP", "region": "Asia", "emoji": "JP"},
+    {
+        "name": "Czechoslovakia",
+        "alternative_names": ["Czechoslovakia (1945-1992)"],
+        "iso2": "CS",
+        "region": "Europe",
+        "emoji": "CS",
+    },
+    {"name": "United States", "iso2": "US", "region": "North America", "emoji": "US"},
+]
+
+
+class TestCountryIndex:
+    """Tests for CountryIndex."""
+
+    def test_names(self) -> None:
+        """Test that names and alternative names match without caring about case or extra spaces."""
+        index = CountryIndex(COUNTRIES)
+
+        assert index.get("Japan") == CountryInfo("JP", "JP", "Asia")
+        assert index.get("  united   STATES ") == CountryInfo("US", "US", "North America")
+        assert index.get("Czechoslovakia (1945-1992)") == CountryInfo("CS", "CS", "Europe")
+        assert index.get("Atlantis") is None
+        assert index.canonical("czechoslovakia  (1945-1992)") == "Czechoslovakia (1945-1992)"
+        assert index.canonical("Atlantis") is None
+
+
+@pytest.mark.usefixtures("_db")
+class TestCountryResolver:
+    """Tests for CountryResolver."""
+
+    def test_create(self) -> None:
+        """Test that countries are created in order with the information from countries.json."""
+        resolver = CountryResolver(CountryIndex(COUNTRIES))
+
+        ids = resolver.resolve(["Czechoslovakia (1945-1992)", "Japan", "Czechoslovakia (1945-1992)"])
+
+        countries = list(Country.objects.order_by("id").values_list("id", "name", "code", "flag", "region"))
+        assert countries == [
+            (ids["Czechoslovakia (1945-1992)"], "Czechoslovakia (1945-1992)", "CS", "CS", "Europe"),
+            (ids["Japan"], "Japan", "JP", "JP", "Asia"),
+        ]
+        assert resolver.resolve(["Japan"]) == {"Japan": ids["Japan"]}
+
+    def test_same_row(self) -> None:
+        """Test that names that only differ in case or spaces use the row named as in countries.json."""
+        resolver = CountryResolver(CountryIndex(COUNTRIES))
+
+        ids = resolver.resolve(["japan", "Japan", " JAPAN "])
+
+        assert list(Country.objects.values_list("id", "name")) == [(ids["Japan"], "Japan")]
+        assert ids == dict.fromkeys(["japan", "Japan", " JAPAN "], ids["Japan"])
+
+    def test_cached_after_commit(self) -> None:
+        """Test that ids are only kept once they are committed and are then used without a query."""
+        resolver = CountryResolver(CountryIndex(COUNTRIES))
+
+        with transaction.atomic():
+            resolver.resolve(["Japan"])
+            transaction.set_rollback(rollback=True)
+        assert resolver.ids == {}
+
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            ids = resolver.resolve(["Japan"])
+        assert resolver.ids == ids
+
+        with CaptureQueriesContext(connection) as queries:
+            assert resolver.resolve(["Japan"]) == ids
+        assert len(queries) == 0
+
+    def test_unknown(self) -> None:
+        """Test that every unknown name is raised at once and reported with the games it was found in."""
+        resolver = CountryResolver(CountryIndex(COUNTRIES))
+
+        with pytest.raises(UnknownCountryError) as error:
+            resolver.resolve(["Atlantis", "Japan", "Lemuria", "Atlantis"], 1)
+        assert error.value.names == ["Atlantis", "Lemuria"]
+        assert not Country.objects.exists()
+
+        resolver.find_unknown(["Atlantis"], 2)
+        assert resolver.report() == {"Atlantis": {1, 2}, "Lemuria": {1}}
+        assert resolver.report() == {}
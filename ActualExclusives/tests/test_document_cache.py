@@ -0,0 +1,76 @@
+"""Tests for the cache of parsed documents."""
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+from json_file import JSONFile
+from scrape.document_cache import CacheStats, DocumentCache
+
+if TYPE_CHECKING:
+    import pathlib
+
+
+def write_document(folder: pathlib.Path, name: str, size: int) -> JSONFile:
+    """Save a document whose content is exactly size bytes."""
+    file = JSONFile(folder / f"{name}.json")
+    file.write(json.dumps("x" * (size - 2)))
+    return file
+
+
+class TestDocumentCache:
+    """Tests for DocumentCache."""
+
+    def test_get(self, tmp_path: pathlib.Path) -> None:
+        """Test that a file is only parsed the first time, and that the same object is returned every time."""
+        cache = DocumentCache(1000)
+        file = write_document(tmp_path, "a", 100)
+
+        document = cache.get(file)
+        file.unlink()
+
+        assert cache.get(file) is document
+        assert cache.report() == CacheStats(hits=1, misses=1, evictions=0, size=100, documents=1)
+        # The counts are reset by every report
+        assert cache.report() == CacheStats(hits=0, misses=0, evictions=0, size=100, documents=1)
+
+    def test_eviction(self, tmp_path: pathlib.Path) -> None:
+        """Test that the least recently used documents are dropped once the content is over the size of the cache."""
+        cache = DocumentCache(250)
+        first, second, third = (write_document(tmp_path, name, 100) for name in ("first", "second", "third"))
+        cache.get(first)
+        cache.get(second)
+        # Reading the first document again makes the second one the least recently used
+        cache.get(first)
+        cache.get(third)
+
+        assert list(cache.documents) == [str(first), str(third)]
+        assert cache.size == first.stat().st_size + third.stat().st_size
+        stats = cache.report()
+        assert (stats.hits, stats.misses, stats.evictions) == (1, 3, 1)
+        assert stats.hit_rate == 1 / 4
+
+    def test_put(self, tmp_path: pathlib.Path) -> None:
+        """Test that content that is put replaces the cached document, and that huge documents are not cached."""
+        cache = DocumentCache(100)
+        file = write_document(tmp_path, "a", 50)
+        cache.get(file)
+
+        assert cache.put(file, '{"changed": true}') == {"changed": True}
+        assert cache.get(file) == {"changed": True}
+        assert cache.size == len('{"changed": true}')
+
+        cache.put(file, json.dumps("x" * 200))
+        assert cache.documents == {}
+        assert cache.size == 0
+
+    def test_discard(self, tmp_path: pathlib.Path) -> None:
+        """Test that a discarded file is parsed again."""
+        cache = DocumentCache(1000)
+        file = write_document(tmp_path, "a", 100)
+        cache.get(file)
+        file.write(json.dumps({"changed": True}))
+        cache.discard(file)
+
+        assert cache.get(file) == {"changed": True}
+        assert cache.report()[:2] == (0, 2)
@@ -0,0 +1,62 @@
+"""Tests for the bitset exclusivity index."""
+from __future__ import annotations
+
+import itertools
+
+import pytest
+from games.exclusivity_index import ExclusivityIndex, bit_indexes, make_bits, pack_bits, unpack_bits
+from games.functions import and_form_parser, or_form_parser
+from search_helpers import every_form, make_formset
+
+
+class TestBits:
+    """Tests for the bitset helpers."""
+
+    def test_pack_round_trip(self) -> None:
+        """Test that packing and unpacking a bitset does not change it."""
+        indexes = [17, 18, 40, 1000]
+        assert unpack_bits(pack_bits(indexes)) == sum(1 << index for index in indexes)
+        assert pack_bits(indexes) == (16, make_bits(index - 16 for index in indexes))
+
+    def test_pack_empty(self) -> None:
+        """Test that an empty list of indexes is an empty bitset."""
+        assert make_bits([]) == 0
+
+    def test_bit_indexes(self) -> None:
+        """Test that the indexes of the set bits are found."""
+        indexes = [0, 7, 8, 63, 64, 513]
+        assert list(bit_indexes(make_bits(indexes))) == indexes
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestExclusivityIndex:
+    """Tests that the index gives the same results as the ORM functions."""
+
+    def test_single_form(self) -> None:
+        """Test every combination of fields on a single form."""
+        index = ExclusivityIndex.build()
+        for form in every_form():
+            formset = make_formset(form)
+            assert formset.is_valid()
+            assert index.search(formset, "And Search") == and_form_parser(formset, set()), form
+            assert index.search(formset, "Or Search") == or_form_parser(formset, set()), form
+
+    def test_multiple_forms(self) -> None:
+        """Test combining forms with And Search and Or Search."""
+        index = ExclusivityIndex.build()
+        forms = every_form()[::17]
+        for first_form, second_form in itertools.combinations(forms, 2):
+            formset = make_formset(first_form, second_form)
+            assert index.search(formset, "And Search") == and_form_parser(formset, set())
+            assert index.search(formset, "Or Search") == or_form_parser(formset, set())
+
+    def test_empty_form(self) -> None:
+        """Test that a form without any platforms or countries matches every game that is on a platform."""
+        index = ExclusivityIndex.build()
+        formset = make_formset({})
+        assert index.search(formset, "And Search") == and_form_parser(formset, set())
+
+    def test_unknown_search_type(self) -> None:
+        """Test that an unknown search type does not match anything."""
+        index = ExclusivityIndex.build()
+        assert index.search(make_formset({}), "Unknown") == set()
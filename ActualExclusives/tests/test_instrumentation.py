@@ -0,0 +1,87 @@
+"""Tests for the per request instrumentation."""
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from django.contrib.auth.models import User
+from django.test import Client, override_settings
+from games.instrumentation import LATENCY_HISTOGRAM, RequestProfile, profile_stage
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+RESULTS_URL = (
+    "/games?form-TOTAL_FORMS=1&form-INITIAL_FORMS=0&form-0-platforms=1&form-0-platform_include=Yes"
+    "&form-0-platform_search_type=Or&search_type=Or+Search"
+)
+
+
+@pytest.mark.usefixtures("_sample_games", "_instrumentation")
+class TestInstrumentation:
+    """Tests for InstrumentationMiddleware and profile_stage."""
+
+    @pytest.fixture()
+    def _instrumentation(self) -> Iterator[None]:
+        """Enable the instrumentation with an empty histogram."""
+        LATENCY_HISTOGRAM.clear()
+        with override_settings(INSTRUMENTATION_ENABLED=True):
+            yield
+
+    def test_server_timing(self) -> None:
+        """Test that every stage of the results page is in the Server-Timing header."""
+        server_timing = Client().get(RESULTS_URL)["Server-Timing"]
+
+        metrics = {metric.split(";")[0] for metric in server_timing.split(", ")}
+        assert metrics == {"search", "prefetch", "render", "total", "sql"}
+
+    def test_log(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that the stages are logged as JSON."""
+        with caplog.at_level("INFO", logger="games.instrumentation"):
+            Client().get(RESULTS_URL)
+
+        record = json.loads(caplog.records[-1].getMessage())
+        stages = {stage["name"]: stage for stage in record["stages"]}
+        assert record["endpoint"] == "games"
+        assert stages["search"]["queries"] >= 1
+        assert stages["search"]["rows"] == record["rows"] - stages["prefetch"]["rows"]
+
+    def test_status(self) -> None:
+        """Test that the latency of every endpoint is shown on the status page."""
+        client = Client()
+        client.get(RESULTS_URL)
+        client.get(RESULTS_URL)
+
+        assert LATENCY_HISTOGRAM.snapshot()["games"]["count"] == 2  # noqa: PLR2004 - Two requests
+        assert client.get("/status").status_code == 302  # noqa: PLR2004 - Redirect to the login page
+
+        client.force_login(User.objects.create(username="staff", is_staff=True))
+        assert b"<h3>games</h3>" in client.get("/status").content
+
+    def test_stream(self, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that a streamed response is recorded once the last chunk is sent, with the queries for the results."""
+        with caplog.at_level("INFO", logger="games.instrumentation"):
+            response = Client().get(f"{RESULTS_URL}&stream=1")
+            assert "Server-Timing" not in response
+            assert LATENCY_HISTOGRAM.snapshot() == {}
+
+            b"".join(response.streaming_content)
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record["streaming"]
+        assert record["queries"] >= 1
+        assert LATENCY_HISTOGRAM.snapshot()["games"]["count"] == 1
+
+    def test_without_request(self) -> None:
+        """Test that stages outside of a request are not recorded."""
+        profile = RequestProfile()
+        with profile_stage("search") as stage:
+            stage.add_rows(1)
+
+        assert profile.stages == []
+
+    def test_disabled(self) -> None:
+        """Test that nothing is added to the response when the instrumentation is disabled."""
+        with override_settings(INSTRUMENTATION_ENABLED=False):
+            assert "Server-Timing" not in Client().get(RESULTS_URL)
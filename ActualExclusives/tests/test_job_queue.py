@@ -0,0 +1,418 @@
+"""Tests for the scrape job queue."""
+from __future__ import annotations
+
+import datetime
+from concurrent.futures import Future
+from typing import TYPE_CHECKING
+
+import pytest
+from games.generation import current_generation
+from games.models import Game, ScrapeJob
+from paved_path import PavedPath
+from scrape.job_queue import (
+    MAX_ATTEMPTS,
+    POSTPONE_DELAY,
+    JobType,
+    StageThroughput,
+    Worker,
+    claim,
+    complete,
+    enqueue,
+    failed_count,
+    new_job,
+    requeue_folder,
+    run_worker,
+)
+from scrape.jobs import changed_imports
+
+if TYPE_CHECKING:
+    import pathlib
+
+Kind = ScrapeJob.Kind
+Status = ScrapeJob.Status
+ALL_KINDS = list(Kind)
+
+
+def saved_download() -> Future[bool]:
+    """Create a download that is already saved."""
+    download: Future[bool] = Future()
+    download.set_result(result=True)
+    return download
+
+
+def expire_leases() -> None:
+    """Make every lease and retry delay run out."""
+    past = datetime.datetime.now().astimezone() - datetime.timedelta(days=1)
+    ScrapeJob.objects.update(lease_expires=past, available=past)
+
+
+class FakeJobs:
+    """Job types that record the jobs they run, a game job enqueues a download and an import for the game."""
+
+    def __init__(self) -> None:
+        """Initialize the job types."""
+        self.finished: list[str] = []
+        self.batches: list[list[str]] = []
+        self.interrupt: str | None = None
+        self.fail: str | None = None
+
+    def finish(self, job: ScrapeJob) -> None:
+        """Record the job and enqueue the work for games."""
+        if job.key == self.interrupt:
+            raise KeyboardInterrupt
+        if job.key == self.fail:
+            msg = "Invalid JSON"
+            raise ValueError(msg)
+
+        self.finished.append(job.key)
+        if job.kind == Kind.GAME:
+            enqueue(
+                new_job(Kind.GAME_PLATFORM, f"game_platform:{job.game_id}", {}, job.game_id),
+                new_job(Kind.IMPORT, f"import:{job.game_id}", {}, job.game_id),
+            )
+
+    def finish_batch(self, jobs: list[ScrapeJob]) -> None:
+        """Record a batch of jobs, the whole batch fails if one of the jobs fails."""
+        keys = [job.key for job in jobs]
+        if self.fail in keys:
+            msg = "Invalid JSON"
+            raise ValueError(msg)
+
+        self.batches.append(keys)
+        for job in jobs:
+            self.finish(job)
+
+    def start_download(self, job: ScrapeJob) -> Future[bool]:  # noqa: ARG002 - Same for every job
+        """Pretend to download something."""
+        return saved_download()
+
+    def start_slow_download(self, job: ScrapeJob) -> Future[bool]:  # noqa: ARG002 - Same for every job
+        """Pretend to start a download that is still waiting in the scheduler."""
+        return Future()
+
+    def job_types(self, batch_size: int = 1) -> dict[str, JobType]:
+        """Get the job types, imports are finished in batches of up to batch_size jobs."""
+        return {
+            Kind.LIST_PAGE: JobType(self.finish, self.start_download),
+            Kind.GAME: JobType(self.finish),
+            Kind.GAME_PLATFORM: JobType(self.finish, self.start_download),
+            Kind.IMPORT: JobType(self.finish, changes_data=True, finish_batch=self.finish_batch, batch_size=batch_size),
+        }
+
+
+@pytest.mark.usefixtures("_db")
+class TestJobQueue:
+    """Tests for enqueueing and claiming jobs."""
+
+    def test_enqueue_once(self) -> None:
+        """Test that a job with the same key is only enqueued once, even after it is done."""
+        enqueue(new_job(Kind.GAME, "game:1", {"game_id": 1}, 1))
+        enqueue(new_job(Kind.GAME, "game:1", {"game_id": 2}, 2))
+        complete(claim(ALL_KINDS))
+        enqueue(new_job(Kind.GAME, "game:1", {"game_id": 1}, 1))
+
+        job = ScrapeJob.objects.get()
+        assert job.payload == {"game_id": 1}
+        assert job.status == Status.DONE
+        assert claim(ALL_KINDS) is None
+
+    def test_priority(self) -> None:
+        """Test that imports are claimed before games and games before list pages."""
+        enqueue(
+            new_job(Kind.LIST_PAGE, "list_page", {}),
+            new_job(Kind.GAME, "game:1", {}, 1),
+            new_job(Kind.IMPORT, "import:2", {}, 2),
+        )
+
+        assert [claim(ALL_KINDS).key for _ in range(3)] == ["import:2", "game:1", "list_page"]
+
+    def test_kinds(self) -> None:
+        """Test that only the given kinds of jobs are claimed."""
+        enqueue(new_job(Kind.GAME_PLATFORM, "game_platform:1", {}, 1), new_job(Kind.GAME, "game:2", {}, 2))
+        assert claim([Kind.GAME]).key == "game:2"
+
+    def test_import_waits_for_downloads(self) -> None:
+        """Test that an import is only claimed once the downloads for its game are done."""
+        enqueue(
+            new_job(Kind.GAME_PLATFORM, "game_platform:1", {}, 1),
+            new_job(Kind.IMPORT, "import:1", {}, 1),
+        )
+
+        download = claim(ALL_KINDS)
+        assert download.key == "game_platform:1"
+        assert claim(ALL_KINDS) is None
+
+        complete(download)
+        assert claim(ALL_KINDS).key == "import:1"
+
+    def test_lease(self) -> None:
+        """Test that a job whose worker stopped is claimed again once the lease runs out."""
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1))
+        assert claim(ALL_KINDS).attempts == 1
+        assert claim(ALL_KINDS) is None
+
+        expire_leases()
+        job = claim(ALL_KINDS)
+        assert job.key == "game:1"
+        assert job.attempts == 2  # noqa: PLR2004 - Claimed twice
+
+
+@pytest.mark.usefixtures("_db")
+class TestRunWorker:
+    """Tests for run_worker."""
+
+    def test_order(self) -> None:
+        """Test that every job is run and each game is imported right after its downloads."""
+        jobs = FakeJobs()
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1), new_job(Kind.GAME, "game:2", {}, 2))
+
+        assert run_worker(jobs.job_types()) == 6  # noqa: PLR2004 - Two games with three jobs each
+
+        assert jobs.finished == [
+            "game:1",
+            "game_platform:1",
+            "import:1",
+            "game:2",
+            "game_platform:2",
+            "import:2",
+        ]
+        assert set(ScrapeJob.objects.values_list("status", flat=True)) == {Status.DONE}
+
+    def test_resume(self) -> None:
+        """Test that a worker that was interrupted hands back its job and the next worker starts from it."""
+        jobs = FakeJobs()
+        jobs.interrupt = "import:1"
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1), new_job(Kind.GAME, "game:2", {}, 2))
+
+        with pytest.raises(KeyboardInterrupt):
+            run_worker(jobs.job_types())
+
+        interrupted = ScrapeJob.objects.get(key="import:1")
+        assert interrupted.status == Status.PENDING
+        assert interrupted.attempts == 0
+
+        jobs.interrupt = None
+        run_worker(jobs.job_types())
+
+        assert jobs.finished == [
+            "game:1",
+            "game_platform:1",
+            "import:1",
+            "game:2",
+            "game_platform:2",
+            "import:2",
+        ]
+
+    def test_retry(self) -> None:
+        """Test that a job that failed is tried again later and marked as failed after too many attempts."""
+        jobs = FakeJobs()
+        jobs.fail = "game:1"
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1))
+
+        assert run_worker(jobs.job_types()) == 0
+        job = ScrapeJob.objects.get()
+        assert job.status == Status.PENDING
+        assert job.available > datetime.datetime.now().astimezone()
+        assert "Invalid JSON" in job.error
+
+        for _ in range(MAX_ATTEMPTS - 1):
+            expire_leases()
+            run_worker(jobs.job_types())
+
+        assert ScrapeJob.objects.get().status == Status.FAILED
+
+    def test_download_result(self) -> None:
+        """Test that the result of the download is kept in the payload of the job."""
+        jobs = FakeJobs()
+        enqueue(new_job(Kind.GAME_PLATFORM, "game_platform:1", {"platform_id": 1}, 1))
+        run_worker(jobs.job_types())
+
+        assert ScrapeJob.objects.get().payload == {"platform_id": 1, "download_result": True}
+
+    def test_postpone(self) -> None:
+        """Test that a job with an error that has to be fixed by hand is tried again later without using an attempt."""
+        jobs = FakeJobs()
+        jobs.fail = "game:1"
+        job_types = jobs.job_types()
+        job_types[Kind.GAME] = job_types[Kind.GAME]._replace(postpone_errors=(ValueError,))
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1))
+
+        for _ in range(MAX_ATTEMPTS + 1):
+            expire_leases()
+            run_worker(job_types)
+
+        job = ScrapeJob.objects.get()
+        assert job.status == Status.PENDING
+        assert job.attempts == 0
+        assert job.available > datetime.datetime.now().astimezone() + POSTPONE_DELAY / 2
+
+    def test_requeue(self) -> None:
+        """Test that a job that failed too many times is tried again from the start when it is enqueued again."""
+        jobs = FakeJobs()
+        jobs.fail = "game:1"
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1))
+        for _ in range(MAX_ATTEMPTS):
+            expire_leases()
+            run_worker(jobs.job_types())
+        assert failed_count() == 1
+
+        jobs.fail = None
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1))
+        assert ScrapeJob.objects.get(key="game:1").attempts == 0
+
+        assert run_worker(jobs.job_types()) == 3  # noqa: PLR2004 - The game and the jobs it enqueues
+        assert failed_count() == 0
+
+    def test_requeue_folder(self, tmp_path: pathlib.Path) -> None:
+        """Test that the failed jobs for the files in a folder are put back, and the jobs of other folders are not."""
+        folder = PavedPath(tmp_path) / "1"
+        enqueue(
+            new_job(Kind.GAME, f"game:{folder / '0.json'}:1", {}, 1),
+            new_job(Kind.GAME, f"game:{folder}0/0.json:2", {}, 2),
+        )
+        ScrapeJob.objects.update(status=Status.FAILED, attempts=MAX_ATTEMPTS)
+
+        assert requeue_folder(folder) == 1
+        assert list(ScrapeJob.objects.filter(status=Status.PENDING).values_list("game_id", flat=True)) == [1]
+
+    def test_generation(self) -> None:
+        """Test that the data generation changes after jobs that change the data."""
+        generation = current_generation()
+        enqueue(new_job(Kind.IMPORT, "import:1", {}, 1))
+
+        run_worker(FakeJobs().job_types())
+
+        assert current_generation() == generation + 1
+
+    def test_batch(self) -> None:
+        """Test that imports that are ready are finished together."""
+        jobs = FakeJobs()
+        enqueue(*[new_job(Kind.IMPORT, f"import:{game_id}", {}, game_id) for game_id in range(1, 6)])
+
+        assert run_worker(jobs.job_types(batch_size=3)) == 5  # noqa: PLR2004 - Every import
+
+        assert jobs.batches == [["import:1", "import:2", "import:3"], ["import:4", "import:5"]]
+        assert set(ScrapeJob.objects.values_list("status", flat=True)) == {Status.DONE}
+
+    def test_batch_fails(self) -> None:
+        """Test that when a batch fails the jobs are finished one at a time so only the bad job fails."""
+        jobs = FakeJobs()
+        jobs.fail = "import:2"
+        enqueue(*[new_job(Kind.IMPORT, f"import:{game_id}", {}, game_id) for game_id in range(1, 4)])
+
+        assert run_worker(jobs.job_types(batch_size=3)) == 2  # noqa: PLR2004 - Every import except the bad one
+
+        assert jobs.finished == ["import:1", "import:3"]
+        assert ScrapeJob.objects.get(key="import:2").status == Status.PENDING
+
+
+@pytest.mark.usefixtures("_db")
+class TestStages:
+    """Tests for the limits of each stage of the worker."""
+
+    def test_max_in_flight(self) -> None:
+        """Test that a list page can start while releases are downloading, but only up to the limit of each stage."""
+        jobs = FakeJobs()
+        worker = Worker(
+            {
+                Kind.LIST_PAGE: JobType(jobs.finish, jobs.start_slow_download, max_in_flight=1),
+                Kind.GAME_PLATFORM: JobType(jobs.finish, jobs.start_slow_download, max_in_flight=2),
+                Kind.IMPORT: JobType(jobs.finish),
+            },
+        )
+        enqueue(
+            *[new_job(Kind.GAME_PLATFORM, f"game_platform:{game_id}", {}, game_id) for game_id in range(1, 4)],
+            *[new_job(Kind.LIST_PAGE, f"list_page:{page}", {}) for page in range(2)],
+        )
+
+        for _ in range(3):
+            worker.step()
+
+        assert sorted(job.key for job in worker.in_flight.values()) == [
+            "game_platform:1",
+            "game_platform:2",
+            "list_page:0",
+        ]
+        assert worker.ready_kinds() == [Kind.IMPORT]
+        worker.stop()
+        assert set(ScrapeJob.objects.values_list("status", flat=True)) == {Status.PENDING}
+
+    def test_backpressure(self) -> None:
+        """Test that a list page waits while too many games wait to be imported, but never stops the worker."""
+        jobs = FakeJobs()
+        job_types = {
+            **jobs.job_types(),
+            Kind.LIST_PAGE: JobType(jobs.finish, max_backlog=1, backlog_kinds=(Kind.IMPORT,)),
+        }
+        enqueue(new_job(Kind.LIST_PAGE, "list_page", {}), new_job(Kind.GAME, "game:1", {}, 1))
+        ScrapeJob.objects.create(
+            key="import:2",
+            kind=Kind.IMPORT,
+            priority=0,
+            game_id=2,
+            available=datetime.datetime.now().astimezone() + datetime.timedelta(days=1),
+        )
+        worker = Worker(job_types)
+
+        assert Kind.LIST_PAGE not in worker.ready_kinds()
+        assert Kind.LIST_PAGE in worker.ready_kinds(backpressure=False)
+        assert worker.run() == 4  # noqa: PLR2004 - The game, its download and import, and the list page
+        # The list page is only run once there is nothing else to do, the import of game 2 is waiting to be retried
+        assert jobs.finished == ["game:1", "game_platform:1", "import:1", "list_page"]
+
+    def test_throughput(self) -> None:
+        """Test that the jobs that were done and failed are counted for each stage."""
+        jobs = FakeJobs()
+        jobs.fail = "game:2"
+        enqueue(new_job(Kind.GAME, "game:1", {}, 1), new_job(Kind.GAME, "game:2", {}, 2))
+        worker = Worker(jobs.job_types())
+        worker.run()
+
+        throughput = worker.throughput()
+        assert {kind: (stage.done, stage.failed) for kind, stage in throughput.items()} == {
+            Kind.GAME: (1, 1),
+            Kind.GAME_PLATFORM: (1, 0),
+            Kind.IMPORT: (1, 0),
+        }
+        assert StageThroughput(3, 0, 60).per_minute == 3  # noqa: PLR2004 - Three jobs in a minute
+
+
+@pytest.mark.usefixtures("_db")
+class TestSkipImports:
+    """Tests for skipping the imports of games whose files did not change."""
+
+    def import_job(self, *, game_changed: bool = False, release_changed: bool = False) -> ScrapeJob:
+        """Enqueue an import with a download of a release that is done, and an imported game."""
+        now = datetime.datetime.now().astimezone()
+        Game.objects.get_or_create(
+            id=1,
+            defaults={"name": "Game", "info_timestamp": now, "info_modified_timestamp": now, "content_digest": "a"},
+        )
+        enqueue(
+            new_job(Kind.GAME_PLATFORM, "game_platform:list:1:2", {"download_result": release_changed}, 1),
+            new_job(Kind.IMPORT, "import:list:1", {"game_id": 1, "game_changed": game_changed}, 1),
+        )
+        ScrapeJob.objects.filter(kind=Kind.GAME_PLATFORM).update(status=Status.DONE)
+        return ScrapeJob.objects.get(kind=Kind.IMPORT)
+
+    def test_unchanged(self) -> None:
+        """Test that an import is skipped when none of the files changed and the game is imported."""
+        assert changed_imports([self.import_job()]) == []
+
+    def test_changed(self) -> None:
+        """Test that an import is not skipped when the game file or a release file changed."""
+        assert changed_imports([self.import_job(game_changed=True)])
+        ScrapeJob.objects.all().delete()
+        assert changed_imports([self.import_job(release_changed=True)])
+
+    def test_not_imported(self) -> None:
+        """Test that an import is not skipped when the game was never imported with a digest."""
+        job = self.import_job()
+        Game.objects.update(content_digest="")
+        assert changed_imports([job])
+
+    def test_other_import(self) -> None:
+        """Test that an import is not skipped while another import of the game from a different list is waiting."""
+        job = self.import_job()
+        enqueue(new_job(Kind.IMPORT, "import:other:1", {"game_id": 1, "game_changed": True}, 1))
+        assert changed_imports([job])
@@ -0,0 +1,232 @@
+"""Tests for the metrics registry and where the scrape and the views record metrics."""
+from __future__ import annotations
+
+import math
+import urllib.request
+from http import HTTPStatus
+from typing import TYPE_CHECKING
+
+import pytest
+from django.test import Client, override_settings
+from fake_api import FakeApiHandler
+from games.metrics import (
+    METRICS,
+    SCRAPE_DB_WRITE_SECONDS,
+    SCRAPE_IMPORTS,
+    SCRAPE_RATE_LIMIT_WAIT_SECONDS,
+    SCRAPE_REQUESTS,
+    SCRAPE_RESPONSE_BYTES,
+    SEARCH_SECONDS,
+    UP_TO_DATE,
+    Metric,
+    MetricsRegistry,
+    serve_metrics,
+)
+from json_file import JSONFile
+from scrape.api_client import ApiClient, ApiError
+from scrape.batch_import import BatchImporter, load_document
+from scrape.content_digest import ImportOutcome
+from scrape.download_and_save import fetch_and_save
+from scrape.game import GameManager
+from scrape.validators import ValidatorStore
+from test_batch_import import EXISTING_GAME_ID, GAMES
+from test_instrumentation import RESULTS_URL
+from test_scheduler import fake_limiter
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator
+
+
+class TestMetricsRegistry:
+    """Tests for MetricsRegistry and its metrics."""
+
+    def test_counter(self) -> None:
+        """Test that counters are rendered with their labels, and that counters without labels start at 0."""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests.", ("status",))
+        registry.counter("bytes_total", "Bytes.")
+        requests.inc(status=200)
+        requests.inc(2, status=200)
+        requests.inc(status='a "b"')
+
+        assert requests.value(status=200) == 1 + 2
+        assert registry.render() == (
+            "# HELP bytes_total Bytes.\n"
+            "# TYPE bytes_total counter\n"
+            "bytes_total 0\n"
+            "# HELP requests_total Requests.\n"
+            "# TYPE requests_total counter\n"
+            'requests_total{status="200"} 3\n'
+            'requests_total{status="a \\"b\\""} 1\n'
+        )
+
+    def test_histogram(self) -> None:
+        """Test that the buckets are cumulative and that every value fits in a bucket."""
+        registry = MetricsRegistry()
+        durations = registry.histogram("seconds", "Durations.", ("path",), buckets=(1, 0.5))
+        for value in (0.25, 0.5, 0.75, 100):
+            durations.observe(value, path="game")
+
+        sample = durations.sample(path="game")
+        assert sample.buckets == [2, 1, 1]
+        assert sample.count == len(sample.buckets) + 1
+        assert registry.render().splitlines()[2:] == [
+            'seconds_bucket{path="game",le="0.5"} 2',
+            'seconds_bucket{path="game",le="1"} 3',
+            'seconds_bucket{path="game",le="+Inf"} 4',
+            'seconds_sum{path="game"} 101.5',
+            'seconds_count{path="game"} 4',
+        ]
+
+    def test_time(self) -> None:
+        """Test that time records the block and the decorated function every time it runs."""
+        registry = MetricsRegistry()
+        durations = registry.histogram("seconds", "Durations.")
+
+        @durations.time()
+        def decorated() -> None:
+            pass
+
+        decorated()
+        decorated()
+        with durations.time():
+            pass
+
+        assert durations.sample().count == 1 + 2
+        assert 0 < durations.sample().total < math.inf
+
+    def test_labels(self) -> None:
+        """Test that values need exactly the labels of the metric, and that names are unique."""
+        registry = MetricsRegistry()
+        requests = registry.counter("requests_total", "Requests.", ("status",))
+
+        with pytest.raises(ValueError, match="status"):
+            requests.inc(code=200)
+        with pytest.raises(ValueError, match="already"):
+            registry.histogram("requests_total", "Requests.")
+
+    def test_write(self, tmp_path: pathlib.Path) -> None:
+        """Test that the file is replaced with the current metrics."""
+        registry = MetricsRegistry()
+        registry.counter("requests_total", "Requests.").inc()
+        path = tmp_path / "metrics" / "scrape.prom"
+
+        registry.write(path)
+        registry.clear()
+        registry.write(path)
+
+        assert path.read_text(encoding="utf-8").endswith("requests_total 0\n")
+        assert [file.name for file in path.parent.iterdir()] == ["scrape.prom"]
+
+    def test_serve(self) -> None:
+        """Test that the metrics of the process are served while the scrape runs."""
+        METRICS.clear()
+        SCRAPE_RESPONSE_BYTES.inc(10)
+        server = serve_metrics(0)
+        assert server is not None
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as response:  # noqa: S310 - Local URL
+                body = response.read().decode()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert "actual_exclusives_scrape_response_bytes_total 10\n" in body
+
+    def test_abstract(self) -> None:
+        """Test that a metric that does not render its samples can't be created."""
+
+        class Gauge(Metric):
+            kind = "gauge"
+
+            def clear(self) -> None:
+                pass
+
+        with pytest.raises(TypeError, match="samples"):
+            Gauge("gauge", "Gauge.")  # type: ignore[abstract]
+
+
+class TestScrapeMetrics:
+    """Tests for the metrics of the downloads."""
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, server_url: str, tmp_path: pathlib.Path) -> Iterator[None]:
+        """Download into the temporary folder without waiting between retries."""
+        METRICS.clear()
+        self.server_url = server_url
+        self.client = ApiClient(api_key="key", timeout=5, retries=0, sleep=lambda _: None)
+        self.store = ValidatorStore(tmp_path / "validators.sqlite3", tmp_path)
+        self.file_path = JSONFile(tmp_path / "games" / "1.json")
+        yield
+        self.store.close()
+        self.client.close()
+
+    def test_requests(self) -> None:
+        """Test that every request is counted by status, with the bytes of the content and the time it took."""
+        url = f"{self.server_url}/v1/games/1?"
+        fetch_and_save(url, self.file_path, client=self.client, store=self.store)
+        fetch_and_save(url, self.file_path, client=self.client, store=self.store)
+        with pytest.raises(ApiError):
+            fetch_and_save(f"{self.server_url}/missing?", self.file_path, client=self.client, store=self.store)
+        FakeApiHandler.failures["/v1/games/1"] = 1
+        with pytest.raises(Exception, match="503"):
+            fetch_and_save(url, self.file_path, client=self.client, store=self.store)
+
+        assert [SCRAPE_REQUESTS.value(status=status) for status in (200, 304, 404, 503)] == [1, 1, 1, 1]
+        assert SCRAPE_RESPONSE_BYTES.value() == len(self.file_path.read_text(encoding="utf-8"))
+
+    def test_rate_limit(self) -> None:
+        """Test that the time requests waited for the rate limit is recorded."""
+        limiter, clock = fake_limiter(10)
+        limiter.acquire()
+        limiter.acquire()
+
+        assert SCRAPE_RATE_LIMIT_WAIT_SECONDS.sample().count == len(clock.sleeps) + 1
+        assert SCRAPE_RATE_LIMIT_WAIT_SECONDS.sample().total == sum(clock.sleeps)
+
+
+@pytest.mark.usefixtures("_db", "_downloaded_files", "_imported_game")
+class TestImportMetrics:
+    """Tests for the metrics of the imports."""
+
+    def test_outcomes(self) -> None:
+        """Test that the outcome of every game is counted, and that the writes are timed once for every batch."""
+        BatchImporter().import_games(load_document(GameManager(game_id)) for game_id, _, _ in GAMES)
+        GameManager(EXISTING_GAME_ID).import_game()
+
+        assert SCRAPE_IMPORTS.value(outcome=ImportOutcome.CREATED) == len(GAMES) - 1
+        assert SCRAPE_IMPORTS.value(outcome=UP_TO_DATE) == 1 + 1
+        assert SCRAPE_DB_WRITE_SECONDS.sample(path="batch").count == 1
+        assert SCRAPE_DB_WRITE_SECONDS.sample(path="game").count == 0
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestViewMetrics:
+    """Tests for the metrics of the views."""
+
+    def test_search(self) -> None:
+        """Test that searches are timed, and that streamed searches are timed once every result is sent."""
+        client = Client()
+        client.get(RESULTS_URL)
+        response = client.get(f"{RESULTS_URL}&stream=1")
+        assert SEARCH_SECONDS.sample(endpoint="games_stream").count == 0
+
+        b"".join(response.streaming_content)
+
+        assert SEARCH_SECONDS.sample(endpoint="games").count == 1
+        assert SEARCH_SECONDS.sample(endpoint="games_stream").count == 1
+
+    def test_metrics(self) -> None:
+        """Test that only requests with the token can read the metrics, and that they are off without a token."""
+        client = Client()
+        client.get(RESULTS_URL)
+
+        assert client.get("/metrics").status_code == HTTPStatus.NOT_FOUND
+        with override_settings(METRICS_TOKEN="secret"):  # noqa: S106 - Test token
+            assert client.get("/metrics").status_code == HTTPStatus.FORBIDDEN
+            assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == HTTPStatus.FORBIDDEN
+            response = client.get("/metrics", headers={"Authorization": "Bearer secret"})
+
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        assert b'actual_exclusives_search_seconds_count{endpoint="games"} 1\n' in response.content
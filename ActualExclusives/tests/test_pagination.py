@@ -0,0 +1,78 @@
+"""Tests for the keyset pagination of the search results."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from django.test import Client, override_settings
+from games.functions import form_parser
+from games.models import Game
+from games.pagination import InvalidCursorError, decode_cursor, get_page, iter_pages
+from search_helpers import make_formset
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+RESULTS_URL = "/games?form-TOTAL_FORMS=1&form-INITIAL_FORMS=0&search_type=Or+Search"
+SMALL_PAGE = 7
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestPagination:
+    """Tests for splitting the results into pages."""
+
+    def test_pages_cover_every_game(self) -> None:
+        """Test that every game is on exactly one page in (name, id) order, even when names are repeated."""
+        Game.objects.filter(id__in=[3, 10, 17, 24, 31]).update(name="Same Name")
+        expected = list(Game.objects.order_by("name", "id").values_list("id", flat=True))
+
+        ids = [game.id for page in iter_pages(Game.objects.all(), SMALL_PAGE) for game in page]
+
+        assert ids == expected
+
+    def test_last_page(self) -> None:
+        """Test that the last page does not have a cursor for the next page."""
+        page, cursor = get_page(Game.objects.filter(id__lte=SMALL_PAGE), None, SMALL_PAGE)
+
+        assert len(page) == SMALL_PAGE
+        assert cursor is None
+
+    def test_invalid_cursor(self) -> None:
+        """Test that cursors that were not created by encode_cursor are rejected."""
+        for cursor in ["not base64!", "bm90IGpzb24=", "WzEsICJhIl0="]:
+            with pytest.raises(InvalidCursorError):
+                decode_cursor(cursor)
+
+
+@pytest.mark.usefixtures("_sample_games", "_small_pages")
+class TestResultsView:
+    """Tests for the paginated and streamed results page."""
+
+    @pytest.fixture()
+    def _small_pages(self) -> Iterator[None]:
+        """Use small pages so the sample games are split into several pages."""
+        with override_settings(SEARCH_PAGE_SIZE=SMALL_PAGE):
+            yield
+
+    def test_next_page(self) -> None:
+        """Test that the next page link continues after the last game on the page."""
+        client = Client()
+
+        first_page = client.get(RESULTS_URL).context
+        last_game = first_page["games"][-1]
+        next_game = client.get(first_page["next_page_url"]).context["games"][0]
+
+        assert (next_game.name, next_game.id) > (last_game.name, last_game.id)
+
+    def test_stream(self) -> None:
+        """Test that the streamed page contains every result."""
+        formset = make_formset({})
+        assert formset.is_valid()
+        names = form_parser(formset, "Or Search").values_list("name", flat=True)
+
+        response = Client().get(RESULTS_URL + "&stream=1")
+        content = b"".join(response.streaming_content).decode()
+
+        assert len(names) > SMALL_PAGE
+        assert all(f">{name}</a>" in content for name in names)
+        assert "page-link" not in content
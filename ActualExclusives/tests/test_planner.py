@@ -0,0 +1,109 @@
+"""Tests for the scrape planner."""
+from __future__ import annotations
+
+import datetime
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from games.models import LastScrape, Platform, ScrapeJob
+from json_file import JSONFile
+from paved_path import PavedPath
+from scrape import planner
+from scrape.game import GameManager
+from scrape.job_queue import enqueue, new_job
+from scrape.jobs import platform_list_job
+from scrape.planner import ScrapePlan, execute, plan
+from scrape.recent_manifest import RECENT_MANIFEST
+from test_batch_import import write_json
+
+if TYPE_CHECKING:
+    import pathlib
+
+Kind = ScrapeJob.Kind
+
+
+def list_game(game_id: int, *platform_ids: int) -> dict[str, Any]:
+    """Create a game as it is on a list page."""
+    return {"game_id": game_id, "platforms": [{"platform_id": platform_id} for platform_id in platform_ids]}
+
+
+def release_paths(scrape_plan: ScrapePlan) -> list[tuple[int, int] | str]:
+    """Get the game and platform of every release file in the plan, and the path of every list page."""
+    return [(call.game_id, int(call.path.stem)) if call.game_id else str(call.path) for call in scrape_plan.calls]
+
+
+@pytest.mark.usefixtures("_db", "_raw_files", "_planner_files")
+class TestPlanner:
+    """Tests for planning the calls of a scrape."""
+
+    @pytest.fixture()
+    def _planner_files(self, tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Keep the game lists and the recent manifest in the temporary folder, the last download was just now."""
+        monkeypatch.setattr(planner, "GAME_LIST_FOLDER", JSONFile(tmp_path) / "platforms")
+        monkeypatch.setattr(RECENT_MANIFEST, "path", JSONFile(tmp_path) / "recent_manifest.json")
+        monkeypatch.setattr(RECENT_MANIFEST, "folder", PavedPath(tmp_path) / "recent")
+        monkeypatch.setattr(RECENT_MANIFEST, "completed_folder", PavedPath(tmp_path) / "completed_recent")
+        monkeypatch.setattr(RECENT_MANIFEST, "runs", None)
+        LastScrape.objects.create(datetime=datetime.datetime.now().astimezone())
+        self.list_folder = planner.GAME_LIST_FOLDER
+
+    def test_plan(self) -> None:
+        """Test that every missing file is planned once, with the games that need the fewest files first."""
+        for platform_id in range(1, 5):
+            Platform.objects.create(id=platform_id, name=f"Platform {platform_id}")
+        # The list of an imported platform is not downloaded again
+        Platform.objects.filter(id=3).update(imported=True)
+        write_json(self.list_folder / "1" / "0.json", {"games": [list_game(10, 1, 2), list_game(11, 1, 2, 3)]})
+        # Game 10 is on the list of platform 4 too
+        write_json(self.list_folder / "4" / "0.json", {"games": [list_game(10, 1, 2, 4)]})
+        write_json(GameManager(10).game_platform_json_path(1), {"releases": []})
+        write_json(GameManager(10).game_platform_json_path(4), {"releases": []})
+        enqueue(new_job(Kind.GAME_PLATFORM, "game_platform:11:1", {"game_id": 11, "platform_id": 1}, 11))
+
+        scrape_plan = plan()
+
+        assert release_paths(scrape_plan) == [
+            (10, 2),
+            (11, 1),
+            (11, 2),
+            (11, 3),
+            str(self.list_folder / "2" / "0.json"),
+        ]
+        assert scrape_plan.eta == datetime.timedelta(seconds=50)
+        assert scrape_plan.open_lists == 1
+
+    def test_next_page(self) -> None:
+        """Test that the page after the last full page of a platform is planned."""
+        Platform.objects.create(id=1, name="Platform 1")
+        write_json(self.list_folder / "1" / "0.json", {"games": [list_game(game_id) for game_id in range(100)]})
+
+        (call,) = plan().calls
+
+        assert call.path == self.list_folder / "1" / "1.json"
+        assert call.params == {"platform": 1, "offset": 100}
+
+    def test_recent(self) -> None:
+        """Test that the first page of recent games is planned once a day, unless a download is still in the queue."""
+        LastScrape.objects.update(datetime=datetime.datetime.now().astimezone() - datetime.timedelta(days=3))
+        (call,) = plan().calls
+        assert call.params == {"age": 5, "format": "normal", "offset": 0}
+
+        enqueue(platform_list_job(1, self.list_folder / "1"))
+        enqueue(new_job(Kind.LIST_PAGE, "list_page:recent:0", {**call.job.payload, "page": 0}))
+        assert sorted(call.job.payload["list"] for call in plan().calls) == ["platform", "recent"]
+
+    def test_execute(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that only the most valuable calls are made, and that the scrape carries on from the saved list pages."""
+        Platform.objects.create(id=1, name="Platform 1")
+        write_json(self.list_folder / "1" / "0.json", {"games": [list_game(10, 1)]})
+        Platform.objects.create(id=2, name="Platform 2")
+        Platform.objects.create(id=3, name="Platform 3")
+        downloads: list[str] = []
+        monkeypatch.setattr(planner, "download_and_save", lambda url, path, params: downloads.append(str(path)))  # noqa: ARG005 - Only the path is recorded
+
+        assert execute(plan(), 2) == 2  # noqa: PLR2004 - The budget
+
+        assert downloads == [str(GameManager(10).game_platform_json_path(1)), str(self.list_folder / "2" / "0.json")]
+        assert list(ScrapeJob.objects.values_list("key", flat=True)) == [
+            f"list_page:platform:{self.list_folder / '2' / '0.json'}",
+        ]
@@ -0,0 +1,83 @@
+"""Tests for compiling a formset into a single SQL statement."""
+from __future__ import annotations
+
+import itertools
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.db import connection
+from games.exclusivity_index import ExclusivityIndex
+from games.functions import and_form_parser, form_parser, or_form_parser
+from games.models import Game
+from search_helpers import every_form, make_formset
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def compiled_ids(formset: object, search_type: str) -> set[int]:
+    """Get the ids of the games found by form_parser."""
+    return set(form_parser(formset, search_type).values_list("id", flat=True))
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestQueryCompiler:
+    """Tests that the compiled statements give the same results as the ORM functions."""
+
+    def test_single_form(self) -> None:
+        """Test every combination of fields on a single form."""
+        for form in every_form():
+            formset = make_formset(form)
+            assert formset.is_valid()
+            assert compiled_ids(formset, "And Search") == and_form_parser(formset, set()), form
+            assert compiled_ids(formset, "Or Search") == or_form_parser(formset, set()), form
+
+    def test_multiple_forms(self) -> None:
+        """Test combining forms with And Search and Or Search."""
+        forms = every_form()[::17]
+        for first_form, second_form in itertools.combinations(forms, 2):
+            formset = make_formset(first_form, second_form)
+            assert formset.is_valid()
+            assert compiled_ids(formset, "And Search") == and_form_parser(formset, set())
+            assert compiled_ids(formset, "Or Search") == or_form_parser(formset, set())
+
+    def test_empty_form(self) -> None:
+        """Test that a form without any platforms or countries matches every game that is on a platform."""
+        formset = make_formset({})
+        assert formset.is_valid()
+        games_on_platforms = Game.objects.filter(gameplatform__isnull=False).values_list("id", flat=True)
+        assert compiled_ids(formset, "And Search") == set(games_on_platforms)
+
+    def test_unknown_search_type(self) -> None:
+        """Test that an unknown search type does not match anything."""
+        formset = make_formset({})
+        assert formset.is_valid()
+        assert compiled_ids(formset, "Unknown") == set()
+
+    def test_and_search_without_overlap(self) -> None:
+        """Test that an And Search stays empty once the forms stop overlapping."""
+        exclusive = {"platform_include": "Yes", "platform_search_type": "Exclusive"}
+        formset = make_formset({**exclusive, "platforms": [1]}, {**exclusive, "platforms": [2]}, {})
+        assert formset.is_valid()
+
+        assert and_form_parser(formset, set()) == set()
+        assert compiled_ids(formset, "And Search") == set()
+        assert ExclusivityIndex.build().search(formset, "And Search") == set()
+
+    def test_single_statement(self) -> None:
+        """Test that the search, ordering, and truncation all happen in a single statement."""
+        formset = make_formset(every_form()[0], every_form()[100])
+        assert formset.is_valid()
+
+        statements: list[str] = []
+
+        def record(execute: Callable[..., Any], sql: str, *args: Any) -> Any:  # noqa: ANN401 - Wraps any statement
+            statements.append(sql)
+            return execute(sql, *args)
+
+        with connection.execute_wrapper(record):
+            games = list(form_parser(formset, "Or Search").prefetch_related(None)[:1000])
+
+        assert len(statements) == 1
+        assert "LIMIT 1000" in statements[0]
+        assert [game.name for game in games] == sorted(game.name for game in games)
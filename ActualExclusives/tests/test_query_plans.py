@@ -0,0 +1,128 @@
+"""Tests that the searches use the indexes instead of scanning whole tables."""
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.db import connection
+from games.api import search_payload
+from games.functions import form_parser
+from games.pagination import encode_cursor, games_after, get_page
+from search_helpers import every_form, make_formset
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Sequence
+
+    from django.db.models import QuerySet
+    from games.models import Game
+    from search_helpers import FormData
+
+# A SCAN without USING reads every row of the table, SCAN CONSTANT ROW is not a table
+FULL_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(?!.*\bUSING\b)")
+SEARCH_TYPES = ["And Search", "Or Search"]
+PAGE_SIZE = 101
+LATER_PAGE = encode_cursor("Game 3", 0)
+
+
+def query_plan(sql: str, params: Sequence[Any]) -> dict[int, tuple[int, str]]:
+    """Get the query plan of a statement as {id: (parent id, detail)}."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return {row[0]: (row[1], row[3]) for row in cursor.fetchall()}
+
+
+def full_scans(sql: str, params: Sequence[Any], *, correlated_only: bool = False) -> list[str]:
+    """Get the full table scans in the query plan of a statement.
+
+    Args:
+    ----
+        sql: The statement.
+        params: The parameters of the statement.
+        correlated_only: Only return the scans that run again for every row of an outer query.
+
+    Returns:
+    -------
+        The details of the full table scans.
+    """
+    plan = query_plan(sql, params)
+    scans = []
+    for parent, detail in plan.values():
+        if not FULL_SCAN.search(detail):
+            continue
+
+        ancestors = []
+        ancestor_id = parent
+        while ancestor_id in plan:
+            ancestor_id, ancestor_detail = plan[ancestor_id]
+            ancestors.append(ancestor_detail)
+
+        if not correlated_only or any(ancestor.startswith("CORRELATED") for ancestor in ancestors):
+            scans.append(detail)
+
+    return scans
+
+
+def search_pages(form: FormData, search_type: str) -> list[QuerySet[Game]]:
+    """Get the queries for the first page and a later page of a search."""
+    formset = make_formset(form)
+    assert formset.is_valid()
+    games = form_parser(formset, search_type)
+    return [games_after(games, None)[:PAGE_SIZE], games_after(games, LATER_PAGE)[:PAGE_SIZE]]
+
+
+def is_exclude_search(form: FormData) -> bool:
+    """Check if a form searches for the games that do not match something."""
+    return form["platform_include"] == "No" or (bool(form["countries"]) and form["country_include"] == "No")
+
+
+def recorded_statements(function: Callable[[], object]) -> list[tuple[str, Sequence[Any]]]:
+    """Run a function and get every statement that it ran."""
+    statements = []
+
+    def record(execute: Callable[..., Any], sql: str, params: Sequence[Any], *args: Any) -> Any:  # noqa: ANN401 - Wraps any statement
+        statements.append((sql, params))
+        return execute(sql, params, *args)
+
+    with connection.execute_wrapper(record):
+        function()
+
+    return statements
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestQueryPlans:
+    """Tests for the query plans of the searches."""
+
+    def test_include_searches(self) -> None:
+        """Test that searches for games that match something never read a whole table."""
+        for form in every_form():
+            if is_exclude_search(form):
+                continue
+
+            for search_type in SEARCH_TYPES:
+                for page in search_pages(form, search_type):
+                    assert full_scans(*page.query.sql_with_params()) == [], (form, search_type)
+
+    def test_exclude_searches(self) -> None:
+        """Test that searches for games that do not match something read each table at most once."""
+        for form in every_form():
+            if not is_exclude_search(form):
+                continue
+
+            for search_type in SEARCH_TYPES:
+                for page in search_pages(form, search_type):
+                    sql, params = page.query.sql_with_params()
+                    assert full_scans(sql, params, correlated_only=True) == [], (form, search_type)
+
+    def test_page_queries(self) -> None:
+        """Test that the queries for a page of results and its platforms and countries use the indexes."""
+        formset = make_formset(every_form()[0])
+        assert formset.is_valid()
+        games = form_parser(formset, "Or Search")
+
+        statements = recorded_statements(lambda: get_page(games, LATER_PAGE))
+        statements += recorded_statements(lambda: search_payload(games, LATER_PAGE))
+
+        for sql, params in statements:
+            assert full_scans(sql, params) == [], sql
@@ -0,0 +1,161 @@
+"""Tests for the stores of the downloaded game and release files."""
+from __future__ import annotations
+
+import datetime
+import json
+import sqlite3
+from typing import TYPE_CHECKING
+
+import pytest
+from django.conf import settings
+from django.db import transaction
+from fake_api import FakeApiHandler
+from paved_path import PavedPath
+from scrape import raw_store
+from scrape.api_client import ApiClient
+from scrape.download_and_save import fetch_and_save
+from scrape.game import GameManager
+from scrape.raw_store import RAW_STORES, FileStore, PackedStore, migrate, set_mtime
+from scrape.reimport import ReimportResult, reimport
+from scrape.validators import ValidatorStore
+from test_batch_import import GAMES, table_rows
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator
+
+OLD = datetime.datetime(2020, 1, 1, tzinfo=datetime.UTC)
+
+
+@pytest.fixture()
+def packed_store(tmp_path: pathlib.Path) -> Iterator[PackedStore]:
+    """Create a packed store in the temporary folder."""
+    store = PackedStore(tmp_path / "packed.sqlite3")
+    yield store
+    store.close()
+
+
+class TestPackedStore:
+    """Tests for PackedStore and PackedFile."""
+
+    def test_file(self, packed_store: PackedStore) -> None:
+        """Test that a file is saved compressed with when it was fetched."""
+        file = packed_store.file("games/1.json")
+        assert not file.exists()
+        assert file.outdated()
+        with pytest.raises(FileNotFoundError):
+            file.parsed()
+
+        content = json.dumps({"description": "A game. " * 100})
+        file.write(content)
+
+        assert file.exists()
+        assert file.parsed() == json.loads(content)
+        assert file.up_to_date(datetime.datetime.now().astimezone() - datetime.timedelta(minutes=1))
+        (stored,) = sqlite3.connect(packed_store.path).execute("SELECT content FROM files").fetchone()
+        assert len(stored) < len(content) / 10
+
+        set_mtime(file, OLD)
+        assert file.aware_mtime() == OLD
+        assert file.outdated(OLD + datetime.timedelta(seconds=1))
+
+    def test_keys(self, packed_store: PackedStore) -> None:
+        """Test that only the files directly in a folder are listed."""
+        for key in ["games/2.json", "games/10.json", "games/2/platforms/1.json", "gamesx/1.json"]:
+            packed_store.write(key, "{}")
+
+        assert packed_store.keys("games") == ["games/10.json", "games/2.json"]
+        assert packed_store.keys("games/2/platforms") == ["games/2/platforms/1.json"]
+
+
+class TestMigrate:
+    """Tests for moving the downloaded files between stores."""
+
+    def test_round_trip(
+        self,
+        tmp_path: pathlib.Path,
+        packed_store: PackedStore,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that files keep their content and when they were fetched in every batch, and the empty folders go."""
+        monkeypatch.setattr(raw_store, "MIGRATE_BATCH_SIZE", 2)
+        file_store = FileStore(PavedPath(tmp_path / "downloaded_files"))
+        keys = ["games/1.json", "games/1/platforms/2.json", "games/3.json"]
+        for number, key in enumerate(keys):
+            file = file_store.file(key)
+            file.write(json.dumps({"number": number}))
+            set_mtime(file, OLD + datetime.timedelta(days=number))
+
+        assert migrate(file_store, packed_store, delete=True) == len(keys)
+        assert not (file_store.root / "games").exists()
+        assert migrate(packed_store, file_store) == len(keys)
+
+        for number, key in enumerate(keys):
+            for store in [file_store, packed_store]:
+                assert store.file(key).parsed() == {"number": number}
+                assert store.file(key).aware_mtime() == OLD + datetime.timedelta(days=number)
+
+    def test_move_to_files(
+        self,
+        tmp_path: pathlib.Path,
+        packed_store: PackedStore,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that files moved out of the packed store are deleted from it once every batch is saved."""
+        monkeypatch.setattr(raw_store, "MIGRATE_BATCH_SIZE", 2)
+        file_store = FileStore(PavedPath(tmp_path / "downloaded_files"))
+        keys = ["games/1.json", "games/1/platforms/2.json", "games/3.json"]
+        for number, key in enumerate(keys):
+            packed_store.write(key, json.dumps({"number": number}), (OLD + datetime.timedelta(days=number)).timestamp())
+
+        assert migrate(packed_store, file_store, delete=True) == len(keys)
+
+        assert packed_store.all_keys() == []
+        for number, key in enumerate(keys):
+            assert file_store.file(key).parsed() == {"number": number}
+            assert file_store.file(key).aware_mtime() == OLD + datetime.timedelta(days=number)
+
+
+@pytest.mark.usefixtures("_db")
+class TestPackedImport:
+    """Tests for downloading and importing with the packed store."""
+
+    @pytest.mark.usefixtures("_downloaded_files")
+    def test_same_rows(self, packed_store: PackedStore, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that games moved to the packed store are imported the same as from files, with parse processes."""
+        monkeypatch.setitem(RAW_STORES, "packed", packed_store)
+        with transaction.atomic():
+            reimport(workers=0)
+            expected = table_rows()
+            transaction.set_rollback(rollback=True)
+
+        migrate(RAW_STORES["files"], packed_store, delete=True)
+        monkeypatch.setattr(settings, "RAW_STORE", "packed")
+
+        assert reimport(workers=2) == ReimportResult(len(GAMES), 0, 0)
+        assert table_rows() == expected
+
+    def test_conditional_download(
+        self,
+        server_url: str,
+        tmp_path: pathlib.Path,
+        packed_store: PackedStore,
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that a download that did not change only updates when the packed file was fetched."""
+        monkeypatch.setitem(RAW_STORES, "packed", packed_store)
+        monkeypatch.setattr(settings, "RAW_STORE", "packed")
+        client = ApiClient(api_key="key", timeout=5, sleep=lambda _: None)
+        validator_store = ValidatorStore(tmp_path / "validators.sqlite3", tmp_path)
+        file = GameManager(1).game_json_path
+
+        assert fetch_and_save(f"{server_url}/v1/games/1?", file, client=client, store=validator_store)
+        set_mtime(file, OLD)
+        assert not fetch_and_save(f"{server_url}/v1/games/1?", file, client=client, store=validator_store)
+
+        assert FakeApiHandler.requests[1]["if_none_match"] == validator_store.get(file).etag
+        assert validator_store.get(file) == validator_store.get(FileStore(PavedPath(tmp_path)).file("games/1.json"))
+        assert file.aware_mtime() > OLD
+        assert file.parsed() == {"path": "/v1/games/1"}
+        client.close()
+        validator_store.close()
@@ -0,0 +1,177 @@
+"""Tests for the manifest of the downloads of recent games."""
+from __future__ import annotations
+
+import datetime
+import json
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+from games.models import LastScrape, RecentImportPage, ScrapeJob
+from json_file import JSONFile
+from paved_path import PavedPath
+from scrape import recent
+from scrape.job_queue import MAX_ATTEMPTS, new_job
+from scrape.recent import import_last_scrape_date, import_recent
+from scrape.recent_manifest import RECENT_MANIFEST, RecentManifest, RecentRun
+
+if TYPE_CHECKING:
+    import pathlib
+
+OLD = datetime.datetime(2020, 1, 1, tzinfo=datetime.UTC)
+
+
+@pytest.fixture()
+def _manifest(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep the manifest and the downloads in the temporary folder."""
+    folder = PavedPath(tmp_path) / "recent"
+    monkeypatch.setattr(RECENT_MANIFEST, "path", JSONFile(tmp_path) / "recent_manifest.json")
+    monkeypatch.setattr(RECENT_MANIFEST, "folder", folder)
+    monkeypatch.setattr(RECENT_MANIFEST, "completed_folder", PavedPath(tmp_path) / "completed_recent")
+    monkeypatch.setattr(RECENT_MANIFEST, "runs", None)
+    monkeypatch.setattr(recent, "RECENT_FOLDER", folder)
+
+
+def write_page(folder: PavedPath, page: int, game_count: int, mtime: datetime.datetime = OLD) -> JSONFile:
+    """Save a page of recent games without any games that have to be downloaded."""
+    file = JSONFile(folder / f"{page}.json")
+    file.write(json.dumps({"games": [{"game_id": game_id} for game_id in range(game_count)]}))
+    os.utime(file, (mtime.timestamp(), mtime.timestamp()))
+    return file
+
+
+def reloaded() -> RecentManifest:
+    """Read the manifest again from the file."""
+    return RecentManifest(RECENT_MANIFEST.path, RECENT_MANIFEST.folder, RECENT_MANIFEST.completed_folder)
+
+
+@pytest.mark.usefixtures("_manifest")
+class TestRecentManifest:
+    """Tests for RecentManifest."""
+
+    def test_add_page(self) -> None:
+        """Test that a download is complete once the last page is added, and that the manifest is saved."""
+        RECENT_MANIFEST.add_page("run", 0, OLD, last=False)
+        assert RECENT_MANIFEST.load() == {"run": RecentRun("run", 1)}
+        assert not RECENT_MANIFEST.load()["run"].complete
+        assert RECENT_MANIFEST.newest_complete() is None
+
+        RECENT_MANIFEST.add_page("run", 1, OLD, last=True)
+        assert RECENT_MANIFEST.load() == {"run": RecentRun("run", 2, OLD)}
+        assert RECENT_MANIFEST.newest_complete() == RecentRun("run", 2, OLD)
+        assert reloaded().load() == RECENT_MANIFEST.load()
+
+    def test_folders(self) -> None:
+        """Test that downloads from before there was a manifest are added from the folders."""
+        newer = OLD + datetime.timedelta(days=1)
+        write_page(RECENT_MANIFEST.folder / "complete", 0, 100)
+        write_page(RECENT_MANIFEST.folder / "complete", 1, 3, newer)
+        write_page(RECENT_MANIFEST.folder / "incomplete", 0, 100)
+        write_page(RECENT_MANIFEST.completed_folder / "imported", 0, 5)
+
+        assert RECENT_MANIFEST.load() == {
+            "complete": RecentRun("complete", 2, newer),
+            "incomplete": RecentRun("incomplete", 1),
+            "imported": RecentRun("imported", 1, OLD, imported=True),
+        }
+        assert RECENT_MANIFEST.path.exists()
+        assert RECENT_MANIFEST.newest_complete() == RecentRun("complete", 2, newer)
+
+    def test_importable(self) -> None:
+        """Test that only downloads that are complete, old enough, and not imported are imported."""
+        newer = OLD + datetime.timedelta(days=10)
+        RECENT_MANIFEST.add_page("newer", 0, newer, last=True)
+        RECENT_MANIFEST.add_page("older", 0, OLD, last=True)
+        RECENT_MANIFEST.add_page("incomplete", 0, OLD, last=False)
+        RECENT_MANIFEST.add_page("imported", 0, OLD, last=True)
+        RECENT_MANIFEST.mark_imported("imported")
+
+        assert [run.name for run in RECENT_MANIFEST.importable(newer + datetime.timedelta(days=1))] == [
+            "older",
+            "newer",
+        ]
+        assert [run.name for run in RECENT_MANIFEST.importable(newer)] == ["older"]
+
+
+@pytest.mark.usefixtures("_db", "_manifest")
+class TestImportRecent:
+    """Tests for importing the downloads of recent games with the manifest."""
+
+    def test_import_recent(self) -> None:
+        """Test that complete downloads are imported and moved, and that incomplete downloads are left alone."""
+        write_page(RECENT_MANIFEST.folder / "complete", 0, 0)
+        write_page(RECENT_MANIFEST.folder / "incomplete", 0, 100)
+        RECENT_MANIFEST.add_page("complete", 0, OLD, last=True)
+        RECENT_MANIFEST.add_page("incomplete", 0, OLD, last=False)
+
+        import_recent()
+
+        assert ScrapeJob.objects.filter(payload__list="recent_import", status=ScrapeJob.Status.DONE).count() == 1
+        assert not (RECENT_MANIFEST.folder / "complete").exists()
+        assert (RECENT_MANIFEST.completed_folder / "complete" / "0.json").exists()
+        assert (RECENT_MANIFEST.folder / "incomplete").exists()
+        assert list(RecentImportPage.objects.values_list("run", "page")) == [("complete", 0)]
+        assert reloaded().load()["complete"].imported
+        assert not reloaded().load()["incomplete"].imported
+        assert RECENT_MANIFEST.importable(datetime.datetime.now().astimezone()) == []
+
+    def test_import_last_scrape_date(self) -> None:
+        """Test that the last scrape is recreated from the newest complete download."""
+        RECENT_MANIFEST.add_page("complete", 0, OLD, last=True)
+        RECENT_MANIFEST.add_page("incomplete", 0, OLD + datetime.timedelta(days=1), last=False)
+
+        import_last_scrape_date()
+
+        assert LastScrape.objects.values_list("datetime", "run").get() == (OLD, "complete")
+
+    def test_watermark(self) -> None:
+        """Test that pages that were imported are skipped without opening them, and are linked to the last scrape."""
+        last_scrape = LastScrape.objects.create(datetime=OLD, run="run")
+        write_page(RECENT_MANIFEST.folder / "run", 0, 100)
+        write_page(RECENT_MANIFEST.folder / "run", 1, 0)
+        RECENT_MANIFEST.add_page("run", 1, OLD, last=True)
+        RecentImportPage.objects.create(last_scrape=last_scrape, run="run", page=0, imported=OLD)
+        # The page would fail to import if it was opened
+        (RECENT_MANIFEST.folder / "run" / "0.json").write_text("not json")
+
+        import_recent()
+
+        assert [job.payload["page"] for job in ScrapeJob.objects.filter(payload__list="recent_import")] == [1]
+        assert list(last_scrape.imported_pages.order_by("page").values_list("page", flat=True)) == [0, 1]
+        assert RECENT_MANIFEST.load()["run"].imported
+
+    def test_retry_failed(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the jobs of a download that failed on an earlier run are tried again by the import."""
+        write_page(RECENT_MANIFEST.folder / "run", 0, 0)
+        RECENT_MANIFEST.add_page("run", 0, OLD, last=True)
+        page = RECENT_MANIFEST.folder / "run" / "0.json"
+        failed = new_job(ScrapeJob.Kind.GAME, f"game:{page}:1", {}, 1)
+        failed.status = ScrapeJob.Status.FAILED
+        failed.attempts = MAX_ATTEMPTS
+        failed.save()
+        statuses = []
+        monkeypatch.setattr(recent, "work", lambda: statuses.append(ScrapeJob.objects.get(game_id=1).status))
+
+        import_recent()
+
+        assert statuses == [ScrapeJob.Status.PENDING]
+        # The game job was never run, so the page is not imported yet
+        assert not RECENT_MANIFEST.load()["run"].imported
+
+    def test_reimport(self) -> None:
+        """Test that reimport imports the pages of downloads that were already imported again."""
+        write_page(RECENT_MANIFEST.folder / "run", 0, 0)
+        RECENT_MANIFEST.add_page("run", 0, OLD, last=True)
+        import_recent()
+        (first_import,) = RecentImportPage.objects.values_list("imported", flat=True)
+
+        import_recent()
+        assert list(RecentImportPage.objects.values_list("imported", flat=True)) == [first_import]
+
+        import_recent(reimport=True)
+        (second_import,) = RecentImportPage.objects.values_list("imported", flat=True)
+        assert second_import > first_import
+        # The download was moved by the first import, so the pages are imported again from the completed folder
+        (job,) = ScrapeJob.objects.filter(payload__list="recent_import", key__contains="completed_recent")
+        assert job.status == ScrapeJob.Status.DONE
+        assert (RECENT_MANIFEST.completed_folder / "run" / "0.json").exists()
@@ -0,0 +1,38 @@
+"""Tests for importing the downloaded games again without the network."""
+from __future__ import annotations
+
+import pytest
+from django.db import transaction
+from scrape.game import GameManager
+from scrape.reimport import ReimportResult, reimport
+from test_batch_import import GAMES, table_rows, write_json
+
+
+@pytest.mark.usefixtures("_db", "_downloaded_files")
+class TestReimport:
+    """Tests for reimport."""
+
+    def test_parse_processes(self) -> None:
+        """Test that parsing in other processes imports the same rows as importing every game on its own."""
+        with transaction.atomic():
+            for game_id, _, _ in GAMES:
+                GameManager(game_id).import_game()
+            expected = table_rows()
+            transaction.set_rollback(rollback=True)
+
+        assert reimport(workers=2, batch_size=2) == ReimportResult(len(GAMES), 0, 0)
+        assert table_rows() == expected
+
+    def test_failed(self) -> None:
+        """Test that games with missing files or unknown countries fail without stopping the other games."""
+        GameManager(GAMES[0][0]).game_platform_json_path(1).unlink()
+        write_json(GameManager(GAMES[1][0]).game_platform_json_path(2), {"releases": [{"countries": ["Atlantis"]}]})
+
+        assert reimport(workers=0) == ReimportResult(len(GAMES) - 2, 0, 2)
+
+    def test_force(self) -> None:
+        """Test that games that are up to date are only imported again when forced."""
+        reimport(workers=0)
+
+        assert reimport(workers=0) == ReimportResult(0, len(GAMES), 0)
+        assert reimport(workers=0, force=True) == ReimportResult(len(GAMES), 0, 0)
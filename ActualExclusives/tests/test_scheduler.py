@@ -0,0 +1,122 @@
+"""Tests for the download scheduler."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+from scrape.scheduler import DownloadScheduler, RateLimiter
+
+
+class FakeClock:
+    """Clock that only moves forward when something sleeps."""
+
+    def __init__(self) -> None:
+        """Initialize the clock."""
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        """Get the current time."""
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        """Move the clock forward."""
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def fake_limiter(interval: float, burst: int = 1) -> tuple[RateLimiter, FakeClock]:
+    """Create a rate limiter that uses a fake clock."""
+    clock = FakeClock()
+    return RateLimiter(interval, burst, clock=clock, sleep=clock.sleep), clock
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter."""
+
+    def test_first_request(self) -> None:
+        """Test that the first request starts right away."""
+        limiter, clock = fake_limiter(10)
+        limiter.acquire()
+        assert clock.sleeps == []
+
+    def test_interval_between_starts(self) -> None:
+        """Test that requests start at least one interval apart."""
+        limiter, clock = fake_limiter(10)
+        starts = []
+        for _ in range(3):
+            limiter.acquire()
+            starts.append(clock.now)
+
+        assert starts == [0, 10, 20]
+
+    def test_work_overlaps_wait(self) -> None:
+        """Test that time spent between requests counts towards the interval instead of being added to it."""
+        limiter, clock = fake_limiter(10)
+        limiter.acquire()
+        clock.now += 7
+        limiter.acquire()
+
+        assert clock.sleeps == [pytest.approx(3)]
+        assert clock.now == pytest.approx(10)
+
+    def test_no_wait_after_interval(self) -> None:
+        """Test that a request does not wait when the interval already passed."""
+        limiter, clock = fake_limiter(10)
+        limiter.acquire()
+        clock.now += 60
+        limiter.acquire()
+        assert clock.sleeps == []
+
+    def test_burst(self) -> None:
+        """Test that idle time saves up at most burst tokens."""
+        limiter, clock = fake_limiter(10, burst=2)
+        clock.now += 100
+        for _ in range(3):
+            limiter.acquire()
+
+        assert clock.sleeps == [pytest.approx(10)]
+
+
+class TestDownloadScheduler:
+    """Tests for DownloadScheduler."""
+
+    def test_order(self) -> None:
+        """Test that downloads run one at a time in the order they were submitted."""
+        limiter, _ = fake_limiter(10)
+        scheduler = DownloadScheduler(limiter)
+        finished = []
+        downloads = [scheduler.submit(finished.append, number) for number in range(5)]
+        for download in downloads:
+            download.result()
+
+        assert finished == [0, 1, 2, 3, 4]
+
+    def test_background(self) -> None:
+        """Test that the caller can keep working while a download runs."""
+        limiter, _ = fake_limiter(10)
+        scheduler = DownloadScheduler(limiter)
+        started = threading.Event()
+        release = threading.Event()
+
+        def download() -> None:
+            started.set()
+            release.wait()
+
+        future = scheduler.submit(download)
+        assert started.wait(5)
+        assert not future.done()
+        release.set()
+        future.result()
+
+    def test_error(self) -> None:
+        """Test that errors from a download are raised when waiting for it."""
+        limiter, _ = fake_limiter(10)
+        scheduler = DownloadScheduler(limiter)
+
+        def download() -> None:
+            msg = "Invalid JSON"
+            raise ValueError(msg)
+
+        with pytest.raises(ValueError, match="Invalid JSON"):
+            scheduler.submit(download).result()
@@ -1,89 +1,86 @@
+"""Tests for finding the newest complete download of recent games in folders saved before there was a manifest."""
+from __future__ import annotations
+
 import datetime
 import json
+import os
+from typing import TYPE_CHECKING
 
+import pytest
 from json_file import JSONFile
 from paved_path import PavedPath
-from scrape.recent import newest_scrape_from_folder
-
-TEST_DATA_FOLDER = PavedPath("test_data")
-
-
-class TestNewestScraperFromFolderTests:
-    def tearDown(self) -> None:
-        """Clean up the test data folder."""
-        TEST_DATA_FOLDER.delete()
-
-    """Tests for the newest_scrape_from_folder function."""
-
-    def create_file(self, folder: PavedPath, file_number: int, number_of_entries: int) -> JSONFile:
-        """Create a file with the given content in the given folder."""
-        file = JSONFile(folder / f"{file_number}.json")
-        folder.mkdir(parents=True, exist_ok=True)
-        content = {"games": list(range(number_of_entries))}
-        file.write_text(json.dumps(content))
+from scrape.recent_manifest import RecentManifest
+
+if TYPE_CHECKING:
+    import pathlib
+
+OLD = datetime.datetime(2020, 1, 1, tzinfo=datetime.UTC)
+FIRST_FOLDER = "2020-01-01 00:00:00+00:00"
+SECOND_FOLDER = "2020-01-02 00:00:00+00:00"
+
+
+class TestNewestComplete:
+    """Tests for RecentManifest.newest_complete when the manifest is built from the folders."""
+
+    @pytest.fixture(autouse=True)
+    def _folders(self, tmp_path: pathlib.Path) -> None:
+        """Keep the downloads and the manifest in the temporary folder."""
+        self.folder = PavedPath(tmp_path) / "recent"
+        self.manifest = RecentManifest(
+            JSONFile(tmp_path) / "recent_manifest.json",
+            self.folder,
+            PavedPath(tmp_path) / "completed_recent",
+        )
+
+    def create_file(self, folder: str, file_number: int, number_of_entries: int, days: int = 0) -> JSONFile:
+        """Create a page with the given number of games in the given folder, fetched the given days after OLD."""
+        file = JSONFile(self.folder / folder / f"{file_number}.json")
+        file.write(json.dumps({"games": list(range(number_of_entries))}))
+        mtime = (OLD + datetime.timedelta(days=days)).timestamp()
+        os.utime(file, (mtime, mtime))
         return file
 
+    def newest_complete(self) -> datetime.datetime | None:
+        """Get when the newest complete download was completed."""
+        run = self.manifest.newest_complete()
+        return None if run is None else run.completed
+
     def test_one_folder_one_file_complete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-        file = self.create_file(folder, 0, 10)
+        """Test that a download with a single page that is not full is complete."""
+        file = self.create_file(FIRST_FOLDER, 0, 10)
 
-        assert newest_scrape_from_folder(test_data_folder) == file.aware_mtime()
-        test_data_folder.delete()
+        assert self.newest_complete() == file.aware_mtime()
 
     def test_one_folder_single_file_incomplete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-
-        self.create_file(folder, 0, 100)
+        """Test that a download whose only page is full is not complete."""
+        self.create_file(FIRST_FOLDER, 0, 100)
 
-        assert newest_scrape_from_folder(test_data_folder) is None
-        test_data_folder.delete()
+        assert self.newest_complete() is None
 
     def test_one_folder_multiple_files_complete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-
-        self.create_file(folder, 0, 100)
-        file = self.create_file(folder, 10, 10)
+        """Test that a download is complete when its last page is not full."""
+        self.create_file(FIRST_FOLDER, 0, 100)
+        file = self.create_file(FIRST_FOLDER, 10, 10, days=1)
 
-        assert newest_scrape_from_folder(test_data_folder) == file.aware_mtime()
-        test_data_folder.delete()
+        assert self.newest_complete() == file.aware_mtime()
 
     def test_one_folder_multiple_files_incomplete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
+        """Test that a download is not complete when its last page is full."""
+        self.create_file(FIRST_FOLDER, 0, 100)
+        self.create_file(FIRST_FOLDER, 10, 100, days=1)
 
-        self.create_file(folder, 0, 100)
-        self.create_file(folder, 10, 100)
-
-        assert newest_scrape_from_folder(test_data_folder) is None
-        test_data_folder.delete()
+        assert self.newest_complete() is None
 
     def test_multiple_folders_one_file_complete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-        file = self.create_file(folder, 0, 10)
-
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-        self.create_file(folder, 0, 100)
+        """Test that an older complete download is found when the newest download is not complete."""
+        file = self.create_file(FIRST_FOLDER, 0, 10)
+        self.create_file(SECOND_FOLDER, 0, 100, days=1)
 
-        assert newest_scrape_from_folder(test_data_folder) == file.aware_mtime()
-        test_data_folder.delete()
+        assert self.newest_complete() == file.aware_mtime()
 
     def test_multiple_folders_one_file_incomplete(self) -> None:
-        """Test that the newest file is returned."""
-        test_data_folder = PavedPath("test_data")
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-        self.create_file(folder, 0, 100)
-
-        folder = test_data_folder / datetime.datetime.now().astimezone()
-        self.create_file(folder, 0, 100)
+        """Test that nothing is found when no download is complete."""
+        self.create_file(FIRST_FOLDER, 0, 100)
+        self.create_file(SECOND_FOLDER, 0, 100, days=1)
 
-        assert newest_scrape_from_folder(test_data_folder) is None
-        test_data_folder.delete()
+        assert self.newest_complete() is None
@@ -0,0 +1,61 @@
+"""Tests for the search result cache."""
+from __future__ import annotations
+
+import pytest
+from django.test import Client
+from games.generation import bump_generation
+from games.search_cache import SEARCH_CACHE, canonical_search
+from search_helpers import make_formset
+
+PS1_EXCLUSIVES = {"platforms": [1], "platform_include": "Yes", "platform_search_type": "Exclusive"}
+JAPAN_ONLY = {"countries": [2], "country_include": "Yes", "country_search_type": "Or"}
+RESULTS_URL = (
+    "/games?form-TOTAL_FORMS=1&form-INITIAL_FORMS=0&form-0-platforms=1&form-0-platform_include=Yes"
+    "&form-0-platform_search_type=Exclusive&search_type=And+Search"
+)
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestCanonicalSearch:
+    """Tests for turning searches into their canonical form."""
+
+    def canonical(self, *forms: dict[str, list[int] | str], search_type: str = "And Search") -> str:
+        """Get the canonical form of a search."""
+        formset = make_formset(*forms)
+        assert formset.is_valid()
+        return canonical_search(formset, search_type)
+
+    def test_form_order(self) -> None:
+        """Test that the order of the forms does not matter."""
+        assert self.canonical(PS1_EXCLUSIVES, JAPAN_ONLY) == self.canonical(JAPAN_ONLY, PS1_EXCLUSIVES)
+
+    def test_id_order(self) -> None:
+        """Test that the order the platforms were selected in does not matter."""
+        first = {**PS1_EXCLUSIVES, "platforms": [1, 2]}
+        second = {**PS1_EXCLUSIVES, "platforms": [2, 1]}
+        assert self.canonical(first) == self.canonical(second)
+
+    def test_unused_fields(self) -> None:
+        """Test that fields that are not used by the search are ignored."""
+        assert self.canonical(PS1_EXCLUSIVES) == self.canonical({**PS1_EXCLUSIVES, "country_search_type": "And"})
+
+    def test_search_type(self) -> None:
+        """Test that And Search and Or Search are cached separately."""
+        assert self.canonical(PS1_EXCLUSIVES) != self.canonical(PS1_EXCLUSIVES, search_type="Or Search")
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestSearchCache:
+    """Tests for reusing the results of the games view."""
+
+    def test_hit_until_import(self) -> None:
+        """Test that results are reused until the data generation changes."""
+        client = Client()
+
+        assert client.get(RESULTS_URL)["X-Search-Cache"] == "miss"
+        assert client.get(RESULTS_URL)["X-Search-Cache"] == "hit"
+
+        bump_generation()
+
+        assert client.get(RESULTS_URL)["X-Search-Cache"] == "miss"
+        assert SEARCH_CACHE.stats()["hits"] >= 1
@@ -0,0 +1,65 @@
+"""Tests for the platform and country signatures."""
+from __future__ import annotations
+
+import pytest
+from django.core.management import call_command
+from games.models import Country, GamePlatform, GamePlatformCountry, GamePlatformSignature, GameSignature, Platform
+from games.signatures import make_signature, subset_signatures, update_signatures
+
+
+class TestMakeSignature:
+    """Tests for building signatures."""
+
+    def test_sorted_and_unique(self) -> None:
+        """Test that the ids are sorted and duplicates are removed."""
+        assert make_signature([7, 6, 7]) == ",6,7,"
+
+    def test_empty(self) -> None:
+        """Test the signature of an empty list."""
+        assert make_signature([]) == ","
+
+    def test_subsets(self) -> None:
+        """Test that every subset is listed."""
+        assert sorted(subset_signatures([2, 1])) == [",", ",1,", ",1,2,", ",2,"]
+
+
+@pytest.mark.usefixtures("_sample_games")
+class TestUpdateSignatures:
+    """Tests for keeping the signatures up to date."""
+
+    def test_matches_rows(self) -> None:
+        """Test that every signature matches the rows it was built from."""
+        for signature in GameSignature.objects.all():
+            platform_ids = GamePlatform.objects.filter(game=signature.game_id).values_list("platform_id", flat=True)
+            assert signature.platform_signature == make_signature(platform_ids)
+            assert signature.platform_count == len(set(platform_ids))
+
+        for signature in GamePlatformSignature.objects.all():
+            country_ids = GamePlatformCountry.objects.filter(game_platform=signature.game_platform_id).values_list(
+                "country_id",
+                flat=True,
+            )
+            assert signature.country_signature == make_signature(country_ids)
+
+    def test_incremental_update(self) -> None:
+        """Test that a new platform and country are added to the signatures of a game."""
+        game_platform = GamePlatform.objects.first()
+        assert game_platform
+        platform = Platform.objects.create(id=999, name="New Platform")
+        country = Country.objects.create(name="New Country", code="NC", flag="NC", region="Region")
+        new_game_platform = GamePlatform.objects.create(game=game_platform.game, platform=platform)
+        GamePlatformCountry.objects.create(game_platform=new_game_platform, country=country)
+
+        update_signatures([game_platform.game_id])
+
+        assert ",999," in GameSignature.objects.get(game=game_platform.game).platform_signature
+        assert GamePlatformSignature.objects.get(game_platform=new_game_platform).country_signature == f",{country.id},"
+
+    def test_rebuild_command(self) -> None:
+        """Test that the management command recreates deleted signatures."""
+        count = GameSignature.objects.count()
+        GameSignature.objects.all().delete()
+
+        call_command("rebuild_signatures", stdout=None)
+
+        assert GameSignature.objects.count() == count
@@ -0,0 +1,126 @@
+"""Tests for conditional downloads using the saved validators."""
+from __future__ import annotations
+
+import json
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+from fake_api import LAST_MODIFIED, FakeApiHandler
+from json_file import JSONFile
+from scrape.api_client import ApiClient
+from scrape.document_cache import DOCUMENT_CACHE
+from scrape.download_and_save import fetch_and_save
+from scrape.validators import ValidatorStore, content_hash
+
+if TYPE_CHECKING:
+    import pathlib
+    from collections.abc import Iterator
+
+# Modification time of files that were downloaded a long time ago
+OLD_MTIME = 1_000_000_000
+
+
+@pytest.fixture()
+def client() -> Iterator[ApiClient]:
+    """Create a client that does not wait between retries."""
+    api_client = ApiClient(api_key="key", timeout=5, sleep=lambda _: None)
+    yield api_client
+    api_client.close()
+
+
+@pytest.fixture()
+def store(tmp_path: pathlib.Path) -> Iterator[ValidatorStore]:
+    """Create a validator store for the downloaded files in the temporary folder."""
+    validator_store = ValidatorStore(tmp_path / "validators.sqlite3", tmp_path)
+    yield validator_store
+    validator_store.close()
+
+
+class TestFetchAndSave:
+    """Tests for conditional downloads in fetch_and_save."""
+
+    @pytest.fixture(autouse=True)
+    def _setup(self, server_url: str, client: ApiClient, store: ValidatorStore, tmp_path: pathlib.Path) -> None:
+        """Save the fixtures that every test uses."""
+        self.url = f"{server_url}/v1/games/1?"
+        self.client = client
+        self.store = store
+        self.file_path = JSONFile(tmp_path / "games" / "1.json")
+
+    def fetch(self) -> bool:
+        """Download the game."""
+        return fetch_and_save(self.url, self.file_path, client=self.client, store=self.store)
+
+    def make_old(self) -> None:
+        """Make the file look like it was downloaded a long time ago."""
+        os.utime(self.file_path, (OLD_MTIME, OLD_MTIME))
+
+    def test_first_download(self) -> None:
+        """Test that a new file is saved with its validators."""
+        assert self.fetch()
+
+        validators = self.store.get(self.file_path)
+        assert self.file_path.parsed() == {"path": "/v1/games/1"}
+        assert validators is not None
+        assert validators.etag == f'"{content_hash(self.file_path.read_text())}"'
+        assert validators.last_modified == LAST_MODIFIED
+        assert validators.content_hash == content_hash(self.file_path.read_text())
+        assert FakeApiHandler.requests[0]["if_none_match"] == ""
+
+    def test_not_modified(self) -> None:
+        """Test that a 304 response only updates the modification time of the file."""
+        self.fetch()
+        self.make_old()
+
+        assert not self.fetch()
+
+        assert FakeApiHandler.requests[1]["if_none_match"] == self.store.get(self.file_path).etag
+        assert FakeApiHandler.requests[1]["if_modified_since"] == LAST_MODIFIED
+        assert self.file_path.stat().st_mtime > OLD_MTIME
+        assert self.file_path.parsed() == {"path": "/v1/games/1"}
+
+    def test_changed(self) -> None:
+        """Test that a file is saved again with new validators when its content changed."""
+        self.fetch()
+        FakeApiHandler.bodies["/v1/games/1"] = json.dumps({"title": "Changed"})
+
+        assert self.fetch()
+
+        assert self.file_path.parsed() == {"title": "Changed"}
+        assert self.store.get(self.file_path).content_hash == content_hash(self.file_path.read_text())
+        # The downloaded content is cached, so the file is not parsed again
+        hits = DOCUMENT_CACHE.hits
+        assert DOCUMENT_CACHE.get(self.file_path) == {"title": "Changed"}
+        assert DOCUMENT_CACHE.hits == hits + 1
+
+    def test_same_content(self) -> None:
+        """Test that a file without validators is not written again when the content is the same."""
+        self.file_path.write(json.dumps({"path": "/v1/games/1"}))
+        self.make_old()
+
+        assert not self.fetch()
+
+        assert FakeApiHandler.requests[0]["if_none_match"] == ""
+        assert self.file_path.stat().st_mtime > OLD_MTIME
+        assert self.store.get(self.file_path) is not None
+
+    def test_deleted_file(self) -> None:
+        """Test that a file that was deleted is downloaded in full even though its validators were saved."""
+        self.fetch()
+        self.file_path.unlink()
+
+        assert self.fetch()
+
+        assert FakeApiHandler.requests[1]["if_none_match"] == ""
+        assert self.file_path.exists()
+
+    def test_invalid_json(self) -> None:
+        """Test that invalid content is not saved."""
+        FakeApiHandler.bodies["/v1/games/1"] = "Not JSON"
+
+        with pytest.raises(json.JSONDecodeError):
+            self.fetch()
+
+        assert not self.file_path.exists()
+        assert self.store.get(self.file_path) is None